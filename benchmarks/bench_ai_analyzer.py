@@ -0,0 +1,167 @@
+"""
+Benchmark do motor de análise (`models.ai_analyzer.analyze_dataframe`).
+
+Compara a implementação atual com a versão anterior (uma passada por passo, com
+DataFrames filtrados para outliers e groupbys repetidos) e verifica que os dois
+relatórios são idênticos (a menos da ordem das colunas dentro de cada par de correlação).
+
+Uso:
+    python benchmarks/bench_ai_analyzer.py [n_linhas ...]
+
+Sem argumentos, executa com 10 mil, 1 milhão e 10 milhões de linhas.
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ai_analyzer
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+def make_frame(n_rows, seed=42):
+    """Gera um DataFrame sintético com o mesmo esquema da planilha de vendas."""
+    rng = np.random.default_rng(seed)
+    vendedores = np.array(["Ana Silva", "Carlos Oliveira", "Fernanda Lima", "João Pereira",
+                           "Marcos Andrade", "Patrícia Costa", "Beatriz Martins", "Ricardo Souza"])
+    categorias = np.array(["Eletrônicos", "Vestuário", "Alimentos e Bebidas",
+                           "Móveis e Decoração", "Saúde e Beleza"])
+    regioes = np.array(["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"])
+
+    quantidade = rng.integers(1, 10, n_rows)
+    preco = rng.lognormal(5, 1.2, n_rows).round(2)
+    custo = (preco * rng.uniform(0.55, 0.75, n_rows)).round(2)
+    desconto = rng.choice([0, 5, 10, 15, 20], n_rows, p=[0.4, 0.3, 0.15, 0.1, 0.05])
+    receita_bruta = preco * quantidade
+    vendas = receita_bruta * (1 - desconto / 100)
+
+    return pd.DataFrame({
+        "Data": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 1000, n_rows), unit="D"),
+        "Regiao": pd.Categorical(rng.choice(regioes, n_rows)),
+        "Vendedor": pd.Categorical(rng.choice(vendedores, n_rows)),
+        "Categoria_Produto": pd.Categorical(rng.choice(categorias, n_rows)),
+        "Quantidade": quantidade,
+        "Preco_Unitario": preco,
+        "Receita_Bruta": receita_bruta,
+        "Desconto(%)": desconto,
+        "Vendas": vendas,
+        "Custo_Total": custo * quantidade,
+        "Lucro": vendas - custo * quantidade,
+        "Cliente_VIP": rng.choice([0, 1], n_rows, p=[0.8, 0.2]),
+    })
+
+
+def legacy_analyze_dataframe(df):
+    """Implementação anterior dos passos da análise, mantida apenas como referência."""
+    report = []
+    analysis_data = {}
+
+    report.append("### 1. Visão Geral do Dataset")
+    num_rows, num_cols = df.shape
+    report.append(f"- **Número de Linhas:** {num_rows}")
+    report.append(f"- **Número de Colunas:** {num_cols}")
+
+    report.append("\n### 2. Tipos de Colunas")
+    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
+    report.append(f"- **Colunas Numéricas ({len(numeric_cols)}):** `{', '.join(numeric_cols)}`")
+    report.append(f"- **Colunas Categóricas ({len(categorical_cols)}):** `{', '.join(categorical_cols)}`")
+    report.append(f"- **Colunas de Data/Hora ({len(datetime_cols)}):** `{', '.join(datetime_cols)}`")
+
+    if len(numeric_cols) > 1:
+        report.append("\n### 3. Análise de Correlação")
+        corr_matrix = df[numeric_cols].corr()
+        corr_pairs = corr_matrix.unstack().sort_values(ascending=False).drop_duplicates()
+        high_corr = corr_pairs[(corr_pairs < 1) & (corr_pairs.abs() > 0.7)]
+        if not high_corr.empty:
+            report.append("Foram encontradas as seguintes correlações fortes (positivas ou negativas):")
+            for (col1, col2), val in high_corr.items():
+                tipo = "positiva" if val > 0 else "negativa"
+                report.append(f"  - **`{col1}`** e **`{col2}`**: Correlação {tipo} de `{val:.2f}`.")
+        else:
+            report.append("- Nenhuma correlação forte (acima de 0.7) foi encontrada.")
+
+    if numeric_cols:
+        report.append("\n### 4. Análise de Outliers")
+        outliers_found = False
+        for col in numeric_cols:
+            Q1 = df[col].quantile(0.25)
+            Q3 = df[col].quantile(0.75)
+            IQR = Q3 - Q1
+            outliers = df[(df[col] < Q1 - 1.5 * IQR) | (df[col] > Q3 + 1.5 * IQR)]
+            if not outliers.empty:
+                report.append(f"- A coluna **`{col}`** parece ter `{len(outliers)}` valor(es) atípico(s).")
+                outliers_found = True
+        if not outliers_found:
+            report.append("- Nenhuma coluna parece ter outliers significativos.")
+
+    if categorical_cols and numeric_cols:
+        report.append("\n### 5. Análise de Destaques")
+        metric_col = next((col for col in ['Vendas', 'Receita_Liquida', 'Receita'] if col in numeric_cols), numeric_cols[0])
+        report.append(f"Analisando os destaques com base na coluna **`{metric_col}`**:")
+        for cat_col in categorical_cols:
+            if df[cat_col].nunique() > 1:
+                top_performer = df.groupby(cat_col)[metric_col].sum().idxmax()
+                report.append(f"- Em **`{cat_col}`**, a categoria com maior volume de `{metric_col}` é **{top_performer}**.")
+
+    if 'Vendedor' in df.columns and 'Vendas' in df.columns:
+        report.append("\n### 6. Destaques de Vendas")
+        top_sellers = df.groupby('Vendedor')['Vendas'].sum().nlargest(5)
+        report.append("\n**Top 5 Vendedores por Vendas:**")
+        for seller, total_sales in top_sellers.items():
+            report.append(f"- **{seller}**: R$ {total_sales:,.2f}")
+
+    if 'Categoria_Produto' in df.columns and 'Vendas' in df.columns:
+        top_products = df.groupby('Categoria_Produto')['Vendas'].sum().nlargest(5)
+        report.append("\n**Top 5 Produtos Mais Vendidos:**")
+        for product, total_sales in top_products.items():
+            report.append(f"- **{product}**: R$ {total_sales:,.2f}")
+        bottom_products = df.groupby('Categoria_Produto')['Vendas'].sum().nsmallest(5)
+        report.append("\n**Top 5 Produtos Menos Vendidos:**")
+        for product, total_sales in bottom_products.items():
+            report.append(f"- **{product}**: R$ {total_sales:,.2f}")
+
+    return "\n".join(report), analysis_data
+
+
+def normalize_report(report):
+    """Ordena o nome das colunas de cada par de correlação, cuja ordem no par é arbitrária."""
+    def sort_pair(match):
+        first, second = sorted([match.group(1), match.group(2)])
+        return f"**`{first}`** e **`{second}`**"
+    return re.sub(r"\*\*`([^`]+)`\*\* e \*\*`([^`]+)`\*\*", sort_pair, report)
+
+
+def best_of(func, df, repeat):
+    """Executa `func(df)` `repeat` vezes e retorna o melhor tempo e o último resultado."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(sizes):
+    print(f"{'linhas':>12} | {'anterior (s)':>12} | {'atual (s)':>10} | {'ganho':>6}")
+    print("-" * 50)
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        repeat = 3 if n_rows <= 1_000_000 else 1
+        legacy_time, (legacy_report, _) = best_of(legacy_analyze_dataframe, df, repeat)
+        current_time, (current_report, _) = best_of(ai_analyzer.analyze_dataframe, df, repeat)
+        if normalize_report(legacy_report) != normalize_report(current_report):
+            raise AssertionError(f"Os relatórios divergem para {n_rows} linhas.")
+        print(f"{n_rows:>12,} | {legacy_time:>12.3f} | {current_time:>10.3f} | {legacy_time / current_time:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
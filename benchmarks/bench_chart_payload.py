@@ -0,0 +1,67 @@
+"""
+Benchmark do tamanho das figuras e do tempo de montagem dos histogramas e boxplots.
+
+Compara os gráficos montados com dados brutos (`px.histogram` / `px.box`, como antes) com os
+montados a partir das estatísticas calculadas no servidor (`utils.chart_stats`). O tamanho é o do
+JSON da figura, que é o que o Streamlit envia ao navegador; o tempo é o de calcular e serializar a
+figura no servidor. O tempo de desenho no navegador não é medido aqui, mas acompanha o tamanho
+do JSON.
+
+Uso:
+    python benchmarks/bench_chart_payload.py [n_linhas ...]
+"""
+import os
+import sys
+import time
+
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ai_analyzer import make_frame
+from components.visualizations import _box_figure, _histogram_figure
+from utils import chart_stats
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+PALETTE = px.colors.qualitative.Plotly
+
+
+def measure(build):
+    """Retorna (bytes do JSON, segundos) para montar e serializar a figura."""
+    start = time.perf_counter()
+    payload = build().to_json()
+    return len(payload), time.perf_counter() - start
+
+
+def raw_histogram(df):
+    return px.histogram(df, x='Vendas', nbins=30, color_discrete_sequence=[PALETTE[0]])
+
+
+def stats_histogram(df):
+    counts, edges = chart_stats.histogram_bins(df['Vendas'])
+    return _histogram_figure(counts, edges, 'Vendas', PALETTE[0])
+
+
+def raw_box(df):
+    return px.box(df, x='Regiao', y='Vendas', color='Regiao', color_discrete_sequence=PALETTE)
+
+
+def stats_box(df):
+    return _box_figure(chart_stats.box_stats(df, 'Regiao', 'Vendas'), 'Regiao', 'Vendas', PALETTE)
+
+
+def main(sizes):
+    print(f"{'linhas':>10} | {'gráfico':>10} | {'bruto (KB)':>11} | {'stats (KB)':>10} | {'bruto (s)':>9} | {'stats (s)':>9}")
+    print("-" * 75)
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        for name, raw, stats in [('histograma', raw_histogram, stats_histogram), ('boxplot', raw_box, stats_box)]:
+            raw_bytes, raw_time = measure(lambda: raw(df))
+            stats_bytes, stats_time = measure(lambda: stats(df))
+            print(f"{n_rows:>10,} | {name:>10} | {raw_bytes / 1024:>11,.1f} | {stats_bytes / 1024:>10,.1f} | "
+                  f"{raw_time:>9.3f} | {stats_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,73 @@
+"""
+Benchmark da análise de correlação (`models.correlation`) em planilhas largas.
+
+Compara `df.corr()` + `unstack().sort_values().drop_duplicates()` (a implementação anterior do
+passo 3 da análise) com o motor atual em float64, em float32 e no modo amostrado, e mostra o
+maior desvio da matriz em relação ao pandas.
+
+Uso:
+    python benchmarks/bench_correlation.py [n_linhas [n_colunas]]
+
+Sem argumentos, executa com 100 mil linhas e 500 colunas.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.correlation import STRONG_CORRELATION, correlation_matrix, top_correlated_pairs
+
+DEFAULT_ROWS = 100_000
+DEFAULT_COLUMNS = 500
+
+
+def make_wide_frame(n_rows, n_cols, seed=42):
+    """Gera colunas em grupos de fatores latentes, para que existam pares fortemente correlacionados."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_rows, max(1, n_cols // 10)))
+    loadings = rng.normal(size=(factors.shape[1], n_cols)) * (rng.random((factors.shape[1], n_cols)) < 0.1)
+    values = factors @ loadings + rng.normal(scale=0.5, size=(n_rows, n_cols))
+    return pd.DataFrame(values, columns=[f"col_{i:03d}" for i in range(n_cols)])
+
+
+def legacy_pairs(df):
+    corr_matrix = df.corr()
+    corr_pairs = corr_matrix.unstack().sort_values(ascending=False).drop_duplicates()
+    return corr_matrix, corr_pairs[(corr_pairs < 1) & (corr_pairs.abs() > STRONG_CORRELATION)]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main(n_rows, n_cols):
+    df = make_wide_frame(n_rows, n_cols)
+    columns = df.columns.tolist()
+    print(f"{n_rows:,} linhas x {n_cols} colunas")
+    print(f"{'método':>22} | {'tempo (s)':>9} | {'pares fortes':>12} | {'desvio máx.':>11}")
+    print("-" * 64)
+
+    legacy_time, (reference, legacy) = timed(legacy_pairs, df)
+    print(f"{'pandas (anterior)':>22} | {legacy_time:>9.3f} | {len(legacy):>12,} | {'-':>11}")
+
+    variants = [
+        ("float64", dict(dtype=np.float64)),
+        ("float32", dict(dtype=np.float32)),
+        ("amostra de 20 mil", dict(sample_rows=20_000)),
+    ]
+    for label, options in variants:
+        elapsed, (corr, _) = timed(correlation_matrix, df, columns, **options)
+        pairs_time, (_, total) = timed(top_correlated_pairs, corr)
+        deviation = np.nanmax(np.abs(corr.to_numpy() - reference.to_numpy()))
+        print(f"{label:>22} | {elapsed + pairs_time:>9.3f} | {total:>12,} | {deviation:>11.2e}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [DEFAULT_ROWS, DEFAULT_COLUMNS][len(args):]))
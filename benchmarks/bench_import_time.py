@@ -0,0 +1,180 @@
+"""
+Mede o tempo até a primeira renderização do dashboard com `python -X importtime`.
+
+Cada repetição abre um processo novo, como um container recém-iniciado, que importa o Streamlit
+(já carregado pelo servidor quando a sessão começa) e executa o `dashboard.py` em modo bare, sem
+arquivo carregado, exatamente como na primeira visita à página. O script mede:
+
+    primeira_renderizacao   tempo de execução do `dashboard.py`, importações incluídas
+    importacoes             os módulos importados pelo script, pelo tempo acumulado (-X importtime)
+    adiados                 o custo de importação de cada módulo pesado que deve ficar fora da
+                            primeira renderização e só ser carregado na etapa que o usa
+
+Termina com código 1 se algum módulo adiado for importado na primeira renderização ou, com
+`--referencia`, se o menor tempo passar de `(1 + limite)` vezes o de um JSON anterior.
+
+Uso:
+    python benchmarks/bench_import_time.py --saida importacoes.json
+    python benchmarks/bench_import_time.py --referencia importacoes.json --limite 0.2
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_BENCH_THRESHOLD: limite padrão de regressão, como fração do tempo de referência
+        (padrão: 0,25).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_THRESHOLD = float(os.environ.get("DASHBOARD_BENCH_THRESHOLD", 0.25))
+# Módulos que só podem ser importados na etapa que os usa (o Statsmodels e o Kaleido só em um
+# gráfico de dispersão com regressão ou na rasterização do PDF)
+DEFERRED_MODULES = [
+    'pandas', 'numpy', 'utils.data_loader', 'models.ai_analyzer', 'components.visualizations',
+    'plotly.express', 'utils.pdf_generator', 'fpdf', 'kaleido', 'statsmodels', 'duckdb',
+]
+
+# Executado no processo medido; imprime o resultado como JSON na última linha da saída
+FIRST_RENDER_SCRIPT = """
+import json, logging, runpy, sys, time
+logging.disable(logging.WARNING)  # Avisos do modo bare do Streamlit
+import streamlit
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+runpy.run_path({dashboard!r}, run_name='__main__')
+elapsed = time.perf_counter() - start
+print(json.dumps({{'segundos': elapsed, 'carregados': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+IMPORT_SCRIPT = """
+import sys, time
+import streamlit, pandas
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Lê a saída de `-X importtime`.
+
+    Returns:
+        list: (módulo, profundidade, tempo acumulado em segundos), na ordem em que as importações
+        terminaram.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Cabeçalho
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(cumulative) / 1e6))
+    return entries
+
+
+def measure_first_render(env):
+    script = FIRST_RENDER_SCRIPT.format(root=ROOT, dashboard=os.path.join(ROOT, 'dashboard.py'),
+                                        deferred=DEFERRED_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # As importações de primeiro nível depois da do Streamlit são as feitas pelo dashboard
+    entries = parse_importtime(result.stderr)
+    after_streamlit = next(i for i, (name, depth, _) in enumerate(entries) if name == 'streamlit' and depth == 0)
+    measured['importacoes'] = sorted(
+        ((name, seconds) for name, depth, seconds in entries[after_streamlit + 1:] if depth == 0),
+        key=lambda item: item[1], reverse=True
+    )
+    return measured
+
+
+def measure_deferred(env):
+    """Custo de importação de cada módulo adiado, com o Streamlit e o pandas já carregados."""
+    costs = {}
+    for module in DEFERRED_MODULES:
+        if module in ('pandas', 'numpy'):
+            continue
+        result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(root=ROOT, module=module)],
+                                cwd=ROOT, env=env, capture_output=True, text=True)
+        if result.returncode == 0:
+            costs[module] = float(result.stdout.strip().splitlines()[-1])
+    return costs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo até a primeira renderização do dashboard.")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Processos medidos (padrão: 5).")
+    parser.add_argument("--saida", default="resultados_importacao.json", help="Arquivo JSON dos resultados.")
+    parser.add_argument("--referencia", help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument("--limite", type=float, default=DEFAULT_THRESHOLD,
+                        help="Regressão tolerada, como fração do tempo de referência (padrão: 0,25).")
+    parser.add_argument("--top", type=int, default=10, help="Importações exibidas (padrão: 10).")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Caches e métricas do dashboard ficam fora do diretório do usuário
+        env = dict(os.environ, DASHBOARD_CACHE_DIR=os.path.join(directory, 'cache'))
+        env.pop('DASHBOARD_METRICS_FILE', None)
+        runs = [measure_first_render(env) for _ in range(args.repeticoes)]
+        deferred = measure_deferred(env)
+
+    fastest = min(runs, key=lambda run: run['segundos'])
+    loaded = sorted({module for run in runs for module in run['carregados']})
+    results = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticoes': args.repeticoes,
+        'primeira_renderizacao_s': {'min_s': fastest['segundos'],
+                                    'mediana_s': sorted(run['segundos'] for run in runs)[len(runs) // 2]},
+        'importacoes': dict(fastest['importacoes']),
+        'adiados': deferred,
+        'adiados_carregados': loaded,
+    }
+
+    print(f"Primeira renderização: mín {results['primeira_renderizacao_s']['min_s'] * 1000:.1f} ms, "
+          f"mediana {results['primeira_renderizacao_s']['mediana_s'] * 1000:.1f} ms")
+    print("\nImportações do dashboard (tempo acumulado):")
+    for name, seconds in fastest['importacoes'][:args.top]:
+        print(f"  {name:<40} {seconds * 1000:9.1f} ms")
+    print("\nMódulos adiados (custo pago na etapa que os usa):")
+    for module, seconds in sorted(deferred.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {module:<40} {seconds * 1000:9.1f} ms")
+    missing = [module for module in DEFERRED_MODULES if module not in deferred and module not in ('pandas', 'numpy')]
+    if missing:
+        print(f"  (não instalados: {', '.join(missing)})")
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em '{args.saida}'.")
+
+    status = 0
+    if loaded:
+        print(f"\nFALHA: importado(s) na primeira renderização: {', '.join(loaded)}.")
+        status = 1
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as f:
+            previous = json.load(f)['primeira_renderizacao_s']['min_s']
+        current = results['primeira_renderizacao_s']['min_s']
+        if current > previous * (1 + args.limite):
+            print(f"\nFALHA: primeira renderização {previous * 1000:.1f} ms -> {current * 1000:.1f} ms "
+                  f"(+{current / previous - 1:.0%}, limite {args.limite:.0%}).")
+            status = 1
+        else:
+            print(f"Nenhuma regressão acima de {args.limite:.0%} em relação a '{args.referencia}'.")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
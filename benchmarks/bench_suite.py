@@ -0,0 +1,199 @@
+"""
+Suíte de benchmarks de ponta a ponta do dashboard, com detecção de regressões.
+
+Para cada escala, gera os dados com `gerar_excel.gerar_dados` (semente fixa), grava o arquivo
+no formato escolhido e mede as etapas do dashboard:
+
+    carregamento   `data_loader.load_data` com os caches (Streamlit, registro e disco) vazios
+    filtros        o bloco de filtros do dashboard (índice de filtros, máscara e recorte)
+    analise        `ai_analyzer.analyze_dataframe` sobre o backend filtrado
+    visualizacoes  `visualizations.render_visualizations` (Streamlit em modo bare)
+    pdf            `pdf_generator.create_pdf_report` com o cache de imagens desligado
+
+Cada etapa roda várias vezes e o JSON de resultados guarda o menor tempo e a mediana. Com
+`--referencia`, os menores tempos são comparados aos de um JSON anterior e o script termina com
+código 1 se alguma etapa ficar mais lenta que o limite configurado.
+
+Uso:
+    python benchmarks/bench_suite.py --saida resultados.json
+    python benchmarks/bench_suite.py --linhas 10000 100000 --referencia resultados.json --limite 0.2
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_BENCH_THRESHOLD: limite padrão de regressão, como fração do tempo de referência
+        (padrão: 0,25).
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_THRESHOLD = float(os.environ.get("DASHBOARD_BENCH_THRESHOLD", 0.25))
+# Diferenças abaixo disso são ruído de medição, mesmo que passem do limite relativo
+MIN_REGRESSION_SECONDS = 0.01
+STAGES = ['carregamento', 'filtros', 'analise', 'visualizacoes', 'pdf']
+
+
+def filter_scenario(options):
+    """Primeira metade do período e metade dos valores da primeira coluna categórica."""
+    selected_filters = {}
+    if options['date_col'] is not None:
+        start, end = options['date_min'], options['date_max']
+        selected_filters['date_range'] = (start.normalize(), (start + (end - start) / 2).normalize())
+        selected_filters['date_col'] = options['date_col']
+    for col, values in options['categories'].items():
+        selected_filters[col] = values[:max(1, len(values) // 2)]
+        break
+    return selected_filters
+
+
+def run_pipeline(path, timings):
+    """Executa as etapas do dashboard uma vez sobre o arquivo, acumulando os tempos em `timings`."""
+    import streamlit as st
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+    from components.visualizations import render_visualizations
+    from gerar_relatorios import MARKDOWN_PATTERN
+    from models import ai_analyzer
+    from utils import data_loader
+    from utils.compute_backend import DataFrameBackend
+    from utils.filter_index import filter_options, get_filter_index
+    from utils.pdf_generator import create_pdf_report
+
+    # Cada repetição parte dos caches vazios (e do registro de datasets vazio), como no primeiro
+    # upload do arquivo
+    st.session_state.clear()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    data_loader.dataset_cache.purge()
+    data_loader.mapped_cache.purge()
+    with open(path, 'rb') as f:
+        record = UploadedFileRec(file_id=path, name=os.path.basename(path),
+                                 type='application/octet-stream', data=f.read())
+    uploaded_file = UploadedFile(record, None)
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        result = function()
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    df_original = timed('carregamento', lambda: data_loader.load_data(uploaded_file))
+    selected_filters = filter_scenario(filter_options(df_original))
+
+    def apply_filters():
+        mask = get_filter_index(df_original).mask(selected_filters)
+        return df_original if mask is None else df_original[mask]
+
+    df = timed('filtros', apply_filters)
+    dataset = DataFrameBackend(df, df_original, selected_filters)
+    report, analysis_data = timed('analise', lambda: ai_analyzer.analyze_dataframe(dataset))
+    charts, _ = timed('visualizacoes', lambda: render_visualizations(df, analysis_data, None, dataset))
+    if importlib.util.find_spec("kaleido") is not None:
+        timed('pdf', lambda: create_pdf_report(re.sub(MARKDOWN_PATTERN, '', report), charts))
+
+
+def run_scale(n_rows, file_format, repeat, directory):
+    from gerar_excel import gerar_dados, salvar_dados
+
+    path = os.path.join(directory, f"vendas_{n_rows}.{file_format}")
+    salvar_dados(gerar_dados(n_rows), path)
+    timings = {}
+    for _ in range(repeat):
+        run_pipeline(path, timings)
+    return {
+        stage: {'min_s': min(values), 'mediana_s': statistics.median(values)}
+        for stage, values in timings.items()
+    }
+
+
+def find_regressions(results, reference, threshold):
+    """Lista as etapas cujo menor tempo passou de `(1 + threshold)` vezes o da referência."""
+    regressions = []
+    for n_rows, stages in results['escalas'].items():
+        for stage, current in stages.items():
+            previous = reference.get('escalas', {}).get(n_rows, {}).get(stage)
+            if previous is None:
+                continue
+            limit = previous['min_s'] * (1 + threshold)
+            if current['min_s'] > limit and current['min_s'] - previous['min_s'] > MIN_REGRESSION_SECONDS:
+                regressions.append((int(n_rows), stage, previous['min_s'], current['min_s']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de ponta a ponta do dashboard.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Escalas, em linhas (padrão: 10 mil, 100 mil e 1 milhão).")
+    parser.add_argument("--formato", choices=['xlsx', 'csv', 'parquet'], default='parquet',
+                        help="Formato do arquivo carregado (padrão: parquet).")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por escala (padrão: 3).")
+    parser.add_argument("--saida", default="resultados_benchmark.json", help="Arquivo JSON dos resultados.")
+    parser.add_argument("--referencia", help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument("--limite", type=float, default=DEFAULT_THRESHOLD,
+                        help="Regressão tolerada, como fração do tempo de referência (padrão: 0,25).")
+    args = parser.parse_args(argv)
+
+    reference = None
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as f:
+            reference = json.load(f)
+
+    results = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'formato': args.formato,
+        'repeticoes': args.repeticoes,
+        'escalas': {},
+    }
+    # Fora do servidor, o Streamlit avisa a cada widget que está em modo bare
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        # O cache em disco do carregador vai para um diretório temporário, sem tocar no do usuário
+        os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(directory, 'cache')
+        from utils import chart_renderer
+        chart_renderer.IMAGE_CACHE_MAX_BYTES = 0
+
+        for n_rows in args.linhas:
+            stages = run_scale(n_rows, args.formato, args.repeticoes, directory)
+            results['escalas'][str(n_rows)] = stages
+            print(f"\n{n_rows:,} linhas:")
+            for stage in STAGES:
+                if stage in stages:
+                    print(f"  {stage:<14} mín {stages[stage]['min_s'] * 1000:9.1f} ms"
+                          f"   mediana {stages[stage]['mediana_s'] * 1000:9.1f} ms")
+                else:
+                    print(f"  {stage:<14} (não medido: Kaleido não instalado)")
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em '{args.saida}'.")
+
+    if reference is None:
+        return 0
+    regressions = find_regressions(results, reference, args.limite)
+    if not regressions:
+        print(f"Nenhuma regressão acima de {args.limite:.0%} em relação a '{args.referencia}'.")
+        return 0
+    print(f"\n{len(regressions)} regressão(ões) acima de {args.limite:.0%}:")
+    for n_rows, stage, previous, current in regressions:
+        print(f"  {n_rows:>12,} linhas  {stage:<14} {previous * 1000:9.1f} ms -> {current * 1000:9.1f} ms"
+              f" (+{current / previous - 1:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,217 @@
+"""
+Verifica a ingestão incremental de arquivos que crescem por acréscimo de linhas.
+
+Gera um histórico com `gerar_excel.gerar_dados`, grava a versão de ontem (o histórico) e a de
+hoje (o histórico mais as vendas do dia) no formato escolhido e carrega as duas em sequência,
+como na atualização diária do dashboard. A versão de hoje é carregada de dois jeitos:
+
+    incremental   com a detecção de acréscimos ligada: só as linhas novas são convertidas e o
+                  catálogo de colunas, o índice de filtros, o cubo OLAP e os rollups vêm das
+                  estruturas de ontem
+    completa      com a detecção desligada e os caches vazios, como antes
+
+Confere que os dois caminhos produzem o mesmo dataset, o mesmo catálogo de colunas, o mesmo
+índice de filtros, as mesmas células do cubo, os mesmos rollups e o mesmo relatório da análise,
+e compara os tempos. Por fim, carrega uma versão de hoje em que uma linha de ontem foi editada
+com um valor que não cabe no tipo compacto da coluna (ex.: 263 em 'Quantidade', guardada em
+int8) e confere que ela não é aceita como acréscimo.
+Termina com código 1 se houver divergências.
+
+Uso:
+    python benchmarks/check_append_ingestion.py [--linhas 1000000] [--novas 10000] [--formato csv]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_today(path, incremental):
+    """Carrega a versão de hoje e monta as estruturas derivadas; retorna (resultado, tempos)."""
+    from models import ai_analyzer
+    from utils import append_ingestion, data_loader, rollups
+    from utils.column_profile import get_column_catalog
+    from utils.compute_backend import DataFrameBackend
+    from utils.filter_index import get_filter_index
+    from utils.olap_cube import get_cube
+
+    append_ingestion.APPEND_INGESTION = incremental
+    timings = {}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        result = function()
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    df = timed('leitura', lambda: data_loader.read_dataset(data, path))
+    catalog = timed('catalogo', lambda: get_column_catalog(df))
+    index = timed('indice', lambda: get_filter_index(df))
+    cube = timed('cubo', lambda: get_cube(df))
+    value_cols = DataFrameBackend(df).column_types()[0]
+    store = timed('rollups', lambda: rollups.get_rollup_store(df, index.date_col, value_cols))
+    report, _ = timed('analise', lambda: ai_analyzer.analyze_dataframe(DataFrameBackend(df)))
+    return {'df': df, 'catalog': catalog, 'index': index, 'cube': cube, 'rollups': store, 'report': report}, timings
+
+
+def _same(a, b):
+    if a is None or b is None or not np.isscalar(a) or not np.isscalar(b):
+        return a == b
+    return a == b or (pd.isna(a) and pd.isna(b))
+
+
+def compare(incremental, full):
+    """Lista as divergências entre os resultados dos dois caminhos."""
+    problems = []
+    try:
+        pd.testing.assert_frame_equal(incremental['df'], full['df'], check_dtype=False, check_categorical=False)
+    except AssertionError as e:
+        problems.append(f"dataset: {e}")
+
+    for col, profile in full['catalog'].profiles.items():
+        other = incremental['catalog'].profiles[col]
+        # Como no dataset, o tipo pode diferir (ex.: inteiros promovidos só o necessário no acréscimo)
+        differences = [key for key, value in profile.items() if key != 'dtype' and not _same(value, other[key])]
+        if differences:
+            problems.append(f"catálogo: '{col}' ({', '.join(differences)})")
+
+    a, b = incremental['index'], full['index']
+    if set(a.bitmaps) != set(b.bitmaps):
+        problems.append(f"índice: colunas {sorted(a.bitmaps)} != {sorted(b.bitmaps)}")
+    for col in set(a.bitmaps) & set(b.bitmaps):
+        if set(a.bitmaps[col]) != set(b.bitmaps[col]) or any(
+                not np.array_equal(bitmap, b.bitmaps[col][value]) for value, bitmap in a.bitmaps[col].items()):
+            problems.append(f"índice: bitmaps de '{col}'")
+    if a.date_col is not None:
+        order_a = np.arange(a.n_rows) if a.date_order is None else a.date_order
+        order_b = np.arange(b.n_rows) if b.date_order is None else b.date_order
+        if not np.array_equal(order_a, order_b) or not np.array_equal(a.sorted_dates, b.sorted_dates):
+            problems.append("índice: ordem das datas")
+
+    if (incremental['cube'] is None) != (full['cube'] is None):
+        problems.append("cubo: montado em só um dos caminhos")
+    elif full['cube'] is not None:
+        cells_a, cells_b = (
+            cube.cells.set_axis(cube.cells.index.to_frame().astype(str).apply(tuple, axis=1)).sort_index()
+            for cube in (incremental['cube'], full['cube'])
+        )
+        if not cells_a.index.equals(cells_b.index) or not np.allclose(cells_a.to_numpy(), cells_b.to_numpy()):
+            problems.append("cubo: células diferentes")
+
+    for granularity, level in full['rollups'].levels.items():
+        other = incremental['rollups'].levels[granularity]
+        if not level.index.equals(other.index) or not np.allclose(
+                level.to_numpy(dtype='float64'), other[level.columns].to_numpy(dtype='float64'), equal_nan=True):
+            problems.append(f"rollups: granularidade '{granularity}'")
+
+    if incremental['report'] != full['report']:
+        problems.append("relatório da análise diferente")
+    return problems
+
+
+def check_edited_row(path, dados, n_rows):
+    """
+    Carrega uma versão de hoje com a primeira linha de ontem editada (+256 em 'Quantidade') e
+    retorna as divergências: a edição exige a recarga completa do arquivo.
+    """
+    import streamlit as st
+    from gerar_excel import salvar_dados
+    from utils import append_ingestion, data_loader
+
+    append_ingestion.APPEND_INGESTION = True
+    st.cache_resource.clear()
+    data_loader.dataset_cache.purge()
+    data_loader.mapped_cache.purge()
+
+    salvar_dados(dados.iloc[:n_rows], path)
+    with open(path, 'rb') as f:
+        data_loader.read_dataset(f.read(), path)
+
+    edited = dados.copy()
+    edited.loc[0, 'Quantidade'] += 256
+    salvar_dados(edited, path)
+    with open(path, 'rb') as f:
+        df = data_loader.read_dataset(f.read(), path)
+
+    problems = []
+    if df.attrs.get('append') is not None:
+        problems.append("linha editada aceita como acréscimo")
+    if int(df['Quantidade'].sum()) != int(edited['Quantidade'].sum()):
+        problems.append(f"soma de 'Quantidade': {int(df['Quantidade'].sum())} != {int(edited['Quantidade'].sum())}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica a ingestão incremental por acréscimo de linhas.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Linhas do histórico (padrão: 1 milhão).")
+    parser.add_argument("--novas", type=int, default=10_000, help="Linhas acrescentadas (padrão: 10 mil).")
+    parser.add_argument("--formato", choices=['csv', 'parquet', 'xlsx'], default='csv',
+                        help="Formato do arquivo (padrão: csv).")
+    args = parser.parse_args(argv)
+
+    # Fora do servidor, o Streamlit avisa a cada cache que está em modo bare
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(directory, 'cache')
+        import streamlit as st
+        from gerar_excel import gerar_dados, salvar_dados
+        from utils import data_loader
+
+        dados = gerar_dados(args.linhas + args.novas)
+        path = os.path.join(directory, f"vendas.{args.formato}")
+        if args.formato == 'csv':
+            # O CSV de hoje é o de ontem com as linhas novas no fim, como um arquivo exportado todo dia
+            dados.iloc[:args.linhas].to_csv(path, index=False)
+            yesterday = open(path, 'rb').read()
+            today = yesterday + dados.iloc[args.linhas:].to_csv(index=False, header=False).encode('utf-8')
+        else:
+            salvar_dados(dados.iloc[:args.linhas], path)
+            yesterday = open(path, 'rb').read()
+            salvar_dados(dados, path)
+            today = open(path, 'rb').read()
+
+        print(f"Histórico: {args.linhas:,} linhas; acréscimo: {args.novas:,} linhas ({args.formato})")
+        results = {}
+        for label, incremental in [('completa', False), ('incremental', True)]:
+            st.cache_resource.clear()
+            data_loader.dataset_cache.purge()
+            data_loader.mapped_cache.purge()
+            # Ontem: o histórico é carregado e as suas estruturas ficam nos caches
+            with open(path, 'wb') as f:
+                f.write(yesterday)
+            load_today(path, incremental)
+            with open(path, 'wb') as f:
+                f.write(today)
+            results[label], timings = load_today(path, incremental)
+            total = sum(timings.values())
+            steps = "  ".join(f"{stage} {seconds * 1000:8.1f} ms" for stage, seconds in timings.items())
+            print(f"  {label:<12} total {total * 1000:9.1f} ms   {steps}")
+
+        if results['incremental']['df'].attrs.get('append') is None:
+            print("\nFALHA: a versão de hoje não foi reconhecida como acréscimo.")
+            return 1
+        problems = compare(results['incremental'], results['completa'])
+        problems += check_edited_row(path, dados, args.linhas)
+
+    if problems:
+        print(f"\nFALHA: {len(problems)} divergência(s):")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\nOK: a carga incremental produz o mesmo dataset, catálogo, índice, cubo, rollups e relatório, "
+          "e uma linha editada força a recarga completa.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+"""
+Verificação de paridade entre os backends de cálculo (`utils.compute_backend`).
+
+Para cada dataset e combinação de filtros, gera o relatório da análise com o `DataFrameBackend`
+(pandas, em memória) e com o `DuckDBBackend` (consultas sobre o Parquet) e compara os relatórios,
+os KPIs, os quantis, as médias por grupo e as tabelas cruzadas. Termina com código 1 se alguma comparação divergir.
+
+Uso:
+    python benchmarks/check_backend_parity.py [n_linhas]
+
+Sem argumentos, usa 200 mil linhas sintéticas, além da planilha de exemplo do repositório.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ai_analyzer import make_frame, normalize_report
+from models import ai_analyzer
+from utils.compute_backend import DataFrameBackend, DuckDBBackend
+from utils.data_loader import read_dataset
+from utils.dtype_optimizer import optimize_dtypes
+
+DEFAULT_ROWS = 200_000
+SAMPLE_WORKBOOK = os.path.join(ROOT, "dados_vendas_realistas.xlsx")
+
+
+def synthetic_dataset(n_rows):
+    """Dataset sintético com tipos otimizados e valores ausentes em colunas numéricas e categóricas."""
+    df = make_frame(n_rows)
+    rng = np.random.default_rng(7)
+    df.loc[rng.random(n_rows) < 0.01, 'Desconto(%)'] = np.nan
+    df['Regiao'] = df['Regiao'].astype(object)
+    df.loc[rng.random(n_rows) < 0.01, 'Regiao'] = None
+    df, _ = optimize_dtypes(df)
+    return df
+
+
+def filter_scenarios(options):
+    """Combinações de filtros no formato de `sidebar.show_filters`."""
+    scenarios = {'sem filtros': {}}
+    if options['date_col'] is not None:
+        start, end = options['date_min'], options['date_max']
+        middle = start + (end - start) / 2
+        scenarios['intervalo de datas'] = {'date_range': (start.normalize(), middle.normalize()),
+                                           'date_col': options['date_col']}
+    for col, values in options['categories'].items():
+        scenarios[f'{col} parcial'] = {col: values[:max(1, len(values) // 2)]}
+        scenarios[f'{col} vazio'] = {col: []}
+        break
+    return scenarios
+
+
+def compare(label, pandas_backend, duckdb_backend):
+    """Compara os dois backends e retorna a lista de divergências encontradas."""
+    problems = []
+    pandas_report, _ = ai_analyzer.analyze_dataframe(pandas_backend)
+    duckdb_report, _ = ai_analyzer.analyze_dataframe(duckdb_backend)
+    if normalize_report(pandas_report) != normalize_report(duckdb_report):
+        problems.append("relatórios diferentes")
+
+    numeric_cols, categorical_cols, _ = pandas_backend.column_types()
+    if (numeric_cols, categorical_cols) != duckdb_backend.column_types()[:2]:
+        problems.append("tipos de colunas diferentes")
+    if pandas_backend.num_rows() != duckdb_backend.num_rows():
+        problems.append("número de linhas diferente")
+    for col in numeric_cols:
+        if not np.isclose(float(pandas_backend.sum(col)), float(duckdb_backend.sum(col)), rtol=1e-9):
+            problems.append(f"soma de {col} diferente")
+    if pandas_backend.num_rows():
+        pandas_quantiles = pandas_backend.quantiles(numeric_cols, [0.1, 0.5, 0.9]).to_numpy(dtype=float)
+        duckdb_quantiles = duckdb_backend.quantiles(numeric_cols, [0.1, 0.5, 0.9]).to_numpy(dtype=float)
+        if not np.allclose(pandas_quantiles, duckdb_quantiles, equal_nan=True):
+            problems.append("quantis diferentes")
+    if categorical_cols and numeric_cols:
+        by, metric = categorical_cols[0], numeric_cols[0]
+        pandas_means = pandas_backend.grouped_mean(by, metric)
+        duckdb_means = duckdb_backend.grouped_mean(by, metric)
+        if (pandas_means.index.astype(str).tolist() != duckdb_means.index.astype(str).tolist()
+                or not np.allclose(pandas_means.to_numpy(dtype=float), duckdb_means.to_numpy(dtype=float), equal_nan=True)):
+            problems.append(f"médias de {metric} por {by} diferentes")
+    if len(categorical_cols) >= 2:
+        a, b = categorical_cols[:2]
+        pandas_table = pandas_backend.crosstab(a, b)
+        duckdb_table = duckdb_backend.crosstab(a, b)
+        pandas_table.index = pandas_table.index.astype(str)
+        pandas_table.columns = pandas_table.columns.astype(str)
+        if not pandas_table.equals(duckdb_table.rename(index=str, columns=str)):
+            problems.append(f"tabela cruzada {a} x {b} diferente")
+
+    status = "ok" if not problems else "DIVERGE: " + ", ".join(problems)
+    print(f"  {label:<32} {pandas_backend.num_rows():>10,} linhas  {status}")
+    return problems
+
+
+def check_dataset(name, df, directory):
+    path = os.path.join(directory, f"{name}.parquet")
+    df.to_parquet(path, index=False)
+    pandas_backend = DataFrameBackend(df)
+    duckdb_backend = DuckDBBackend(path)
+
+    print(f"{name}:")
+    failures = 0
+    for label, selected_filters in filter_scenarios(pandas_backend.filter_options()).items():
+        failures += bool(compare(label, pandas_backend.filtered(selected_filters),
+                                 duckdb_backend.filtered(selected_filters)))
+    return failures
+
+
+def main(n_rows):
+    start = time.perf_counter()
+    datasets = {'sintetico': synthetic_dataset(n_rows)}
+    if os.path.exists(SAMPLE_WORKBOOK):
+        with open(SAMPLE_WORKBOOK, 'rb') as f:
+            datasets['planilha_exemplo'] = read_dataset(f.read(), SAMPLE_WORKBOOK)
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = sum(check_dataset(name, df, directory) for name, df in datasets.items())
+    print(f"\n{failures} cenário(s) com divergência ({time.perf_counter() - start:.1f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS))
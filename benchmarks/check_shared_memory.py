@@ -0,0 +1,126 @@
+"""
+Verifica que processos extras do servidor não duplicam o dataset na memória.
+
+Gera um dataset, carrega-o uma vez (o que grava os caches em disco) e abre N processos que
+carregam o mesmo arquivo com `data_loader.read_dataset` e percorrem todas as colunas, ficando
+vivos ao mesmo tempo. Para cada processo, mede o crescimento da memória anônima (RssAnon), que não
+é compartilhada entre processos: com o cache mapeado, as colunas vêm das páginas do arquivo Arrow,
+compartilhadas pelo sistema operacional, e esse crescimento deve ficar pequeno perto do tamanho
+do dataset.
+
+Para comparação, a mesma medida é feita com o cache mapeado desligado (leitura do Parquet).
+Termina com código 1 se o crescimento médio por processo com o cache mapeado passar do limite.
+
+Uso:
+    python benchmarks/check_shared_memory.py [n_linhas] [n_processos]
+
+Sem argumentos, usa 2 milhões de linhas e 4 processos. Requer Linux (ou o psutil instalado).
+"""
+import importlib.util
+import multiprocessing
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = 2_000_000
+DEFAULT_WORKERS = 4
+# Crescimento máximo da memória privada por processo, como fração do tamanho do dataset
+MAX_PRIVATE_FRACTION = 0.15
+
+
+def private_memory_bytes():
+    """
+    Memória anônima (não compartilhável) do processo atual: RssAnon do /proc no Linux, ou
+    RSS menos as páginas de arquivos pelo psutil.
+    """
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) * 1024
+    if importlib.util.find_spec("psutil") is not None:
+        import psutil
+        info = psutil.Process().memory_info()
+        return info.rss - getattr(info, 'shared', 0)
+    raise RuntimeError("Não foi possível medir a memória privada (instale o psutil).")
+
+
+def _worker(path, mapped, results, release):
+    # Processo novo ('spawn'): a configuração vale antes de importar o carregador
+    os.environ['DASHBOARD_MMAP_CACHE'] = '1' if mapped else '0'
+    import numpy as np
+    import pandas as pd
+
+    from utils.data_loader import read_dataset
+
+    before = private_memory_bytes()
+    with open(path, 'rb') as f:
+        data = f.read()
+    df = read_dataset(data, path)
+    del data
+    # Lê todas as páginas de todas as colunas, sem alocar cópias temporárias delas
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series.cat.codes.to_numpy().max()
+        elif series.dtype.kind in 'biufmM':
+            np.nanmax(series.to_numpy())
+        else:
+            series.nunique()
+    results.put(private_memory_bytes() - before)
+    release.wait()  # Fica vivo até todos os processos terem medido
+
+
+def measure(path, mapped, n_workers):
+    """Abre `n_workers` processos simultâneos e retorna o crescimento de memória privada de cada um."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    release = context.Event()
+    workers = [context.Process(target=_worker, args=(path, mapped, results, release)) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    growth = [results.get(timeout=600) for _ in workers]
+    release.set()
+    for worker in workers:
+        worker.join()
+    return growth
+
+
+def main(n_rows, n_workers):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(directory, 'cache')
+        from gerar_excel import gerar_dados
+        from utils.data_loader import read_dataset
+
+        path = os.path.join(directory, 'vendas.parquet')
+        gerar_dados(n_rows).to_parquet(path, index=False)
+        with open(path, 'rb') as f:
+            df = read_dataset(f.read(), path)  # Primeira carga: grava o Parquet e o Arrow do cache
+        dataset_bytes = int(df.memory_usage(deep=True).sum())
+        del df
+        print(f"Dataset: {n_rows:,} linhas, {dataset_bytes / 1024 ** 2:.1f} MB na memória; {n_workers} processo(s)")
+
+        averages = {}
+        for label, mapped in [('parquet (sem cache mapeado)', False), ('arrow mapeado', True)]:
+            growth = measure(path, mapped, n_workers)
+            averages[mapped] = sum(growth) / len(growth)
+            per_worker = ", ".join(f"{value / 1024 ** 2:.1f}" for value in growth)
+            print(f"  {label:<28} memória privada por processo (MB): {per_worker}"
+                  f"  -> média {averages[mapped] / dataset_bytes:.0%} do dataset")
+
+    limit = MAX_PRIVATE_FRACTION * dataset_bytes
+    if averages[True] > limit:
+        print(f"\nFALHA: com o cache mapeado, cada processo extra ocupa {averages[True] / 1024 ** 2:.1f} MB "
+              f"privados (limite: {limit / 1024 ** 2:.1f} MB).")
+        return 1
+    print(f"\nOK: a memória privada por processo extra fica abaixo de {MAX_PRIVATE_FRACTION:.0%} do dataset.")
+    return 0
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WORKERS
+    raise SystemExit(main(rows, workers))
@@ -1,5 +1,6 @@
 import streamlit as st
-import pandas as pd
+
+from utils.file_formats import SUPPORTED_EXTENSIONS
 
 def show_uploader_and_info():
     """
@@ -9,33 +10,68 @@ def show_uploader_and_info():
     st.sidebar.header("⚙️ Configurações")
     
     uploaded_file = st.sidebar.file_uploader(
-        "Carregue sua planilha (Excel)",
-        type=["xlsx", "xls"]
+        "Carregue sua planilha (Excel, CSV ou Parquet)",
+        type=SUPPORTED_EXTENSIONS
     )
     
     st.sidebar.markdown("---")
     st.sidebar.info(
         "Este dashboard utiliza IA para analisar automaticamente os dados de qualquer "
-        "planilha Excel. Carregue um arquivo para começar."
+        "planilha Excel, CSV ou Parquet. Carregue um arquivo para começar."
     )
     
     return uploaded_file
 
-def show_filters(df):
+def show_sheet_selector(sheet_names):
+    """
+    Renderiza a escolha das abas a carregar, quando a planilha tem mais de uma.
+
+    Args:
+        sheet_names (list): As abas da planilha, na ordem do arquivo.
+
+    Retorna as abas escolhidas, na ordem da planilha, ou None se todas estiverem selecionadas.
     """
-    Renderiza os filtros dinâmicos com base no dataframe carregado.
+    if len(sheet_names) <= 1:
+        return None
+
+    selected = st.sidebar.multiselect(
+        "Abas da planilha",
+        sheet_names,
+        default=sheet_names,
+        help="As abas escolhidas são juntadas em um único conjunto de dados, com a aba de origem de cada linha."
+    )
+    if len(selected) == len(sheet_names):
+        return None
+    return [sheet for sheet in sheet_names if sheet in selected]
+
+def show_filters(dataset):
+    """
+    Renderiza os filtros dinâmicos com base no dataset carregado.
+
+    Args:
+        dataset: O DataFrame carregado ou um backend de cálculo (ver `utils.compute_backend`).
+
     Retorna um dicionário com os filtros selecionados.
     """
+    # Só chamada com um arquivo carregado: o pandas fica fora da primeira renderização da página
+    import pandas as pd
+
+    from utils.filter_index import filter_options
+
     st.sidebar.header("🔍 Filtros Globais")
     
     selected_filters = {}
 
+    if isinstance(dataset, pd.DataFrame):
+        options = filter_options(dataset)
+    else:
+        options = dataset.filter_options()
+    date_col = options['date_col']
+
     # Filtro de data
-    date_cols = df.select_dtypes(include=['datetime64[ns]', 'datetimetz']).columns.tolist()
-    if date_cols:
-        date_col = date_cols[0]
-        min_date = df[date_col].min().date()
-        max_date = df[date_col].max().date()
+    if date_col is not None:
+        min_date = options['date_min'].date()
+        max_date = options['date_max'].date()
 
         date_range = st.sidebar.date_input(
             f"Filtro por {date_col}",
@@ -48,12 +84,9 @@ def show_filters(df):
             selected_filters['date_range'] = (pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1]))
             selected_filters['date_col'] = date_col
 
-    # Filtros para colunas categóricas
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    for col in categorical_cols:
-        if df[col].nunique() > 0 and df[col].nunique() < 20: 
-            options = sorted(df[col].unique().tolist())
-            selected = st.sidebar.multiselect(f"Filtro por {col}", options, default=options)
-            selected_filters[col] = selected
+    # Filtros para colunas categóricas (apenas as com menos de 20 valores distintos)
+    for col, options in options['categories'].items():
+        selected = st.sidebar.multiselect(f"Filtro por {col}", options, default=options)
+        selected_filters[col] = selected
             
-    return selected_filters
\ No newline at end of file
+    return selected_filters
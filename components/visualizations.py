@@ -1,13 +1,206 @@
+from contextlib import nullcontext
+
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+
+from utils import chart_stats, downsampling, rollups
+
+def _histogram_figure(counts, edges, col, color):
+    """Monta o histograma a partir das contagens já calculadas no servidor."""
+    fig = go.Figure(data=go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+        marker_color=color, name=col
+    ))
+    fig.update_layout(title=f'Distribuição de {col}', xaxis_title=col, yaxis_title='count', bargap=0)
+    return fig
+
+def _box_figure(stats, cat_col, num_col, color_palette):
+    """Monta o boxplot a partir dos quartis, bigodes e amostra de outliers de cada grupo."""
+    fig = go.Figure()
+    for i, group in enumerate(stats):
+        color = color_palette[i % len(color_palette)]
+        name = str(group['name'])
+        fig.add_trace(go.Box(
+            x=[name], q1=[group['q1']], median=[group['median']], q3=[group['q3']],
+            lowerfence=[group['lowerfence']], upperfence=[group['upperfence']],
+            name=name, marker_color=color, legendgroup=name
+        ))
+        if len(group['outliers']):
+            fig.add_trace(go.Scatter(
+                x=[name] * len(group['outliers']), y=group['outliers'], mode='markers',
+                marker=dict(color=color, size=5), legendgroup=name, showlegend=False,
+                hovertemplate=f"{name}: %{{y}}<extra>outlier ({group['n_outliers']} no total)</extra>"
+            ))
+    fig.update_layout(title=f'Distribuição de {num_col} por {cat_col}', xaxis_title=cat_col, yaxis_title=num_col)
+    return fig
+
+def _prepare_scatter(df, x_col, y_col):
+    """
+    Prepara os dados do gráfico de dispersão, reduzindo os pontos quando necessário.
+
+    A reta de tendência (OLS) é sempre ajustada sobre todas as linhas válidas.
 
-def render_visualizations(df, analysis_data):
+    Returns:
+        dict: Com 'mode' ('pontos', 'amostra' ou 'mapa_calor'), os dados a desenhar,
+        o total de pontos e os coeficientes da reta.
+    """
+    valid = df[[x_col, y_col]].dropna()
+    x = valid[x_col].to_numpy()
+    y = valid[y_col].to_numpy()
+    prepared = {'total_points': len(valid), 'ols': downsampling.ols_fit(x, y),
+                'x_range': (x.min(), x.max()) if len(valid) else None}
+
+    if len(valid) > downsampling.HEATMAP_THRESHOLD:
+        counts, x_centers, y_centers = downsampling.binned_counts(x, y)
+        prepared.update(mode='mapa_calor', counts=counts, x_centers=x_centers, y_centers=y_centers)
+    elif len(valid) > downsampling.DOWNSAMPLE_THRESHOLD:
+        idx = downsampling.density_sample(x, y, downsampling.DOWNSAMPLE_THRESHOLD)
+        prepared.update(mode='amostra', data=valid.iloc[idx])
+    else:
+        prepared.update(mode='pontos', data=valid)
+    return prepared
+
+def _scatter_figure(prepared, x_col, y_col):
+    """Monta o gráfico de dispersão (ou o mapa de calor de densidade) com a reta OLS."""
+    title = f'{y_col} vs. {x_col}'
+    if prepared['mode'] == 'mapa_calor':
+        fig = go.Figure(data=go.Heatmap(
+            z=prepared['counts'], x=prepared['x_centers'], y=prepared['y_centers'],
+            colorscale='Blues', colorbar=dict(title='Pontos')
+        ))
+        fig.update_layout(title=title, xaxis_title=x_col, yaxis_title=y_col)
+        note = f"Mapa de densidade de {prepared['total_points']:,} pontos (dados demais para dispersão)"
+    else:
+        fig = px.scatter(prepared['data'], x=x_col, y=y_col, title=title)
+        note = None
+        if prepared['mode'] == 'amostra':
+            note = f"Amostra por densidade: {len(prepared['data']):,} de {prepared['total_points']:,} pontos"
+
+    if prepared['ols'] is not None:
+        slope, intercept = prepared['ols']
+        x_line = np.array(prepared['x_range'], dtype=np.float64)
+        fig.add_trace(go.Scatter(x=x_line, y=slope * x_line + intercept, mode='lines',
+                                 name='Tendência (OLS)', line=dict(color='red')))
+    if note:
+        fig.add_annotation(text=note, xref='paper', yref='paper',
+                           x=0, y=1.02, xanchor='left', yanchor='bottom', showarrow=False, font=dict(size=11))
+    return fig, note
+
+def _value_counts_top10(df, col):
+    """Contagem das 10 categorias mais frequentes de `col`."""
+    counts_df = df[col].value_counts().nlargest(10).reset_index()
+    counts_df.columns = [col, 'Contagem']
+    return counts_df
+
+def _time_series_figure(series, time_col, value_col, granularity_label=rollups.DEFAULT_GRANULARITY,
+                        statistic_label=rollups.DEFAULT_STATISTIC):
+    """
+    Monta o gráfico de linha de uma série lida dos rollups temporais.
+
+    Séries com mais pontos que o limite (ex.: muitos anos por dia) ainda são reduzidas com LTTB.
+
+    Returns:
+        tuple: (figura, nota sobre a redução de pontos ou None).
+    """
+    series = series.dropna()
+    total_points = len(series)
+    if total_points > downsampling.DOWNSAMPLE_THRESHOLD:
+        series = series.iloc[downsampling.lttb(series.index.to_numpy(), series.to_numpy(),
+                                               downsampling.DOWNSAMPLE_THRESHOLD)]
+    plot_df = series.rename_axis(time_col).reset_index()
+    title = f'{value_col} ao longo do tempo ({statistic_label} por {granularity_label.lower()})'
+    fig = px.line(plot_df, x=time_col, y=value_col, title=title, markers=True)
+    note = None
+    if len(series) < total_points:
+        note = f"Série reduzida com LTTB: {len(series):,} de {total_points:,} pontos"
+        fig.add_annotation(text=note, xref='paper', yref='paper', x=0, y=1.02,
+                           xanchor='left', yanchor='bottom', showarrow=False, font=dict(size=11))
+    return fig, note
+
+def _ranking_figure(ranking, label, title, color_palette):
+    """Monta o gráfico de barras de um ranking (ex.: top 5 vendedores) calculado na análise."""
+    ranking_df = ranking.reset_index()
+    ranking_df.columns = [label, 'Total de Vendas']
+    return px.bar(ranking_df, x=label, y='Total de Vendas', title=title, color=label, color_discrete_sequence=color_palette)
+
+RANKING_CHARTS = [
+    ('top_sellers', 'top_vendedores', 'Vendedor', 'Top 5 Vendedores por Vendas', 'Top 5 Vendedores com Mais Vendas'),
+    ('top_products', 'top_produtos', 'Produto', 'Top 5 Produtos Mais Vendidos', 'Top 5 Produtos Mais Vendidos'),
+    ('bottom_products', 'bottom_produtos', 'Produto', 'Top 5 Produtos Menos Vendidos', 'Top 5 Produtos Menos Vendidos'),
+]
+
+def build_report_charts(df, analysis_data):
+    """
+    Monta, sem interface, os gráficos padrão do relatório (as primeiras colunas de cada tipo).
+
+    Usado na geração de relatórios em lote, fora do Streamlit.
+
+    Returns:
+        dict: Figuras Plotly com as mesmas chaves de `render_visualizations`.
+    """
+    charts = {}
+    numeric_cols = analysis_data.get('numeric_cols', [])
+    categorical_cols = analysis_data.get('categorical_cols', [])
+    datetime_cols = analysis_data.get('datetime_cols', [])
+    color_palette = px.colors.qualitative.Plotly
+
+    if numeric_cols:
+        counts, edges = chart_stats.histogram_bins(df[numeric_cols[0]])
+        charts['distribuicao_numerica'] = _histogram_figure(counts, edges, numeric_cols[0], color_palette[0])
+    if categorical_cols:
+        col_cat = categorical_cols[0]
+        charts['analise_categorica'] = px.bar(_value_counts_top10(df, col_cat), x=col_cat, y='Contagem',
+                                              title=f'Contagem em {col_cat}', color=col_cat,
+                                              color_discrete_sequence=color_palette)
+    if len(numeric_cols) >= 2:
+        x_col, y_col = numeric_cols[:2]
+        charts['bivariada_scatter'], _ = _scatter_figure(_prepare_scatter(df, x_col, y_col), x_col, y_col)
+    if datetime_cols and numeric_cols:
+        time_col, value_col = datetime_cols[0], numeric_cols[0]
+        rollup = rollups.daily_rollup(df, time_col, [value_col])
+        series = rollups.rollup_series(rollup, value_col, rollups.STATISTICS[rollups.DEFAULT_STATISTIC])
+        charts['serie_temporal'], _ = _time_series_figure(series, time_col, value_col)
+    for data_key, chart_key, label, title, _ in RANKING_CHARTS:
+        if data_key in analysis_data:
+            charts[chart_key] = _ranking_figure(analysis_data[data_key], label, title, color_palette)
+    return charts
+
+def render_visualizations(df, analysis_data, aggregates=None, dataset=None, profiler=None):
     """
     Renderiza os componentes de visualização de dados de forma interativa.
+
+    Args:
+        df (pd.DataFrame): Os dados já filtrados.
+        analysis_data (dict): Os metadados retornados por `ai_analyzer.analyze_dataframe`.
+        aggregates (AggregateScope, optional): Cache das tabelas que alimentam os gráficos,
+            reaproveitadas enquanto os filtros não mudarem.
+        dataset (ComputeBackend, optional): O backend dos mesmos dados, de onde a aba temporal
+            lê os rollups e a análise bivariada lê médias por grupo e tabelas cruzadas. Sem ele,
+            tudo é calculado a partir de `df`.
+        profiler (RerunProfiler, optional): Perfil da rerun, que mede cada gráfico (tabela, figura
+            e envio ao navegador) como uma etapa (ver `utils.profiling`).
+
+    Returns:
+        tuple: (figuras geradas por chave, o que identifica cada figura ou None). A identificação
+        de cada figura junta o dataset, os filtros e as escolhas feitas nos controles, e serve de
+        chave do relatório em PDF sem serializar as figuras; é None quando o dataset não tem hash
+        de conteúdo.
     """
+    def cached(spec, compute):
+        return aggregates.get(spec, compute) if aggregates is not None else compute()
+
+    def chart_span(chart_key):
+        return profiler.span(chart_key) if profiler is not None else nullcontext()
+
+    def add_chart(chart_key, fig, spec):
+        generated_charts[chart_key] = fig
+        chart_specs[chart_key] = spec
+
     generated_charts = {}
+    chart_specs = {}
     numeric_cols = analysis_data.get('numeric_cols', [])
     categorical_cols = analysis_data.get('categorical_cols', [])
     datetime_cols = analysis_data.get('datetime_cols', [])
@@ -25,10 +218,11 @@ def render_visualizations(df, analysis_data):
         else:
             col_dist = st.selectbox("Selecione uma coluna numérica:", numeric_cols, key="univar_num")
             if col_dist:
-                fig_hist = px.histogram(df, x=col_dist, title=f'Distribuição de {col_dist}', nbins=30,
-                                        color_discrete_sequence=[color_palette[0]])
-                st.plotly_chart(fig_hist, use_container_width=True)
-                generated_charts['distribuicao_numerica'] = fig_hist
+                with chart_span('distribuicao_numerica'):
+                    counts, edges = cached(('histogram', col_dist), lambda: chart_stats.histogram_bins(df[col_dist]))
+                    fig_hist = _histogram_figure(counts, edges, col_dist, color_palette[0])
+                    st.plotly_chart(fig_hist, use_container_width=True)
+                    add_chart('distribuicao_numerica', fig_hist, ('histogram', col_dist))
 
         st.markdown("---")
         st.markdown("#### Análise de Colunas Categóricas")
@@ -38,17 +232,16 @@ def render_visualizations(df, analysis_data):
             col_cat = st.selectbox("Selecione uma coluna categórica:", categorical_cols, key="univar_cat")
             chart_type = st.radio("Escolha o tipo de gráfico:", ("Gráfico de Barras", "Gráfico de Pizza"), horizontal=True)
             if col_cat:
-                counts = df[col_cat].value_counts().nlargest(10)
-                counts_df = counts.reset_index()
-                counts_df.columns = [col_cat, 'Contagem']
-                if chart_type == "Gráfico de Barras":
-                    fig_bar = px.bar(counts_df, x=col_cat, y='Contagem', title=f'Contagem em {col_cat}', color=col_cat, color_discrete_sequence=color_palette)
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                    generated_charts['analise_categorica'] = fig_bar
-                elif chart_type == "Gráfico de Pizza":
-                    fig_pie = px.pie(counts_df, names=col_cat, values='Contagem', title=f'Distribuição em {col_cat}', color_discrete_sequence=color_palette)
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                    generated_charts['analise_categorica'] = fig_pie
+                with chart_span('analise_categorica'):
+                    counts_df = cached(('value_counts_top10', col_cat), lambda: _value_counts_top10(df, col_cat))
+                    if chart_type == "Gráfico de Barras":
+                        fig_bar = px.bar(counts_df, x=col_cat, y='Contagem', title=f'Contagem em {col_cat}', color=col_cat, color_discrete_sequence=color_palette)
+                        st.plotly_chart(fig_bar, use_container_width=True)
+                        add_chart('analise_categorica', fig_bar, ('value_counts_top10', col_cat, chart_type))
+                    elif chart_type == "Gráfico de Pizza":
+                        fig_pie = px.pie(counts_df, names=col_cat, values='Contagem', title=f'Distribuição em {col_cat}', color_discrete_sequence=color_palette)
+                        st.plotly_chart(fig_pie, use_container_width=True)
+                        add_chart('analise_categorica', fig_pie, ('value_counts_top10', col_cat, chart_type))
 
     # --- ABA 2: ANÁLISE BIVARIADA (com a nova funcionalidade) ---
     with tab2:
@@ -65,9 +258,13 @@ def render_visualizations(df, analysis_data):
                 # Caso 1: Numérica vs. Numérica
                 if x_axis_col in numeric_cols and y_axis_col in numeric_cols:
                     st.markdown("##### Gráfico de Dispersão")
-                    fig_scatter = px.scatter(df, x=x_axis_col, y=y_axis_col, title=f'{y_axis_col} vs. {x_axis_col}', trendline="ols")
-                    st.plotly_chart(fig_scatter, use_container_width=True)
-                    generated_charts['bivariada_scatter'] = fig_scatter
+                    with chart_span('bivariada_scatter'):
+                        prepared = cached(('scatter', x_axis_col, y_axis_col), lambda: _prepare_scatter(df, x_axis_col, y_axis_col))
+                        fig_scatter, note = _scatter_figure(prepared, x_axis_col, y_axis_col)
+                        st.plotly_chart(fig_scatter, use_container_width=True)
+                    if note:
+                        st.caption(f"ℹ️ {note}. A linha de tendência foi ajustada sobre todos os pontos.")
+                    add_chart('bivariada_scatter', fig_scatter, ('scatter', x_axis_col, y_axis_col))
 
                 # Caso 2: Categórica vs. Numérica
                 elif (x_axis_col in categorical_cols and y_axis_col in numeric_cols) or \
@@ -81,79 +278,91 @@ def render_visualizations(df, analysis_data):
                     
                     if plot_type == "Boxplot":
                         st.markdown(f"##### Distribuição de '{num_col}' por '{cat_col}'")
-                        fig_box = px.box(df, x=cat_col, y=num_col, title=f'Distribuição de {num_col} por {cat_col}', color=cat_col, color_discrete_sequence=color_palette)
-                        st.plotly_chart(fig_box, use_container_width=True)
-                        generated_charts['bivariada_box'] = fig_box
+                        with chart_span('bivariada_box'):
+                            stats = cached(('box_stats', cat_col, num_col), lambda: chart_stats.box_stats(df, cat_col, num_col))
+                            fig_box = _box_figure(stats, cat_col, num_col, color_palette)
+                            st.plotly_chart(fig_box, use_container_width=True)
+                        add_chart('bivariada_box', fig_box, ('box_stats', cat_col, num_col))
 
                     elif plot_type == "Gráfico de Barras (Média)":
                         st.markdown(f"##### Média de '{num_col}' por '{cat_col}' (Ordenado)")
                         # Calcula a média, ordena e pega as top 15 categorias
-                        grouped_data = df.groupby(cat_col)[num_col].mean().sort_values(ascending=False).nlargest(15).reset_index()
-                        fig_bar_mean = px.bar(grouped_data, x=cat_col, y=num_col, title=f'Média de {num_col} por {cat_col}', color=cat_col, color_discrete_sequence=color_palette)
-                        st.plotly_chart(fig_bar_mean, use_container_width=True)
-                        generated_charts['bivariada_bar_mean'] = fig_bar_mean
+                        # Com o backend, as médias por grupo saem do cubo pré-agregado quando possível
+                        with chart_span('bivariada_bar_mean'):
+                            grouped_data = cached(
+                                ('group_mean_top15', cat_col, num_col),
+                                lambda: (
+                                    dataset.grouped_mean(cat_col, num_col) if dataset is not None
+                                    else df.groupby(cat_col)[num_col].mean()
+                                ).sort_values(ascending=False).nlargest(15).reset_index()
+                            )
+                            fig_bar_mean = px.bar(grouped_data, x=cat_col, y=num_col, title=f'Média de {num_col} por {cat_col}', color=cat_col, color_discrete_sequence=color_palette)
+                            st.plotly_chart(fig_bar_mean, use_container_width=True)
+                        add_chart('bivariada_bar_mean', fig_bar_mean, ('group_mean_top15', cat_col, num_col))
                 
                 # Caso 3: Categórica vs. Categórica
                 elif x_axis_col in categorical_cols and y_axis_col in categorical_cols:
                     st.markdown("##### Mapa de Calor de Frequência")
-                    crosstab = pd.crosstab(df[y_axis_col], df[x_axis_col])
-                    fig_heatmap = go.Figure(data=go.Heatmap(
-                        z=crosstab.values,
-                        x=crosstab.columns,
-                        y=crosstab.index,
-                        colorscale='Blues'
-                    ))
-                    fig_heatmap.update_layout(title=f'Frequência de {y_axis_col} vs. {x_axis_col}')
-                    st.plotly_chart(fig_heatmap, use_container_width=True)
-                    generated_charts['bivariada_heatmap'] = fig_heatmap
+                    with chart_span('bivariada_heatmap'):
+                        crosstab = cached(
+                            ('crosstab', y_axis_col, x_axis_col),
+                            lambda: dataset.crosstab(y_axis_col, x_axis_col) if dataset is not None
+                            else pd.crosstab(df[y_axis_col], df[x_axis_col])
+                        )
+                        fig_heatmap = go.Figure(data=go.Heatmap(
+                            z=crosstab.values,
+                            x=crosstab.columns,
+                            y=crosstab.index,
+                            colorscale='Blues'
+                        ))
+                        fig_heatmap.update_layout(title=f'Frequência de {y_axis_col} vs. {x_axis_col}')
+                        st.plotly_chart(fig_heatmap, use_container_width=True)
+                    add_chart('bivariada_heatmap', fig_heatmap, ('crosstab', y_axis_col, x_axis_col))
                 
                 else:
                     st.info("Selecione uma combinação válida de colunas.")
 
 
-    # --- ABA 3: ANÁLISE TEMPORAL (sem alterações) ---
+    # --- ABA 3: ANÁLISE TEMPORAL ---
+    # O gráfico lê os rollups por período (ver `utils.rollups`), nunca as linhas
     with tab3:
         st.markdown("#### Série Temporal")
         if not datetime_cols or not numeric_cols:
             st.warning("Para análise temporal, é necessária pelo menos uma coluna de data e uma numérica.")
         else:
-            col1, col2 = st.columns(2)
+            col1, col2, col3, col4 = st.columns(4)
             time_col = col1.selectbox("Selecione a coluna de tempo:", datetime_cols)
             value_col_time = col2.selectbox("Selecione a coluna de valor:", numeric_cols)
+            granularity_label = col3.selectbox("Granularidade:", list(rollups.GRANULARITIES))
+            statistic_label = col4.selectbox("Agregação:", list(rollups.STATISTICS))
             if time_col and value_col_time:
-                df_sorted = df.sort_values(by=time_col)
-                fig_line = px.line(df_sorted, x=time_col, y=value_col_time, title=f'{value_col_time} ao longo do tempo', markers=True)
-                st.plotly_chart(fig_line, use_container_width=True)
-                generated_charts['serie_temporal'] = fig_line
+                with chart_span('serie_temporal'):
+                    granularity = rollups.GRANULARITIES[granularity_label]
+                    if dataset is not None:
+                        rollup = cached(('time_rollup', time_col, granularity),
+                                        lambda: dataset.time_rollup(time_col, granularity))
+                    else:
+                        rollup = cached(('time_rollup', time_col, value_col_time, granularity),
+                                        lambda: rollups.reaggregate(rollups.daily_rollup(df, time_col, [value_col_time]), granularity))
+                    series = rollups.rollup_series(rollup, value_col_time, rollups.STATISTICS[statistic_label])
+                    fig_line, note = _time_series_figure(series, time_col, value_col_time, granularity_label, statistic_label)
+                    st.plotly_chart(fig_line, use_container_width=True)
+                if note:
+                    st.caption(f"ℹ️ {note}.")
+                add_chart('serie_temporal', fig_line, ('time_rollup', time_col, value_col_time, granularity, statistic_label))
 
     # --- ABA 4: DESTAQUES DE VENDAS (sem alterações) ---
     with tab4:
         st.markdown("#### Desempenho de Vendedores e Produtos")
-        if 'top_sellers' in analysis_data:
-            st.markdown("##### Top 5 Vendedores com Mais Vendas")
-            top_sellers = analysis_data['top_sellers']
-            top_sellers_df = top_sellers.reset_index()
-            top_sellers_df.columns = ['Vendedor', 'Total de Vendas']
-            fig = px.bar(top_sellers_df, x='Vendedor', y='Total de Vendas', title='Top 5 Vendedores por Vendas', color='Vendedor', color_discrete_sequence=color_palette)
-            st.plotly_chart(fig, use_container_width=True)
-            generated_charts['top_vendedores'] = fig
-
-        if 'top_products' in analysis_data:
-            st.markdown("##### Top 5 Produtos Mais Vendidos")
-            top_products = analysis_data['top_products']
-            top_products_df = top_products.reset_index()
-            top_products_df.columns = ['Produto', 'Total de Vendas']
-            fig = px.bar(top_products_df, x='Produto', y='Total de Vendas', title='Top 5 Produtos Mais Vendidos', color='Produto', color_discrete_sequence=color_palette)
-            st.plotly_chart(fig, use_container_width=True)
-            generated_charts['top_produtos'] = fig
-
-        if 'bottom_products' in analysis_data:
-            st.markdown("##### Top 5 Produtos Menos Vendidos")
-            bottom_products = analysis_data['bottom_products']
-            bottom_products_df = bottom_products.reset_index()
-            bottom_products_df.columns = ['Produto', 'Total de Vendas']
-            fig = px.bar(bottom_products_df, x='Produto', y='Total de Vendas', title='Top 5 Produtos Menos Vendidos', color='Produto', color_discrete_sequence=color_palette)
-            st.plotly_chart(fig, use_container_width=True)
-            generated_charts['bottom_produtos'] = fig
-
-    return generated_charts
\ No newline at end of file
+        for data_key, chart_key, label, title, heading in RANKING_CHARTS:
+            if data_key in analysis_data:
+                st.markdown(f"##### {heading}")
+                with chart_span(chart_key):
+                    fig = _ranking_figure(analysis_data[data_key], label, title, color_palette)
+                    st.plotly_chart(fig, use_container_width=True)
+                add_chart(chart_key, fig, (data_key,))
+
+    # Os gráficos de destaques saem da análise, que o dataset e os filtros também determinam
+    if aggregates is None or aggregates.prefix[0] is None:
+        return generated_charts, None
+    return generated_charts, {'escopo': aggregates.prefix, **chart_specs}
\ No newline at end of file
@@ -1,10 +1,17 @@
 import streamlit as st
-import pandas as pd
 import re
+import json
+import logging
 
-from components import sidebar, visualizations
-from utils import data_loader, pdf_generator
-from models import ai_analyzer
+from components import sidebar
+from utils.instrumentation import PipelineInstrumentation
+from utils.profiling import RerunProfiler
+
+# Os módulos pesados (pandas e o pipeline de dados, a análise, o Plotly, o FPDF) são importados na
+# etapa que os usa pela primeira vez: a página inicial é renderizada sem eles
+# (ver benchmarks/bench_import_time.py)
+
+logger = logging.getLogger(__name__)
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(
@@ -13,6 +20,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Mede as etapas desta rerun; as métricas vão para o arquivo ou endpoint configurado (ver `utils.profiling`)
+profiler = RerunProfiler()
+
 # --- TÍTULO E DESCRIÇÃO ---
 st.title("🧠 Dashboard de Análise de Dados com IA")
 st.markdown("""
@@ -25,58 +35,115 @@ st.markdown("---")
 uploaded_file = sidebar.show_uploader_and_info()
 
 if uploaded_file:
-    df_original = data_loader.load_data(uploaded_file)
-
-    if df_original is not None:
-        # 🔹 Ajuste: converter automaticamente colunas de texto em categóricas
-        for col in df_original.select_dtypes(include="object").columns:
-            df_original[col] = df_original[col].astype("category")
-
-        # --- RENDERIZA FILTROS DINÂMICOS NA SIDEBAR ---
-        selected_filters = sidebar.show_filters(df_original)
-        df = df_original.copy() # Cria uma cópia para aplicar os filtros
-
-        # --- APLICA OS FILTROS AO DATAFRAME ---
-        if selected_filters:
-            # Filtro de data
-            if 'date_range' in selected_filters:
-                start_date, end_date = selected_filters['date_range']
-                date_col = selected_filters['date_col']
-                df[date_col] = pd.to_datetime(df[date_col])
-                df = df[df[date_col].between(start_date, end_date)]
-
-            # Filtros categóricos
-            for col, values in selected_filters.items():
-                if col not in ['date_range', 'date_col']:
-                    df = df[df[col].isin(values)]
+    with profiler.span('carregamento'):
+        import pandas as pd
+
+        from utils import data_loader
+        from utils.aggregate_cache import get_aggregate_cache, normalize_filter_state
+        from utils.compute_backend import APPROXIMATE_MODE, CHART_SAMPLE_ROWS, OUT_OF_CORE, ApproximateBackend, DataFrameBackend
+        from utils.dataset_registry import get_dataset_registry
+        from utils.filter_index import get_filter_index
+
+        # Das planilhas com várias abas, carrega as abas escolhidas (por padrão, todas) juntas
+        selected_sheets = sidebar.show_sheet_selector(data_loader.list_sheets(uploaded_file))
+
+        # No modo fora da memória (DASHBOARD_COMPUTE_BACKEND=duckdb) os dados ficam em Parquet no disco
+        # e os KPIs e a análise viram consultas do DuckDB; só os resultados agregados vêm para a memória
+        if OUT_OF_CORE:
+            dataset_original = data_loader.load_dataset_backend(uploaded_file, selected_sheets)
+        else:
+            df_original = data_loader.load_data(uploaded_file, selected_sheets)
+            dataset_original = None if df_original is None else DataFrameBackend(df_original)
+
+    if dataset_original is not None:
+        profiler.rows = dataset_original.num_rows()
+
+        with profiler.span('filtros'):
+            # --- RENDERIZA FILTROS DINÂMICOS NA SIDEBAR ---
+            selected_filters = sidebar.show_filters(dataset_original)
+
+            # --- APLICA OS FILTROS AO DATAFRAME ---
+            if OUT_OF_CORE:
+                # Os filtros viram uma cláusula WHERE; os gráficos usam uma amostra limitada das linhas
+                dataset = dataset_original.filtered(selected_filters)
+                filter_mask = dataset.conditions or None
+                df = dataset.sample(CHART_SAMPLE_ROWS)
+            else:
+                # O índice de filtros é construído uma vez por dataset; cada combinação de filtros vira
+                # uma única máscara de linhas, sem cópias intermediárias
+                filter_mask = get_filter_index(df_original).mask(selected_filters)
+                df = df_original if filter_mask is None else df_original[filter_mask]
+                if APPROXIMATE_MODE:
+                    # Quantis, valores distintos e rankings estimados com sketches (DASHBOARD_APPROXIMATE=1)
+                    dataset = ApproximateBackend(df, df_original, selected_filters)
+                else:
+                    dataset = DataFrameBackend(df, df_original, selected_filters)
+
+        # KPIs, análise e tabelas dos gráficos só são recalculados quando o dataset ou os filtros mudam
+        aggregate_cache = get_aggregate_cache()
+        aggregates = aggregate_cache.scope(
+            dataset_original.dataset_hash,
+            normalize_filter_state(selected_filters, filter_mask)
+        )
         
         st.success(f"Arquivo '{uploaded_file.name}' carregado com sucesso! Exibindo dados com base nos filtros selecionados.")
+        append_info = dataset_original.attrs.get('append')
+        if append_info:
+            # Nova versão de um arquivo já carregado: só as linhas novas foram processadas
+            new_rows = dataset_original.num_rows() - append_info['rows']
+            st.caption(f"Atualização incremental: {new_rows:,} linha(s) nova(s) acrescentada(s) às "
+                       f"{append_info['rows']:,} já carregadas.")
         
         with st.expander("Clique para ver uma amostra dos dados (já filtrados)"):
-            st.dataframe(df.head())
+            st.dataframe(dataset.head())
+
+        # Tipos, cardinalidade, nulos, faixas e papéis das colunas, calculados uma vez por dataset
+        column_catalog = dataset_original.column_catalog()
+        with st.expander("📋 Perfil das colunas"):
+            st.dataframe(column_catalog.to_frame(), hide_index=True)
+
+        dtype_report = dataset_original.attrs.get('dtype_report')
+        if dtype_report:
+            with st.expander("💾 Otimização de memória dos dados"):
+                dtype_report_df = pd.DataFrame.from_dict(dtype_report, orient='index')
+                st.dataframe(dtype_report_df)
+                total_before = dtype_report_df['bytes_before'].sum()
+                total_after = dtype_report_df['bytes_after'].sum()
+                st.caption(f"Colunas convertidas: {total_before / 1024 ** 2:.2f} MB → {total_after / 1024 ** 2:.2f} MB")
         st.markdown("---")
 
         # --- 3. RESUMO EXECUTIVO (KPIs) ---
         st.subheader("🚀 Resumo Executivo")
         
+        # As colunas dos KPIs saem dos papéis detectados no catálogo de colunas (ex.: 'Vendas' é
+        # uma métrica, 'Vendedor' é o vendedor)
         kpi_metrics = {}
-        if 'Vendas' in df.columns:
-            kpi_metrics['Total de Vendas'] = ('Vendas', 'sum')
-        if 'Receita_Liquida' in df.columns:
-            kpi_metrics['Total de Receita'] = ('Receita_Liquida', 'sum')
-        if 'Vendedor' in df.columns:
-            kpi_metrics['Vendedores Únicos'] = ('Vendedor', 'nunique')
+        for metric_col in column_catalog.role_columns('metrica'):
+            kpi_metrics.setdefault(f"Total de {metric_col.split('_')[0]}", (metric_col, 'sum'))
+        seller_col = column_catalog.role_column('vendedor')
+        if seller_col is not None:
+            kpi_metrics['Vendedores Únicos'] = (seller_col, 'nunique')
+
+        def compute_kpis():
+            kpi_values = {}
+            for label, (col_name, metric_type) in kpi_metrics.items():
+                if metric_type == 'sum':
+                    kpi_values[label] = dataset.sum(col_name)
+                elif metric_type == 'nunique':
+                    kpi_values[label] = dataset.nunique(col_name)
+            return kpi_values
 
         if kpi_metrics:
+            with profiler.span('kpis'):
+                kpi_values = aggregates.get(('kpis', tuple(kpi_metrics.items())), compute_kpis)
             cols = st.columns(len(kpi_metrics))
             i = 0
             for label, (col_name, metric_type) in kpi_metrics.items():
                 col_metric = cols[i]
+                value = kpi_values[label]
                 if metric_type == 'sum':
-                    value = df[col_name].sum()
                     col_metric.metric(label=label, value=f"R$ {value:,.2f}")
                 elif metric_type == 'nunique':
-                    value = df[col_name].nunique()
                     col_metric.metric(label=label, value=value)
                 i += 1
         else:
@@ -94,39 +161,118 @@ if uploaded_file:
             progress_bar.progress(progress)
             progress_text.text(message)
 
+        # Cada passo do analisador também vira uma etapa da rerun ('analise/<passo>')
+        instrumentation = PipelineInstrumentation(
+            on_stage_end=lambda stage: profiler.add_span(stage['name'], stage['elapsed_s'])
+        )
+
         try:
-            # Passa a função de callback para o analisador
-            analysis_report, analysis_data = ai_analyzer.analyze_dataframe(df, progress_callback)
+            # Passa a função de callback e a instrumentação para o analisador
+            with profiler.span('analise'):
+                from models import ai_analyzer
+
+                analysis_report, analysis_data = aggregates.get(
+                    ('analysis',),
+                    lambda: ai_analyzer.analyze_dataframe(dataset, progress_callback, instrumentation)
+                )
             
             # Limpa a barra de progresso e a mensagem após a conclusão
             progress_text.empty()
             progress_bar.empty()
 
+            # Registra as métricas de cada passo em formato estruturado para os logs
+            analysis_metrics = instrumentation.to_dict()
+            logger.info("analysis_metrics %s", json.dumps(analysis_metrics))
+
+            with st.expander("🛠️ Diagnóstico de desempenho da análise"):
+                if analysis_metrics['stages']:
+                    metrics_df = pd.DataFrame(analysis_metrics['stages'])
+                    metrics_df['elapsed_ms'] = metrics_df.pop('elapsed_s') * 1000
+                    peak_memory = metrics_df.pop('peak_memory_bytes')
+                    if peak_memory.notna().any():
+                        metrics_df['peak_memory_mb'] = peak_memory.astype(float) / 1024 ** 2
+                    st.dataframe(metrics_df, hide_index=True)
+                    st.caption(f"Tempo total da análise: {analysis_metrics['total_elapsed_s'] * 1000:.1f} ms")
+                else:
+                    st.caption("Análise servida pelo cache de agregados (filtros inalterados).")
+
+                cache_stats = aggregate_cache.stats()
+                st.caption(
+                    f"Cache de agregados: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas "
+                    f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entradas, "
+                    f"{cache_stats['bytes'] / 1024 ** 2:.1f} de {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB"
+                )
+                if not OUT_OF_CORE:
+                    registry_stats = get_dataset_registry().stats()
+                    st.caption(
+                        f"Datasets compartilhados: {registry_stats['datasets']} em memória "
+                        f"({registry_stats['bytes'] / 1024 ** 2:.1f} MB), "
+                        f"{registry_stats['refs']} sessão(ões) ativa(s)"
+                    )
+
             st.markdown(analysis_report)
             st.markdown("---")
 
             st.subheader("📊 Explore Seus Dados")
-            generated_charts = visualizations.render_visualizations(df, analysis_data)
+            if OUT_OF_CORE and len(df) == CHART_SAMPLE_ROWS:
+                st.caption(f"Modo fora da memória: os gráficos usam uma amostra de {len(df):,} linhas dos dados filtrados.")
+            with profiler.span('visualizacoes'):
+                from components import visualizations
+
+                generated_charts, chart_specs = visualizations.render_visualizations(df, analysis_data, aggregates, dataset, profiler)
 
             st.markdown("---")
             st.subheader("📄 Exportar Relatório")
             
             pdf_report_text = re.sub(r'###\s*|(\*\*|`)', '', analysis_report)
-            pdf_bytes = pdf_generator.create_pdf_report(pdf_report_text, generated_charts)
-            
-            st.download_button(
-                label="Baixar Relatório Completo em PDF",
-                data=pdf_bytes,
-                file_name=f"relatorio_analise_{uploaded_file.name}.pdf",
-                mime="application/pdf"
-            )
+
+            # O PDF só é gerado quando pedido, em segundo plano, e memorizado pelo texto e pela
+            # identificação dos gráficos (dataset, filtros e controles), sem serializar as figuras
+            from utils.report_jobs import get_report_job_manager, report_key
+
+            report_jobs = get_report_job_manager()
+            pdf_job_key = report_key(pdf_report_text, generated_charts, chart_specs)
+            pdf_job = report_jobs.get(pdf_job_key)
+
+            if pdf_job is None or (pdf_job.done() and pdf_job.exception() is not None):
+                if pdf_job is not None:
+                    st.error(f"Não foi possível gerar o relatório: {pdf_job.exception()}")
+                if st.button("Gerar Relatório Completo em PDF"):
+                    pdf_job = report_jobs.submit(pdf_job_key, pdf_report_text, generated_charts, profiler.rows)
+
+            if pdf_job is not None and not pdf_job.done():
+                @st.fragment(run_every=1.0)
+                def pdf_job_status():
+                    # Atualiza apenas este trecho até o relatório ficar pronto
+                    if pdf_job.done():
+                        st.rerun()
+                    st.info("⏳ Gerando o relatório em PDF em segundo plano...")
+
+                pdf_job_status()
+            elif pdf_job is not None and pdf_job.exception() is None:
+                st.download_button(
+                    label="Baixar Relatório Completo em PDF",
+                    data=pdf_job.result(),
+                    file_name=f"relatorio_analise_{uploaded_file.name}.pdf",
+                    mime="application/pdf"
+                )
 
         except Exception as e:
             st.error(f"Ocorreu um erro durante a análise dos dados: {e}")
             st.warning("Verifique se o arquivo está formatado corretamente e tente novamente.")
-            # Limpa a barra de progresso em caso de erro
+            # Limpa a barra de progresso e encerra a etapa em andamento em caso de erro
+            instrumentation.end()
             progress_text.empty()
             progress_bar.empty()
 
 else:
-    st.info("Aguardando o carregamento de um arquivo Excel para iniciar a análise.")
\ No newline at end of file
+    st.info("Aguardando o carregamento de um arquivo Excel para iniciar a análise.")
+
+# --- 5. MÉTRICAS DA RERUN ---
+# Registra os tempos das etapas e o estado dos caches compartilhados pelo processo
+rerun_cache_stats = {}
+if uploaded_file:
+    rerun_cache_stats['agregados'] = get_aggregate_cache().stats()
+    if not OUT_OF_CORE:
+        rerun_cache_stats['datasets'] = get_dataset_registry().stats()
+profiler.finish(rerun_cache_stats)
\ No newline at end of file
@@ -1,13 +1,23 @@
-import pandas as pd
-import numpy as np
-import random
+"""
+Gerador de dados sintéticos de vendas para testar o dashboard.
+
+Gera o mesmo esquema da planilha de exemplo (produtos por categoria, vendedores com
+especialidades, descontos, custos e lucro) de forma vetorizada e com semente fixa, então
+milhões de linhas saem em segundos e a mesma semente sempre produz os mesmos dados.
 
-# Define semente para reprodutibilidade
-np.random.seed(42)
-random.seed(42)
+Uso:
+    python gerar_excel.py                                   # 1.000 linhas em dados_vendas_realistas.xlsx
+    python gerar_excel.py --linhas 10000000 --saida vendas_10m.parquet
+    python gerar_excel.py --linhas 500000 --saida vendas.csv --semente 7
 
-# Número de linhas de dados
-n = 1000
+O formato (xlsx, csv ou parquet) é deduzido da extensão do arquivo de saída.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
 
 # --- ESTRUTURAS DE DADOS MAIS REALISTAS ---
 
@@ -33,80 +43,141 @@ vendedores = {
 }
 lista_vendedores = list(vendedores.keys())
 
-# 3. Outras listas
-regioes = ["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"]
-canais_venda = ["Online", "Loja Física", "Distribuidor", "Telefone"]
-formas_pagamento = ["Cartão de Crédito", "PIX", "Boleto", "Dinheiro"]
+# 3. Outras listas (com os pesos de cada opção)
+regioes = {"Sudeste": 45, "Sul": 20, "Nordeste": 20, "Centro-Oeste": 10, "Norte": 5}
+canais_venda = {"Online": 50, "Loja Física": 30, "Distribuidor": 15, "Telefone": 5}
+formas_pagamento = {"Cartão de Crédito": 50, "PIX": 30, "Boleto": 15, "Dinheiro": 5}
+descontos = {0: 40, 5: 30, 10: 15, 15: 10, 20: 5}
 
-# --- GERAÇÃO DE DADOS EM LOOP PARA CRIAR RELAÇÕES ---
+DATA_INICIAL = pd.Timestamp("2023-01-01")
+# Até este número de linhas, cada linha é um dia; acima dele, as linhas se distribuem no período
+PERIODO_DIAS = 3 * 365
+# O Excel não aceita mais linhas que isso em uma planilha
+MAX_LINHAS_XLSX = 1_048_575
 
-data_list = []
-start_date = pd.to_datetime("2023-01-01")
+FORMATOS = ('xlsx', 'csv', 'parquet')
 
-for i in range(n):
-    # Escolha da Categoria e Produto
-    categoria = random.choice(list(produtos_por_categoria.keys()))
-    produto_info = produtos_por_categoria[categoria]
-    produto_nome = random.choice(list(produto_info.keys()))
-    preco_base = produto_info[produto_nome]
 
-    # Vendedor com viés para sua especialidade
-    vendedor_sorteado = random.choice(lista_vendedores)
-    if categoria in vendedores[vendedor_sorteado]:
-        # Aumenta a chance de ser o vendedor sorteado se for sua especialidade
-        vendedor_final = np.random.choice([vendedor_sorteado, random.choice(lista_vendedores)], p=[0.75, 0.25])
-    else:
-        vendedor_final = vendedor_sorteado
+def _escolha_ponderada(rng, opcoes, n):
+    """Sorteia `n` índices de `opcoes` (dicionário opção -> peso)."""
+    pesos = np.array(list(opcoes.values()), dtype=float)
+    return rng.choice(len(opcoes), size=n, p=pesos / pesos.sum())
+
+
+def _categorias(codigos, opcoes):
+    return pd.Categorical.from_codes(codigos, categories=list(opcoes))
+
+
+def gerar_dados(n, semente=42):
+    """
+    Gera `n` linhas de vendas sintéticas.
+
+    Args:
+        n (int): Número de linhas.
+        semente (int): Semente do gerador; a mesma semente produz os mesmos dados.
 
-    # Quantidade vendida (com variação e tendência de aumento ao longo do tempo)
-    quantidade = np.random.randint(1, 10) + int(i / 100) # Adiciona um pequeno crescimento
+    Returns:
+        pd.DataFrame: As vendas, com as colunas de texto como categorias.
+    """
+    rng = np.random.default_rng(semente)
+    categorias = list(produtos_por_categoria)
+
+    # Escolha da Categoria e do Produto (uniforme dentro da categoria)
+    categoria = rng.integers(0, len(categorias), n)
+    produtos = [produto for categoria_ in categorias for produto in produtos_por_categoria[categoria_]]
+    precos_base = np.array([preco for categoria_ in categorias for preco in produtos_por_categoria[categoria_].values()], dtype=float)
+    n_produtos = np.array([len(produtos_por_categoria[categoria_]) for categoria_ in categorias])
+    primeiro_produto = np.concatenate([[0], np.cumsum(n_produtos)[:-1]])
+    produto = primeiro_produto[categoria] + (rng.random(n) * n_produtos[categoria]).astype(np.int64)
+
+    # Vendedor com viés para sua especialidade: se a categoria é da especialidade do sorteado,
+    # ele fica com a venda com 75% de chance; senão, a venda vai para um vendedor qualquer
+    especialidade = np.array([[categoria_ in vendedores[vendedor] for categoria_ in categorias]
+                              for vendedor in lista_vendedores])
+    vendedor = rng.integers(0, len(lista_vendedores), n)
+    trocar = especialidade[vendedor, categoria] & (rng.random(n) >= 0.75)
+    vendedor = np.where(trocar, rng.integers(0, len(lista_vendedores), n), vendedor)
+
+    # Datas e quantidade vendida (com variação e tendência de aumento ao longo do tempo)
+    dias = np.arange(n, dtype=np.int64) * min(n, PERIODO_DIAS) // max(n, 1)
+    quantidade = rng.integers(1, 10, n) + dias // 100
 
     # Variação de preço e custo
-    preco_unitario = round(preco_base * np.random.uniform(0.95, 1.1), 2)
-    custo_unitario = round(preco_unitario * np.random.uniform(0.55, 0.75), 2)
+    preco_unitario = (precos_base[produto] * rng.uniform(0.95, 1.1, n)).round(2)
+    custo_unitario = (preco_unitario * rng.uniform(0.55, 0.75, n)).round(2)
 
-    # Cálculo da Receita Bruta
+    # Receita, desconto, custo total e lucro
     receita_bruta = preco_unitario * quantidade
-
-    # Desconto
-    desconto_percentual = random.choices([0, 5, 10, 15, 20], weights=[40, 30, 15, 10, 5], k=1)[0]
+    desconto_percentual = np.array(list(descontos))[_escolha_ponderada(rng, descontos, n)]
     receita_liquida = receita_bruta * (1 - desconto_percentual / 100)
-    
-    # Custo Total e Lucro
     custo_total = custo_unitario * quantidade
     lucro = receita_liquida - custo_total
-    
-    data_list.append({
-        "Data": start_date + pd.Timedelta(days=i),
-        "Regiao": random.choices(regioes, weights=[45, 20, 20, 10, 5], k=1)[0],
-        "Vendedor": vendedor_final,
-        "Categoria_Produto": categoria,
-        "Produto": produto_nome,
-        "Canal_Venda": random.choices(canais_venda, weights=[50, 30, 15, 5], k=1)[0],
-        "Forma_Pagamento": random.choices(formas_pagamento, weights=[50, 30, 15, 5], k=1)[0],
+
+    # A Receita_Liquida sai como Vendas para manter a compatibilidade com o dashboard
+    return pd.DataFrame({
+        "Data": DATA_INICIAL + pd.to_timedelta(dias, unit="D"),
+        "Regiao": _categorias(_escolha_ponderada(rng, regioes, n), regioes),
+        "Vendedor": pd.Categorical.from_codes(vendedor, categories=lista_vendedores),
+        "Categoria_Produto": pd.Categorical.from_codes(categoria, categories=categorias),
+        "Produto": pd.Categorical.from_codes(produto, categories=produtos),
+        "Canal_Venda": _categorias(_escolha_ponderada(rng, canais_venda, n), canais_venda),
+        "Forma_Pagamento": _categorias(_escolha_ponderada(rng, formas_pagamento, n), formas_pagamento),
         "Quantidade": quantidade,
         "Preco_Unitario": preco_unitario,
         "Receita_Bruta": receita_bruta,
         "Desconto(%)": desconto_percentual,
-        "Receita_Liquida": receita_liquida,
+        "Vendas": receita_liquida,
         "Custo_Unitario": custo_unitario,
         "Custo_Total": custo_total,
         "Lucro": lucro,
-        "Cliente_VIP": np.random.choice([0, 1], p=[0.8, 0.2])
+        "Cliente_VIP": (rng.random(n) < 0.2).astype(np.int64),
     })
 
-# Criar DataFrame a partir da lista de dicionários
-df = pd.DataFrame(data_list)
 
-# Renomear a coluna de Receita_Liquida para Vendas para manter a compatibilidade com o dashboard
-df.rename(columns={"Receita_Liquida": "Vendas"}, inplace=True)
+def formato_saida(caminho, n):
+    """Retorna o formato de `caminho` pela extensão; ValueError se ele não comportar `n` linhas."""
+    formato = os.path.splitext(caminho)[1].lower().lstrip('.')
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: '{formato}'. Use um de: {', '.join(FORMATOS)}.")
+    if formato == 'xlsx' and n > MAX_LINHAS_XLSX:
+        raise ValueError(f"O Excel aceita no máximo {MAX_LINHAS_XLSX:,} linhas; use csv ou parquet.")
+    return formato
+
+
+def salvar_dados(df, caminho):
+    """Grava os dados em xlsx, csv ou parquet, conforme a extensão de `caminho`."""
+    formato = formato_saida(caminho, len(df))
+    if formato == 'xlsx':
+        df.to_excel(caminho, index=False, engine="openpyxl")
+    elif formato == 'csv':
+        df.to_csv(caminho, index=False)
+    else:
+        df.to_parquet(caminho, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de vendas para testar o dashboard.")
+    parser.add_argument("--linhas", type=int, default=1000, help="Número de linhas (padrão: 1000).")
+    parser.add_argument("--saida", default="dados_vendas_realistas.xlsx",
+                        help="Arquivo de saída (.xlsx, .csv ou .parquet).")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: 42).")
+    args = parser.parse_args(argv)
+
+    try:
+        formato_saida(args.saida, args.linhas)
+    except ValueError as e:
+        parser.error(str(e))
 
+    inicio = time.perf_counter()
+    df = gerar_dados(args.linhas, args.semente)
+    geracao = time.perf_counter() - inicio
+    salvar_dados(df, args.saida)
 
-# Definir nome do arquivo
-output_filename = "dados_vendas_realistas.xlsx"
+    print(f"Arquivo '{args.saida}' criado com sucesso! ({len(df):,} linhas; geração em {geracao:.2f}s, "
+          f"total {time.perf_counter() - inicio:.2f}s)")
+    print("Este arquivo contém dados mais complexos e realistas para testar seu dashboard.")
+    return 0
 
-# Salvar no Excel
-df.to_excel(output_filename, index=False, engine="openpyxl")
 
-print(f"Arquivo '{output_filename}' criado com sucesso!")
-print("Este arquivo contém dados mais complexos e realistas para testar seu dashboard.")
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())
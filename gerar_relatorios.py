@@ -0,0 +1,182 @@
+"""
+Geração de relatórios em lote, sem a interface do Streamlit.
+
+Para cada planilha encontrada, executa carregamento -> análise -> gráficos -> PDF em um pool de
+processos e grava, no diretório de saída, o relatório em PDF e um resumo em JSON. Ao final,
+imprime as estatísticas de vazão do lote.
+
+Uso:
+    python gerar_relatorios.py planilhas/ "regionais/*.xlsx" --saida relatorios --processos 8
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.data_loader import SUPPORTED_EXTENSIONS
+
+# Tira a formatação Markdown do relatório antes de escrevê-lo no PDF, como no dashboard
+MARKDOWN_PATTERN = r'###\s*|(\*\*|`)'
+
+
+def find_workbooks(inputs):
+    """Expande diretórios e padrões glob na lista de arquivos suportados, sem repetições."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in sorted(os.listdir(item))]
+        else:
+            candidates = sorted(glob.glob(item, recursive=True)) or [item]
+        for path in candidates:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            if os.path.isfile(path) and extension in SUPPORTED_EXTENSIONS and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def report_names(paths):
+    """
+    Retorna o nome do relatório de cada arquivo, único no diretório de saída.
+
+    O nome é o caminho relativo à raiz comum das entradas, sem a extensão (ex.: 'norte_vendas' para
+    'planilhas/norte/vendas.xlsx'); arquivos que ainda coincidem (ex.: 'vendas.xlsx' e
+    'vendas.csv') mantêm a extensão no nome.
+
+    Raises:
+        ValueError: Se dois arquivos continuarem com o mesmo nome.
+    """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    stems = {}
+    for path in paths:
+        relative = os.path.relpath(os.path.abspath(path), root)
+        stem, extension = os.path.splitext(relative.replace(os.sep, '_'))
+        stems[path] = (stem, extension.lower())
+
+    counts = {}
+    for stem, _ in stems.values():
+        counts[stem] = counts.get(stem, 0) + 1
+    names = {path: stem if counts[stem] == 1 else f"{stem}{extension.replace('.', '_')}"
+             for path, (stem, extension) in stems.items()}
+
+    seen = {}
+    for path, name in names.items():
+        if name in seen:
+            raise ValueError(f"'{seen[name]}' e '{path}' gravariam o mesmo relatório ('{name}').")
+        seen[name] = path
+    return names
+
+
+def _init_worker():
+    # Cada processo do lote já é um worker: a leitura das abas e a rasterização dos gráficos
+    # rodam nele mesmo, sem abrir outro pool de processos
+    from utils import chart_renderer, data_loader
+    chart_renderer.RENDER_WORKERS = 1
+    data_loader.LOAD_WORKERS = 1
+
+
+def _json_ready(analysis_data):
+    """Converte as séries do resultado da análise em estruturas serializáveis em JSON."""
+    summary = {}
+    for key, value in analysis_data.items():
+        if key == 'corr_matrix':
+            continue
+        if hasattr(value, 'to_dict'):
+            value = {str(k): v for k, v in value.to_dict().items()}
+        summary[key] = value
+    return summary
+
+
+def process_workbook(path, output_dir, name=None):
+    """
+    Executa o pipeline completo para uma planilha e grava o PDF e o resumo JSON.
+
+    Args:
+        name (str, optional): Nome usado nos arquivos gravados (ver `report_names`); por padrão,
+            o nome do arquivo sem a extensão.
+
+    Returns:
+        dict: O resumo do processamento (também gravado em `relatorio_analise_<nome>.json`).
+    """
+    from components.visualizations import build_report_charts
+    from models import ai_analyzer
+    from utils.data_loader import read_dataset
+    from utils.instrumentation import PipelineInstrumentation
+    from utils.pdf_generator import create_pdf_report
+
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    instrumentation = PipelineInstrumentation()
+    summary = {'arquivo': path, 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        with instrumentation.stage('carregamento'):
+            with open(path, 'rb') as f:
+                df = read_dataset(f.read(), path)
+        summary['linhas'], summary['colunas'] = df.shape
+
+        # As etapas da análise (visao_geral, correlacao, ...) entram na mesma instrumentação
+        report, analysis_data = ai_analyzer.analyze_dataframe(df, instrumentation=instrumentation)
+
+        with instrumentation.stage('graficos', rows=len(df)):
+            charts = build_report_charts(df, analysis_data)
+        with instrumentation.stage('pdf'):
+            pdf_bytes = create_pdf_report(re.sub(MARKDOWN_PATTERN, '', report), charts)
+
+        pdf_path = os.path.join(output_dir, f"relatorio_analise_{name}.pdf")
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+        summary.update(pdf=pdf_path, relatorio=report, analise=_json_ready(analysis_data))
+    except Exception as e:
+        summary.update(status='erro', erro=f"{type(e).__name__}: {e}")
+
+    summary['tempo_s'] = time.perf_counter() - start
+    summary['etapas'] = instrumentation.to_dict()['stages']
+    with open(os.path.join(output_dir, f"relatorio_analise_{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios de análise em lote para várias planilhas.")
+    parser.add_argument("entradas", nargs="+", help="Diretórios, arquivos ou padrões glob (ex.: 'dados/*.xlsx').")
+    parser.add_argument("--saida", default="relatorios", help="Diretório onde os relatórios são gravados.")
+    parser.add_argument("--processos", type=int, default=os.cpu_count(),
+                        help="Número de processos em paralelo (padrão: todas as CPUs).")
+    args = parser.parse_args(argv)
+
+    paths = find_workbooks(args.entradas)
+    if not paths:
+        parser.error("Nenhuma planilha encontrada nas entradas informadas.")
+    try:
+        names = report_names(paths)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.saida, exist_ok=True)
+
+    workers = max(1, min(args.processos or 1, len(paths)))
+    print(f"Processando {len(paths)} arquivo(s) com {workers} processo(s)...")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(process_workbook, path, args.saida, names[path]) for path in paths]
+        for future in as_completed(futures):
+            summary = future.result()
+            results.append(summary)
+            status = "ok" if summary['status'] == 'ok' else f"ERRO ({summary['erro']})"
+            print(f"  [{len(results)}/{len(paths)}] {summary['arquivo']}: {status} em {summary['tempo_s']:.2f}s")
+    elapsed = time.perf_counter() - start
+
+    succeeded = [r for r in results if r['status'] == 'ok']
+    total_rows = sum(r.get('linhas', 0) for r in succeeded)
+    print("\n--- Vazão do lote ---")
+    print(f"Arquivos: {len(succeeded)} ok, {len(results) - len(succeeded)} com erro")
+    print(f"Tempo total: {elapsed:.2f}s ({len(results) / elapsed:.2f} arquivos/s, {total_rows / elapsed:,.0f} linhas/s)")
+    if succeeded:
+        print(f"Tempo médio por arquivo: {sum(r['tempo_s'] for r in succeeded) / len(succeeded):.2f}s")
+    return 0 if len(succeeded) == len(results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,37 +1,44 @@
 import pandas as pd
-import numpy as np
-import time
 
-def analyze_dataframe(df, progress_callback=None):
+from models.correlation import STRONG_CORRELATION, top_correlated_pairs
+from utils.compute_backend import ComputeBackend, DataFrameBackend
+
+def analyze_dataframe(df, progress_callback=None, instrumentation=None):
     """
     Realiza uma análise exploratória completa em um DataFrame e gera um relatório textual.
 
     Args:
-        df (pd.DataFrame): O DataFrame a ser analisado.
+        df (pd.DataFrame | ComputeBackend): O DataFrame a ser analisado, ou um backend de
+            cálculo (ex.: `DuckDBBackend`, para datasets maiores que a memória).
         progress_callback (function, optional): Uma função para reportar o progresso.
+        instrumentation (PipelineInstrumentation, optional): Recebe o tempo, as linhas
+            processadas e o pico de memória de cada passo da análise.
     """
     report = []
     analysis_data = {}
     total_steps = 6 # Defina o número total de passos da análise
-
-    def update_progress(step, message):
+    dataset = df if isinstance(df, ComputeBackend) else DataFrameBackend(df)
+    num_rows = dataset.num_rows()
+    # Tipos e papéis das colunas vêm do catálogo do dataset, calculado uma vez (ver `utils.column_profile`)
+    catalog = dataset.column_catalog()
+
+    def update_progress(step, message, stage_name):
+        if instrumentation:
+            instrumentation.begin(stage_name, rows=num_rows)
         if progress_callback:
             progress_callback(step / total_steps, message)
-            time.sleep(0.5) # Pequeno delay para o utilizador conseguir ler a mensagem
 
     # 1. Visão Geral do Dataset
-    update_progress(1, "Analisando a visão geral do dataset...")
+    update_progress(1, "Analisando a visão geral do dataset...", "visao_geral")
     report.append("### 1. Visão Geral do Dataset")
-    num_rows, num_cols = df.shape
+    num_cols = len(dataset.columns)
     report.append(f"- **Número de Linhas:** {num_rows}")
     report.append(f"- **Número de Colunas:** {num_cols}")
 
     # 2. Tipos de Colunas
-    update_progress(2, "Identificando os tipos de colunas...")
+    update_progress(2, "Identificando os tipos de colunas...", "tipos_colunas")
     report.append("\n### 2. Tipos de Colunas")
-    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
+    numeric_cols, categorical_cols, datetime_cols = catalog.column_types()
 
     report.append(f"- **Colunas Numéricas ({len(numeric_cols)}):** `{', '.join(numeric_cols)}`")
     report.append(f"- **Colunas Categóricas ({len(categorical_cols)}):** `{', '.join(categorical_cols)}`")
@@ -42,77 +49,91 @@ def analyze_dataframe(df, progress_callback=None):
     analysis_data['datetime_cols'] = datetime_cols
 
     # 3. Análise de Correlação
-    update_progress(3, "Calculando correlações entre as variáveis...")
+    update_progress(3, "Calculando correlações entre as variáveis...", "correlacao")
     if len(numeric_cols) > 1:
         report.append("\n### 3. Análise de Correlação")
-        corr_matrix = df[numeric_cols].corr()
+        corr_matrix, rows_used = dataset.correlation(numeric_cols)
         analysis_data['corr_matrix'] = corr_matrix
+        if rows_used < num_rows:
+            report.append(f"_Correlações estimadas em uma amostra de {rows_used} linhas._")
 
-        corr_pairs = corr_matrix.unstack().sort_values(ascending=False).drop_duplicates()
-        high_corr = corr_pairs[(corr_pairs < 1) & (corr_pairs.abs() > 0.7)]
+        high_corr, total_high_corr = top_correlated_pairs(corr_matrix, threshold=STRONG_CORRELATION)
 
-        if not high_corr.empty:
+        if high_corr:
             report.append("Foram encontradas as seguintes correlações fortes (positivas ou negativas):")
-            for (col1, col2), val in high_corr.items():
+            for col1, col2, val in high_corr:
                 tipo = "positiva" if val > 0 else "negativa"
                 report.append(f"  - **`{col1}`** e **`{col2}`**: Correlação {tipo} de `{val:.2f}`.")
+            if total_high_corr > len(high_corr):
+                report.append(f"  - ... e mais {total_high_corr - len(high_corr)} par(es) com correlação forte.")
         else:
             report.append("- Nenhuma correlação forte (acima de 0.7) foi encontrada.")
 
     # 4. Análise de Outliers
-    update_progress(4, "Procurando por outliers nos dados...")
+    update_progress(4, "Procurando por outliers nos dados...", "outliers")
     if numeric_cols:
         report.append("\n### 4. Análise de Outliers")
+        outlier_counts = dataset.iqr_outlier_counts(numeric_cols)
         outliers_found = False
-        for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-
-            outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-            if not outliers.empty:
-                report.append(f"- A coluna **`{col}`** parece ter `{len(outliers)}` valor(es) atípico(s).")
+        for col, n_outliers in outlier_counts.items():
+            if n_outliers:
+                report.append(f"- A coluna **`{col}`** parece ter `{n_outliers}` valor(es) atípico(s).")
                 outliers_found = True
 
         if not outliers_found:
             report.append("- Nenhuma coluna parece ter outliers significativos.")
 
     # 5. Análise de Destaques
-    update_progress(5, "Analisando os principais destaques...")
+    update_progress(5, "Analisando os principais destaques...", "destaques")
     if categorical_cols and numeric_cols:
         report.append("\n### 5. Análise de Destaques")
-        metric_col = next((col for col in ['Vendas', 'Receita_Liquida', 'Receita'] if col in numeric_cols), numeric_cols[0])
+        metric_col = catalog.role_column('metrica') or numeric_cols[0]
         report.append(f"Analisando os destaques com base na coluna **`{metric_col}`**:")
 
         for cat_col in categorical_cols:
-            if df[cat_col].nunique() > 1:
-                top_performer = df.groupby(cat_col)[metric_col].sum().idxmax()
+            if dataset.nunique(cat_col) > 1:
+                top_performer = dataset.grouped_sum(cat_col, metric_col).idxmax()
                 report.append(f"- Em **`{cat_col}`**, a categoria com maior volume de `{metric_col}` é **{top_performer}**.")
 
     # 6. Destaques de Vendas
-    update_progress(6, "Gerando destaques de vendas...")
-    if 'Vendedor' in df.columns and 'Vendas' in df.columns:
+    update_progress(6, "Gerando destaques de vendas...", "destaques_vendas")
+    sales_col = catalog.role_column('metrica')
+    seller_col = catalog.role_column('vendedor')
+    product_col = catalog.role_column('produto')
+    if seller_col and sales_col:
         report.append("\n### 6. Destaques de Vendas")
 
-        top_sellers = df.groupby('Vendedor')['Vendas'].sum().nlargest(5)
-        report.append("\n**Top 5 Vendedores por Vendas:**")
+        top_sellers = dataset.grouped_sum(seller_col, sales_col).nlargest(5)
+        report.append(f"\n**Top 5 Vendedores por {sales_col}:**")
         for seller, total_sales in top_sellers.items():
             report.append(f"- **{seller}**: R$ {total_sales:,.2f}")
         analysis_data['top_sellers'] = top_sellers
 
-    if 'Categoria_Produto' in df.columns and 'Vendas' in df.columns:
-        top_products = df.groupby('Categoria_Produto')['Vendas'].sum().nlargest(5)
+    if product_col and sales_col:
+        # A mesma soma do passo 5 é reaproveitada pelo backend
+        product_sales = dataset.grouped_sum(product_col, sales_col)
+
+        top_products = product_sales.nlargest(5)
         report.append("\n**Top 5 Produtos Mais Vendidos:**")
         for product, total_sales in top_products.items():
             report.append(f"- **{product}**: R$ {total_sales:,.2f}")
         analysis_data['top_products'] = top_products
 
-        bottom_products = df.groupby('Categoria_Produto')['Vendas'].sum().nsmallest(5)
+        bottom_products = product_sales.nsmallest(5)
         report.append("\n**Top 5 Produtos Menos Vendidos:**")
         for product, total_sales in bottom_products.items():
             report.append(f"- **{product}**: R$ {total_sales:,.2f}")
         analysis_data['bottom_products'] = bottom_products
 
+    # Margem de erro das estatísticas, quando o backend as estima (modo aproximado)
+    approximation_notes = dataset.approximation_notes()
+    if approximation_notes:
+        report.append("\n### Precisão das Estimativas")
+        report.append("Estatísticas calculadas no modo aproximado:")
+        for note in approximation_notes:
+            report.append(f"- {note}")
+
+    if instrumentation:
+        instrumentation.end()
+
     return "\n".join(report), analysis_data
\ No newline at end of file
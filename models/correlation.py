@@ -0,0 +1,130 @@
+"""
+Matriz de correlação e extração dos pares mais fortes para planilhas largas.
+
+`df.corr()` seguido de `unstack().sort_values()` ordena as N×N entradas da matriz e depois precisa
+remover os pares espelhados. Aqui a matriz sai de produtos matriciais sobre as colunas centradas
+(acumulados em blocos de linhas, para limitar a memória em planilhas altas) e os pares fortes são
+lidos apenas do triângulo superior, com `argpartition` para escolher os k maiores.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_CORRELATION_DTYPE: precisão dos cálculos, float64 (padrão) ou float32.
+    DASHBOARD_CORRELATION_SAMPLE_ROWS: se maior que zero, estima a matriz em uma amostra aleatória
+        com esse número de linhas quando a planilha for maior (padrão: 0, usa todas as linhas).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CORRELATION_DTYPE = np.dtype(os.environ.get("DASHBOARD_CORRELATION_DTYPE", "float64"))
+CORRELATION_SAMPLE_ROWS = int(os.environ.get("DASHBOARD_CORRELATION_SAMPLE_ROWS", 0))
+CHUNK_ROWS = 100_000
+STRONG_CORRELATION = 0.7
+MAX_REPORTED_PAIRS = 20
+
+
+def _column_block(df, columns, start, stop, dtype):
+    """Copia as linhas [start, stop) das colunas em uma matriz 2D, com NaN no lugar dos ausentes."""
+    block = np.empty((stop - start, len(columns)), dtype=dtype)
+    for j, col in enumerate(columns):
+        series = df[col].iloc[start:stop]
+        if pd.api.types.is_extension_array_dtype(series.dtype):
+            block[:, j] = series.to_numpy(dtype=dtype, na_value=np.nan)
+        else:
+            block[:, j] = series.to_numpy()
+    return block
+
+
+def correlation_matrix(df, columns, dtype=None, sample_rows=None, chunk_rows=CHUNK_ROWS, seed=0):
+    """
+    Calcula a correlação de Pearson entre as colunas, como `df[columns].corr()`.
+
+    Sem valores ausentes, a matriz é um único produto `Xc.T @ Xc` das colunas centradas,
+    normalizado pelos desvios. Com ausentes, cada par usa apenas as linhas em que os dois valores
+    existem (como o pandas), a partir de quatro produtos com a máscara de valores presentes.
+
+    Args:
+        df (pd.DataFrame): Os dados.
+        columns (list): Colunas numéricas a correlacionar.
+        dtype: float64 ou float32 (padrão: CORRELATION_DTYPE).
+        sample_rows (int, optional): Estima a matriz em uma amostra aleatória com esse número de
+            linhas, se a planilha for maior (padrão: CORRELATION_SAMPLE_ROWS; 0 desativa).
+        chunk_rows (int): Número de linhas processadas por bloco.
+        seed (int): Semente da amostragem.
+
+    Returns:
+        tuple: (pd.DataFrame com a matriz de correlação, número de linhas usadas).
+    """
+    dtype = np.dtype(dtype or CORRELATION_DTYPE)
+    sample_rows = CORRELATION_SAMPLE_ROWS if sample_rows is None else sample_rows
+    if sample_rows and len(df) > sample_rows:
+        rows = np.sort(np.random.default_rng(seed).choice(len(df), size=sample_rows, replace=False))
+        df = df.iloc[rows]
+    data = df[columns]
+    n_cols = len(columns)
+
+    # Centrar pela média melhora a precisão dos produtos; o resultado não depende do deslocamento
+    means = data.mean().to_numpy(dtype=dtype)
+    has_missing = bool(data.isna().to_numpy().any())
+
+    xy = np.zeros((n_cols, n_cols), dtype=dtype)
+    if has_missing:
+        counts = np.zeros((n_cols, n_cols), dtype=dtype)
+        sums = np.zeros((n_cols, n_cols), dtype=dtype)
+        squares = np.zeros((n_cols, n_cols), dtype=dtype)
+    for start in range(0, len(data), chunk_rows):
+        block = _column_block(data, columns, start, min(start + chunk_rows, len(data)), dtype)
+        block -= means
+        if has_missing:
+            present = ~np.isnan(block)
+            np.nan_to_num(block, copy=False, nan=0.0)
+            mask = present.astype(dtype)
+            counts += mask.T @ mask
+            # sums[i, j]: soma de x_i nas linhas em que x_i e x_j existem
+            sums += block.T @ mask
+            squares += (block * block).T @ mask
+        xy += block.T @ block
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if has_missing:
+            cov = xy - sums * sums.T / counts
+            var_i = squares - sums * sums / counts
+            corr = cov / np.sqrt(var_i * var_i.T)
+            corr[counts < 2] = np.nan
+        else:
+            std = np.sqrt(np.diag(xy))
+            corr = xy / np.outer(std, std)
+    corr = np.clip(corr, -1.0, 1.0)
+    diagonal = np.diag(corr).copy()
+    np.fill_diagonal(corr, np.where(np.isnan(diagonal), np.nan, 1.0))
+    return pd.DataFrame(corr, index=columns, columns=columns), len(data)
+
+
+def top_correlated_pairs(corr_matrix, threshold=STRONG_CORRELATION, k=MAX_REPORTED_PAIRS):
+    """
+    Seleciona os pares de colunas distintas com |correlação| acima de `threshold`.
+
+    Só o triângulo superior da matriz é lido, então cada par aparece uma vez, mesmo quando
+    pares diferentes têm o mesmo coeficiente.
+
+    Args:
+        corr_matrix (pd.DataFrame): Matriz de correlação quadrada.
+        threshold (float): Valor absoluto mínimo da correlação.
+        k (int, optional): Número máximo de pares devolvidos (os de maior |correlação|).
+
+    Returns:
+        tuple: (lista de (coluna1, coluna2, correlação) em ordem decrescente de correlação,
+        número total de pares acima do limite).
+    """
+    values = corr_matrix.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    upper = values[rows, cols]
+    strong = np.flatnonzero(np.abs(np.nan_to_num(upper)) > threshold)
+    total = len(strong)
+    if k is not None and total > k:
+        strong = strong[np.argpartition(-np.abs(upper[strong]), k - 1)[:k]]
+    # Ordem decrescente pelo valor; empates ficam na ordem das colunas
+    strong = strong[np.lexsort((strong, -upper[strong]))]
+    labels = corr_matrix.columns
+    pairs = [(labels[rows[i]], labels[cols[i]], float(upper[i])) for i in strong]
+    return pairs, total
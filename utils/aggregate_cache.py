@@ -0,0 +1,151 @@
+"""
+Cache de agregados compartilhado entre as sessões do dashboard.
+
+Quando o usuário apenas troca uma aba ou um botão de rádio, o Streamlit executa o script inteiro
+de novo, mas os filtros não mudaram. Os KPIs, o relatório da análise e as tabelas que alimentam os
+gráficos são guardados aqui, indexados por (hash do dataset, estado normalizado dos filtros,
+especificação do agregado), e só são recalculados quando algum desses três muda.
+
+O cache é um LRU limitado pelo tamanho estimado dos valores em bytes.
+
+Configuração por variável de ambiente:
+    DASHBOARD_AGGREGATE_CACHE_MAX_BYTES: tamanho máximo do cache (padrão: 256 MiB).
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def estimate_size(obj):
+    """Estima, em bytes, a memória ocupada por um valor do cache."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def _normalize_value(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(str(item) for item in value))
+    return str(value)
+
+
+def normalize_filter_state(selected_filters, filter_mask=None):
+    """
+    Converte os filtros selecionados em uma chave hashable e independente da ordem.
+
+    Args:
+        selected_filters (dict): O dicionário retornado por `sidebar.show_filters`.
+        filter_mask (np.ndarray, optional): A máscara resultante. Quando é None, nenhum filtro
+            restringe o dataset e todos os estados equivalentes compartilham a mesma chave.
+    """
+    if filter_mask is None or not selected_filters:
+        return ('sem_filtros',)
+    return tuple(sorted((str(col), _normalize_value(value)) for col, value in selected_filters.items()))
+
+
+class AggregateCache:
+    """
+    Cache LRU de agregados, limitado pelo tamanho total estimado em bytes.
+
+    Os valores armazenados são compartilhados entre sessões e não devem ser alterados por quem
+    os recebe.
+
+    Args:
+        max_bytes (int, optional): Tamanho máximo. Usa DASHBOARD_AGGREGATE_CACHE_MAX_BYTES se omitido.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(max_bytes or os.environ.get("DASHBOARD_AGGREGATE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Retorna o valor de `key`, calculando-o com `compute()` se não estiver no cache."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return value  # Maior que o cache inteiro: não vale a pena guardar
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return value
+
+    def scope(self, dataset_hash, filter_state):
+        """Retorna uma visão do cache restrita a um dataset e a um estado de filtros."""
+        return AggregateScope(self, dataset_hash, filter_state)
+
+    def stats(self):
+        """Retorna os contadores de acertos e falhas e a ocupação atual do cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        """Remove todas as entradas e zera os contadores."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class AggregateScope:
+    """Acesso ao cache com o hash do dataset e o estado dos filtros já fixados na chave."""
+
+    def __init__(self, cache, dataset_hash, filter_state):
+        self.cache = cache
+        self.prefix = (dataset_hash, filter_state)
+
+    def get(self, spec, compute):
+        """
+        Retorna o agregado descrito por `spec`, calculando-o com `compute()` na primeira vez.
+
+        Args:
+            spec (tuple): Identifica o agregado, ex.: ('value_counts', 'Regiao').
+            compute (function): Calcula o agregado a partir dos dados filtrados.
+        """
+        if self.prefix[0] is None:
+            return compute()  # Dataset sem hash de conteúdo: não há como identificá-lo com segurança
+        return self.cache.get_or_compute(self.prefix + (spec,), compute)
+
+
+@st.cache_resource
+def get_aggregate_cache():
+    """Retorna o cache de agregados compartilhado por todas as sessões do processo."""
+    return AggregateCache()
@@ -0,0 +1,243 @@
+"""
+Ingestão incremental de arquivos que crescem por acréscimo de linhas.
+
+Quando um arquivo é enviado de novo com o mesmo nome (no lote, o mesmo caminho) e o conteúdo é
+o dataset anterior mais linhas novas, só as linhas novas (o delta) são convertidas e
+acrescentadas ao dataset anterior, que vem do cache em disco. O dataset resultante guarda em `attrs['append']` o hash do dataset
+anterior e o número de linhas dele; com isso, o índice de filtros, o cubo OLAP e os rollups
+temporais do novo dataset são obtidos estendendo as estruturas já calculadas do anterior com o
+delta (ver `split_appended`), e o custo da atualização diária acompanha o tamanho do delta.
+
+O acréscimo é detectado de três formas, nesta ordem:
+- CSV: os bytes do arquivo anterior são um prefixo do novo; só o final do arquivo é lido.
+- Coluna chave (DASHBOARD_APPEND_KEY): todas as chaves do dataset anterior continuam no novo
+  arquivo, com as mesmas linhas (em qualquer ordem); as linhas com chaves novas formam o delta.
+- Demais casos: as primeiras linhas do novo arquivo são iguais às do dataset anterior.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_APPEND_INGESTION: se '0', desliga a detecção de acréscimos (padrão: '1').
+    DASHBOARD_APPEND_KEY: coluna que identifica cada linha (padrão: nenhuma; compara o prefixo).
+"""
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+APPEND_INGESTION = os.environ.get("DASHBOARD_APPEND_INGESTION", "1") != "0"
+APPEND_KEY = os.environ.get("DASHBOARD_APPEND_KEY") or None
+
+# Última versão carregada de cada arquivo, no diretório do cache em disco, compartilhado por todos
+# os processos (servidor e lote); as atualizações são serializadas pelo arquivo de trava
+VERSIONS_FILE = "versoes.json"
+VERSIONS_LOCK_FILE = "versoes.lock"
+
+
+def _versions_path(directory):
+    return os.path.join(directory, VERSIONS_FILE)
+
+
+def _version_key(file_name):
+    # Caminho absoluto: arquivos com o mesmo nome em pastas diferentes (ex.: no lote) são
+    # versões distintas; um arquivo enviado pelo navegador só tem o nome e é identificado por ele
+    return os.path.abspath(str(file_name))
+
+
+@contextmanager
+def _versions_lock(directory):
+    """Trava exclusiva entre processos para ler, alterar e gravar o registro de versões."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, VERSIONS_LOCK_FILE), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_versions(directory):
+    try:
+        with open(_versions_path(directory), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Registro de versões ilegível em %s: %s", directory, e)
+        return {}
+
+
+def previous_version(directory, file_name):
+    """
+    Retorna a última versão carregada do arquivo `file_name`, ou None.
+
+    Returns:
+        dict: Com 'dataset_hash', 'rows' (linhas do dataset) e 'bytes' (tamanho do arquivo).
+    """
+    # O registro é sempre substituído por inteiro (`os.replace`): a leitura não precisa da trava
+    return _read_versions(directory).get(_version_key(file_name))
+
+
+def record_version(directory, file_name, dataset_hash, rows, n_bytes):
+    """Registra `dataset_hash` como a versão mais recente do arquivo `file_name`."""
+    try:
+        with _versions_lock(directory):
+            versions = _read_versions(directory)
+            versions[_version_key(file_name)] = {"dataset_hash": dataset_hash, "rows": int(rows), "bytes": int(n_bytes)}
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(versions, f, ensure_ascii=False)
+            os.replace(tmp_path, _versions_path(directory))
+    except OSError as e:
+        logger.warning("Não foi possível registrar a versão de %s: %s", file_name, e)
+
+
+def _lossless(original, converted):
+    """Indica se `converted` (a coluna `original` convertida para outro tipo) guarda os mesmos valores."""
+    if converted.isna().sum() != original.isna().sum():
+        return False
+    if converted.dtype.kind in "biuf" and original.dtype.kind in "biuf":
+        # Compara num tipo que representa os dois lados: no tipo compacto, 300 vira 44 em int8 e
+        # float32 arredonda pequenas diferenças
+        try:
+            common = np.result_type(converted.dtype, original.dtype)
+            return np.array_equal(converted.to_numpy(dtype=common), original.to_numpy(dtype=common), equal_nan=True)
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+def _same_values(previous, current):
+    # Compara no tipo da coluna anterior, desde que a conversão não altere nenhum valor
+    try:
+        converted = current.astype(previous.dtype)
+    except (TypeError, ValueError, OverflowError):
+        return False
+    if not _lossless(current, converted):
+        return False
+    return previous.reset_index(drop=True).equals(converted.reset_index(drop=True))
+
+
+def find_delta(previous, current, key=None):
+    """
+    Retorna as linhas de `current` que não estão em `previous`, se `current` for `previous`
+    mais linhas novas; senão, None.
+
+    Args:
+        previous (pd.DataFrame): O dataset anterior.
+        current (pd.DataFrame): O novo arquivo, já lido.
+        key (str, optional): Coluna que identifica as linhas (ex.: APPEND_KEY). Com ela, cada
+            linha de `previous` precisa estar em `current`, igual, sob a mesma chave; sem ela, as
+            primeiras linhas de `current` precisam ser iguais às de `previous`.
+    """
+    if set(previous.columns) != set(current.columns):
+        return None
+    current = current[list(previous.columns)]
+
+    if key is not None and key in previous.columns:
+        previous_keys = previous[key]
+        if previous_keys.isna().any() or not previous_keys.is_unique or not previous_keys.isin(current[key]).all():
+            return None  # Linhas removidas: não é um acréscimo
+        known = current[key].isin(previous_keys)
+        existing = current[known]
+        if not existing[key].is_unique:
+            return None
+        # As linhas já conhecidas precisam estar iguais; uma linha editada exige a recarga completa
+        existing = existing.set_index(key).loc[previous_keys.to_numpy()].reset_index()
+        if not all(_same_values(previous[col], existing[col]) for col in previous.columns):
+            return None
+        return current[~known]
+
+    n_rows = len(previous)
+    if len(current) < n_rows:
+        return None
+    prefix = current.iloc[:n_rows]
+    if not all(_same_values(previous[col], prefix[col]) for col in previous.columns):
+        return None
+    return current.iloc[n_rows:]
+
+
+def _align_column(previous, delta):
+    """Retorna as duas partes de uma coluna com o mesmo tipo, preservando os valores."""
+    if isinstance(previous.dtype, pd.CategoricalDtype):
+        # Categorias novas entram no fim da lista, sem recodificar as linhas anteriores
+        new_categories = pd.Index(delta.dropna().unique()).difference(previous.cat.categories)
+        if len(new_categories):
+            previous = previous.cat.add_categories(new_categories)
+        return previous, delta.astype(previous.dtype)
+
+    try:
+        converted = delta.astype(previous.dtype)
+        lossless = _lossless(delta, converted)
+    except (TypeError, ValueError, OverflowError):
+        lossless = False
+    if lossless:
+        return previous, converted
+
+    # Valores que não cabem no tipo anterior (ex.: int8 -> int32): as duas partes vão para o tipo comum
+    if previous.dtype.kind == "b":
+        previous = previous.astype(np.int8)
+    try:
+        target = np.result_type(previous.dtype, delta.dtype)
+    except TypeError:
+        target = np.dtype(object)
+    return previous.astype(target), delta.astype(target)
+
+
+def append_rows(previous, delta, previous_hash):
+    """
+    Acrescenta as linhas de `delta` ao dataset `previous`, convertidas para os mesmos tipos.
+
+    Returns:
+        pd.DataFrame: O novo dataset, com `attrs['append']` apontando para o anterior.
+    """
+    delta = delta[list(previous.columns)].reset_index(drop=True)
+    previous_columns, delta_columns = {}, {}
+    for col in previous.columns:
+        previous_columns[col], delta_columns[col] = _align_column(previous[col], delta[col])
+    combined = pd.concat(
+        [pd.DataFrame(previous_columns, copy=False), pd.DataFrame(delta_columns, copy=False)],
+        ignore_index=True,
+    )
+    combined.attrs = {
+        "dtype_report": previous.attrs.get("dtype_report", {}),
+        "append": {"dataset_hash": previous_hash, "rows": len(previous)},
+    }
+    return combined
+
+
+def split_appended(df):
+    """
+    Para um dataset formado por acréscimo, retorna (dataset anterior, linhas novas); senão, None.
+
+    O dataset anterior é uma fatia de `df` com o hash da versão anterior em `attrs`, de modo que
+    os caches por hash (índice de filtros, cubo, rollups) devolvem as estruturas já calculadas
+    dele, que são então estendidas com as linhas novas.
+    """
+    info = df.attrs.get("append")
+    if not info or info["rows"] > len(df):
+        return None
+    previous = df.iloc[:info["rows"]]
+    previous.attrs = {key: value for key, value in df.attrs.items() if key != "append"}
+    previous.attrs["dataset_hash"] = info["dataset_hash"]
+    delta = df.iloc[info["rows"]:]
+    delta.attrs = {}
+    return previous, delta
@@ -0,0 +1,133 @@
+"""
+Rasterização dos gráficos Plotly em PNG para o relatório em PDF.
+
+Todas as figuras do relatório são convertidas em paralelo por um pool de processos que fica vivo
+entre as exportações, de modo que cada processo reaproveita a sua instância do Kaleido. As imagens
+voltam como bytes, sem passar pelo disco, e ficam em um cache indexado pelo hash da especificação
+da figura: exportar de novo um relatório sem mudanças não rasteriza nada.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_RENDER_WORKERS: número de processos de rasterização (padrão: até 4, conforme as CPUs).
+    DASHBOARD_IMAGE_CACHE_MAX_BYTES: tamanho máximo do cache de imagens (padrão: 64 MiB).
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.environ.get("DASHBOARD_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("DASHBOARD_IMAGE_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+
+# Tema claro aplicado às imagens, para garantir as cores no PDF
+PDF_TEMPLATE = 'plotly_white'
+
+_executor = None
+_executor_lock = threading.Lock()
+_image_cache = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()
+
+
+def _rasterize(fig_json, width, height, scale):
+    """Converte a especificação JSON de uma figura em PNG. Executado nos processos do pool."""
+    import plotly.io as pio
+
+    fig = pio.from_json(fig_json)
+    fig.update_layout(template=PDF_TEMPLATE)
+    return pio.to_image(fig, format='png', width=width, height=height, scale=scale)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn' evita herdar as threads do servidor do Streamlit no fork
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _cache_get(key):
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return _image_cache[key]
+    return None
+
+
+def _cache_put(key, png):
+    global _image_cache_bytes
+    with _image_cache_lock:
+        if key in _image_cache or len(png) > IMAGE_CACHE_MAX_BYTES:
+            return
+        _image_cache[key] = png
+        _image_cache_bytes += len(png)
+        while _image_cache_bytes > IMAGE_CACHE_MAX_BYTES:
+            _, evicted = _image_cache.popitem(last=False)
+            _image_cache_bytes -= len(evicted)
+
+
+def figure_spec_hash(fig_json, width, height, scale):
+    """Hash da especificação da figura e das opções de rasterização."""
+    digest = hashlib.sha256(fig_json.encode('utf-8'))
+    digest.update(f"{width}x{height}@{scale}:{PDF_TEMPLATE}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_figures(figures, width=800, height=500, scale=2):
+    """
+    Rasteriza várias figuras Plotly em PNG, em paralelo e com cache.
+
+    Args:
+        figures (dict): Mapeia um nome para uma figura Plotly.
+        width (int), height (int), scale (float): Opções repassadas ao Kaleido.
+
+    Returns:
+        dict: Mapeia o mesmo nome para os bytes do PNG, na ordem de `figures`.
+    """
+    specs = {name: fig.to_json() for name, fig in figures.items()}
+    keys = {name: figure_spec_hash(spec, width, height, scale) for name, spec in specs.items()}
+
+    images = {}
+    pending = {}
+    for name, key in keys.items():
+        png = _cache_get(key)
+        if png is not None:
+            images[name] = png
+        else:
+            pending[name] = key
+
+    if len(pending) == 1 or RENDER_WORKERS <= 1:
+        # Uma figura só não compensa o custo de enviar ao pool
+        for name in pending:
+            images[name] = _rasterize(specs[name], width, height, scale)
+    elif pending:
+        try:
+            executor = _get_executor()
+            futures = {name: executor.submit(_rasterize, specs[name], width, height, scale) for name in pending}
+            for name, future in futures.items():
+                images[name] = future.result()
+        except BrokenProcessPool as e:
+            logger.warning("Pool de rasterização indisponível (%s); rasterizando sequencialmente.", e)
+            _reset_executor()
+            for name in pending:
+                if name not in images:
+                    images[name] = _rasterize(specs[name], width, height, scale)
+
+    for name, key in pending.items():
+        _cache_put(key, images[name])
+    return {name: images[name] for name in figures}
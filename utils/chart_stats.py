@@ -0,0 +1,81 @@
+"""
+Estatísticas calculadas no servidor para histogramas e boxplots.
+
+Com `px.histogram(df)` e `px.box(df)` todos os valores brutos vão para o navegador e o Plotly faz
+a contagem dos bins e o cálculo dos quartis em JavaScript. Aqui esses números são calculados com
+NumPy/pandas, então o tamanho da figura depende do número de bins e de grupos, não de linhas.
+"""
+import numpy as np
+
+DEFAULT_BINS = 30
+MAX_OUTLIERS_PER_GROUP = 50
+
+
+def histogram_bins(values, nbins=DEFAULT_BINS):
+    """
+    Conta os valores em `nbins` intervalos de mesma largura.
+
+    Returns:
+        tuple: (contagens, bordas dos intervalos), como em `np.histogram`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.histogram(values, bins=nbins)
+
+
+def box_stats(df, cat_col, num_col, max_outliers=MAX_OUTLIERS_PER_GROUP, seed=0):
+    """
+    Calcula, por grupo, os quartis, os limites dos bigodes e uma amostra dos outliers.
+
+    Os bigodes seguem a regra do Plotly: vão até o valor mais extremo dentro de 1,5 * IQR.
+
+    Args:
+        df (pd.DataFrame): Os dados.
+        cat_col (str): Coluna que define os grupos.
+        num_col (str): Coluna numérica resumida.
+        max_outliers (int): Número máximo de outliers mantidos por grupo.
+        seed (int): Semente da amostragem dos outliers.
+
+    Returns:
+        list[dict]: Um item por grupo, com 'name', 'q1', 'median', 'q3', 'lowerfence',
+        'upperfence', 'count', 'n_outliers' e 'outliers' (amostra).
+    """
+    data = df[[cat_col, num_col]].dropna()
+    grouped = data.groupby(cat_col, observed=True)[num_col]
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    if quartiles.empty:
+        return []
+
+    # Limites de 1,5 * IQR de cada grupo, propagados para cada linha
+    iqr = quartiles[0.75] - quartiles[0.25]
+    lower = (quartiles[0.25] - 1.5 * iqr).rename('lower')
+    upper = (quartiles[0.75] + 1.5 * iqr).rename('upper')
+    bounds = data[[cat_col]].join(lower, on=cat_col).join(upper, on=cat_col)
+    values = data[num_col]
+    inside = (values >= bounds['lower']) & (values <= bounds['upper'])
+
+    whiskers = values[inside].groupby(data.loc[inside, cat_col], observed=True).agg(['min', 'max'])
+    counts = grouped.size()
+    outliers = data.loc[~inside]
+    # Amostra (no máximo `max_outliers` por grupo) dos outliers, embaralhados com semente fixa
+    outliers = outliers.sample(frac=1, random_state=seed) if len(outliers) else outliers
+    n_outliers = outliers.groupby(cat_col, observed=True).size()
+    sampled = outliers.groupby(cat_col, observed=True).head(max_outliers)
+    outlier_samples = {name: group[num_col].to_numpy() for name, group in sampled.groupby(cat_col, observed=True)}
+
+    stats = []
+    for name, row in quartiles.iterrows():
+        stats.append({
+            'name': name,
+            'q1': row[0.25],
+            'median': row[0.5],
+            'q3': row[0.75],
+            'lowerfence': whiskers.at[name, 'min'] if name in whiskers.index else row[0.25],
+            'upperfence': whiskers.at[name, 'max'] if name in whiskers.index else row[0.75],
+            'count': int(counts.get(name, 0)),
+            'n_outliers': int(n_outliers.get(name, 0)),
+            'outliers': outlier_samples.get(name, np.zeros(0)),
+        })
+    return stats
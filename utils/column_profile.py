@@ -0,0 +1,251 @@
+"""
+Catálogo com o perfil das colunas, calculado uma única vez por dataset.
+
+Para cada coluna, guarda o tipo (dtype), a classe usada pela análise (numérica, categórica, data ou
+outra), o número de valores distintos, os valores distintos ordenados (nas colunas com poucos
+valores), o mínimo e o máximo (colunas numéricas e de data), o número de nulos e o papel da coluna
+no dashboard, detectado pelo nome:
+
+    data       colunas de data/hora
+    metrica    métrica de vendas (ex.: 'Vendas', 'Receita_Liquida'), na ordem de preferência
+    vendedor   quem vendeu (ex.: 'Vendedor')
+    produto    o que foi vendido (ex.: 'Categoria_Produto', 'Produto')
+
+Os filtros da sidebar, os KPIs e a análise leem o catálogo, de modo que uma rerun não percorre os
+dados só para descobrir as colunas. Para um dataset formado por acréscimo de linhas (ver
+`utils.append_ingestion`), o catálogo do dataset anterior é estendido com as linhas novas.
+"""
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.append_ingestion import split_appended
+
+# Colunas com até este número de valores distintos guardam a lista ordenada dos valores (deve ser
+# maior que `filter_index.MAX_FILTER_CARDINALITY`, que usa a lista como opções dos filtros)
+MAX_PROFILE_VALUES = 100
+
+NUMERIC, CATEGORICAL, DATETIME, OTHER = 'numerica', 'categorica', 'data', 'outra'
+
+# Nomes reconhecidos para cada papel, já normalizados (minúsculas, sem acentos, '_' no lugar de
+# espaços), em ordem de preferência
+ROLE_NAMES = {
+    'metrica': ['vendas', 'receita_liquida', 'receita', 'faturamento', 'valor_venda', 'valor_total'],
+    'vendedor': ['vendedor', 'vendedora', 'representante', 'seller'],
+    'produto': ['categoria_produto', 'produto', 'product', 'item'],
+}
+# Classe exigida de uma coluna para cada papel
+ROLE_KINDS = {'data': DATETIME, 'metrica': NUMERIC, 'vendedor': CATEGORICAL, 'produto': CATEGORICAL}
+
+
+def _normalize(name):
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(text.lower().split())
+
+
+def detect_role(name, kind):
+    """Retorna o papel da coluna `name` da classe `kind`, ou None."""
+    if kind == DATETIME:
+        return 'data'
+    normalized = _normalize(name)
+    for role, names in ROLE_NAMES.items():
+        if ROLE_KINDS[role] == kind and normalized in names:
+            return role
+    return None
+
+
+def date_column(df):
+    """A coluna de data usada no filtro de intervalo: a primeira de data/hora, ou None."""
+    date_cols = df.select_dtypes(include=['datetime64[ns]', 'datetimetz']).columns.tolist()
+    if not date_cols:
+        # O cache em Parquet pode devolver datas com outra resolução (ex.: datetime64[us])
+        date_cols = df.select_dtypes(include=['datetime']).columns.tolist()
+    return date_cols[0] if date_cols else None
+
+
+def _column_kinds(df):
+    # As mesmas seleções de tipo que a análise sempre usou
+    kinds = dict.fromkeys(df.columns, OTHER)
+    for kind, include in [(NUMERIC, np.number), (CATEGORICAL, ['object', 'category']),
+                          (DATETIME, ['datetime', 'datetimetz'])]:
+        for col in df.select_dtypes(include=include).columns:
+            kinds[col] = kind
+    return kinds
+
+
+def _sorted(values):
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=str)  # Tipos misturados na mesma coluna
+
+
+def _min_max(series, kind):
+    if kind not in (NUMERIC, DATETIME) or series.dtype.kind == 'b':
+        return None, None
+    return series.min(), series.max()
+
+
+def _profile(series, kind):
+    n_unique = int(series.nunique())
+    minimum, maximum = _min_max(series, kind)
+    return {
+        'dtype': str(series.dtype),
+        'kind': kind,
+        'role': detect_role(series.name, kind),
+        'nunique': n_unique,
+        'nulls': int(series.isna().sum()),
+        'min': minimum,
+        'max': maximum,
+        'values': _sorted(series.dropna().unique().tolist()) if n_unique <= MAX_PROFILE_VALUES else None,
+    }
+
+
+def _combine(a, b, function):
+    present = [value for value in (a, b) if value is not None and not pd.isna(value)]
+    return function(present) if present else a
+
+
+class ColumnCatalog:
+    """
+    Perfil de todas as colunas de um dataset.
+
+    Args:
+        profiles (dict): Perfil de cada coluna, na ordem do dataset, com as chaves 'dtype', 'kind',
+            'role', 'nunique', 'nulls', 'min', 'max' e 'values' (None em colunas com mais de
+            MAX_PROFILE_VALUES valores distintos).
+        n_rows (int): Número de linhas do dataset.
+        date_col (str, optional): A coluna de data usada no filtro de intervalo.
+    """
+
+    def __init__(self, profiles, n_rows, date_col=None):
+        self.profiles = profiles
+        self.n_rows = n_rows
+        self.date_col = date_col
+
+    @classmethod
+    def from_dataframe(cls, df):
+        kinds = _column_kinds(df)
+        profiles = {col: _profile(df[col], kinds[col]) for col in df.columns}
+        return cls(profiles, len(df), date_column(df))
+
+    def appended(self, delta, df):
+        """
+        Retorna o catálogo do dataset `df`, formado pelo dataset deste catálogo mais as linhas de
+        `delta`.
+
+        Nulos, mínimos, máximos e as listas de valores são combinados com os do delta; só as
+        colunas com valores distintos demais para guardar a lista são recontadas em `df`.
+        Retorna None se o delta mudar as colunas ou as suas classes.
+        """
+        kinds = _column_kinds(delta)
+        if list(kinds) != list(self.profiles) or date_column(delta) != self.date_col or any(
+                kinds[col] != profile['kind'] for col, profile in self.profiles.items()):
+            return None
+
+        profiles = {}
+        for col, previous in self.profiles.items():
+            new = _profile(delta[col], previous['kind'])
+            profile = dict(previous, dtype=new['dtype'], nulls=previous['nulls'] + new['nulls'],
+                           min=_combine(previous['min'], new['min'], min),
+                           max=_combine(previous['max'], new['max'], max))
+            if previous['values'] is not None and new['values'] is not None:
+                known = set(previous['values'])
+                values = previous['values'] + [value for value in new['values'] if value not in known]
+                profile['values'] = _sorted(values) if len(values) <= MAX_PROFILE_VALUES else None
+                profile['nunique'] = len(values)
+            else:
+                profile['values'] = None
+                profile['nunique'] = int(df[col].nunique())
+            profiles[col] = profile
+        return ColumnCatalog(profiles, self.n_rows + len(delta), self.date_col)
+
+    @property
+    def columns(self):
+        return list(self.profiles)
+
+    def columns_of_kind(self, kind):
+        return [col for col, profile in self.profiles.items() if profile['kind'] == kind]
+
+    def column_types(self):
+        """Retorna (colunas numéricas, colunas categóricas, colunas de data/hora)."""
+        return self.columns_of_kind(NUMERIC), self.columns_of_kind(CATEGORICAL), self.columns_of_kind(DATETIME)
+
+    def role_columns(self, role):
+        """As colunas com o papel `role`, da preferida para a menos preferida."""
+        cols = [col for col, profile in self.profiles.items() if profile['role'] == role]
+        if role in ROLE_NAMES:
+            cols.sort(key=lambda col: ROLE_NAMES[role].index(_normalize(col)))
+        return cols
+
+    def role_column(self, role):
+        """A coluna preferida com o papel `role`, ou None."""
+        cols = self.role_columns(role)
+        return cols[0] if cols else None
+
+    def filter_columns(self, max_cardinality):
+        """
+        Retorna (coluna de data ou None, colunas categóricas com menos de `max_cardinality`
+        valores distintos e pelo menos um valor).
+        """
+        category_cols = [
+            col for col in self.columns_of_kind(CATEGORICAL)
+            if 0 < self.profiles[col]['nunique'] < max_cardinality
+        ]
+        return self.date_col, category_cols
+
+    def filter_options(self, max_cardinality):
+        """As opções dos filtros da sidebar, no formato de `filter_index.filter_options`."""
+        date_col, category_cols = self.filter_columns(max_cardinality)
+        options = {'date_col': date_col, 'date_min': None, 'date_max': None, 'categories': {}}
+        if date_col is not None:
+            options['date_min'] = self.profiles[date_col]['min']
+            options['date_max'] = self.profiles[date_col]['max']
+        for col in category_cols:
+            options['categories'][col] = list(self.profiles[col]['values'])
+        return options
+
+    def to_frame(self):
+        """O catálogo como tabela, uma linha por coluna, para exibição."""
+        def text(value):
+            return '' if value is None or (np.isscalar(value) and pd.isna(value)) else str(value)
+
+        rows = []
+        for col, profile in self.profiles.items():
+            values = profile['values']
+            rows.append({
+                'coluna': col,
+                'tipo': profile['dtype'],
+                'classe': profile['kind'],
+                'papel': profile['role'] or '',
+                'distintos': profile['nunique'],
+                'nulos': profile['nulls'],
+                'minimo': text(profile['min']),
+                'maximo': text(profile['max']),
+                'valores': '' if values is None else ', '.join(map(str, values[:10])) + (' ...' if len(values) > 10 else ''),
+            })
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource(max_entries=8)
+def _cached_column_catalog(dataset_hash, _df):
+    parts = split_appended(_df)
+    if parts is not None:
+        previous, delta = parts
+        catalog = get_column_catalog(previous).appended(delta, _df)
+        if catalog is not None:
+            return catalog
+    return ColumnCatalog.from_dataframe(_df)
+
+
+def get_column_catalog(df):
+    """Retorna o catálogo de colunas do dataset, calculado uma única vez por hash de conteúdo."""
+    dataset_hash = df.attrs.get('dataset_hash')
+    if dataset_hash is not None:
+        catalog = _cached_column_catalog(dataset_hash, df)
+        # Recortes do dataset (ex.: já filtrado) mantêm o hash em `attrs`; o perfil é o do dataset completo
+        if catalog.n_rows == len(df):
+            return catalog
+    return ColumnCatalog.from_dataframe(df)
@@ -0,0 +1,605 @@
+"""
+Backends de cálculo usados pela análise e pelo dashboard.
+
+`DataFrameBackend` executa as operações sobre um DataFrame em memória (o caminho padrão).
+`DuckDBBackend` executa as mesmas operações como consultas SQL sobre um arquivo Parquet em disco,
+com o DuckDB embutido: filtros viram cláusulas WHERE e apenas os resultados agregados (somas,
+quantis, correlações, tabelas cruzadas, amostras para os gráficos) são materializados no pandas,
+então o dataset pode ser maior que a memória do servidor.
+
+Os dois backends têm a mesma interface e devem produzir o mesmo relatório; a paridade é
+verificada por `benchmarks/check_backend_parity.py`.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_COMPUTE_BACKEND: 'pandas' (padrão) ou 'duckdb' (modo fora da memória).
+    DASHBOARD_CHART_SAMPLE_ROWS: número de linhas da amostra usada nos gráficos do modo
+        fora da memória (padrão: 200.000).
+    DASHBOARD_APPROXIMATE: se '1', usa `ApproximateBackend` no lugar do `DataFrameBackend`
+        (quantis, valores distintos e somas por grupo estimados com sketches).
+"""
+import importlib.util
+import os
+import threading
+from abc import ABC, abstractmethod
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from models.correlation import correlation_matrix
+from utils import olap_cube, rollups
+from utils.column_profile import (CATEGORICAL, DATETIME, MAX_PROFILE_VALUES, NUMERIC, OTHER, ColumnCatalog,
+                                  detect_role, get_column_catalog)
+from utils.filter_index import MAX_FILTER_CARDINALITY, filter_options, get_filter_index
+
+COMPUTE_BACKEND = os.environ.get("DASHBOARD_COMPUTE_BACKEND", "pandas")
+CHART_SAMPLE_ROWS = int(os.environ.get("DASHBOARD_CHART_SAMPLE_ROWS", 200_000))
+APPROXIMATE_MODE = os.environ.get("DASHBOARD_APPROXIMATE", "0").lower() in ("1", "true", "sim")
+
+# O modo fora da memória só é ativado se o DuckDB estiver instalado
+OUT_OF_CORE = COMPUTE_BACKEND == "duckdb" and importlib.util.find_spec("duckdb") is not None
+
+
+def _float_sums(values):
+    # Somas de colunas float32 (ver `optimize_dtypes`) são acumuladas em float64
+    return values.astype('float64') if values.dtype == 'float32' else values
+
+
+class ComputeBackend(ABC):
+    """
+    Interface comum dos backends. Cada instância representa o dataset com um conjunto de filtros.
+
+    Atributos:
+        dataset_hash (str): Hash do conteúdo do dataset (ver `data_loader.read_dataset`).
+        attrs (dict): Metadados do dataset, como em `DataFrame.attrs`.
+        columns (list): Nomes das colunas.
+    """
+
+    dataset_hash = None
+    attrs = {}
+    columns = []
+
+    @abstractmethod
+    def filtered(self, selected_filters):
+        """Retorna o backend restrito aos filtros retornados por `sidebar.show_filters`."""
+
+    @abstractmethod
+    def filter_options(self):
+        """Opções dos filtros da sidebar, no formato de `filter_index.filter_options`."""
+
+    @abstractmethod
+    def column_catalog(self):
+        """Perfil das colunas do dataset completo (ver `utils.column_profile`)."""
+
+    @abstractmethod
+    def num_rows(self):
+        ...
+
+    @abstractmethod
+    def column_types(self):
+        """Retorna (colunas numéricas, colunas categóricas, colunas de data/hora)."""
+
+    @abstractmethod
+    def head(self, n=5):
+        ...
+
+    @abstractmethod
+    def sample(self, n, seed=0):
+        """Retorna no máximo `n` linhas, sorteadas com semente fixa, como DataFrame."""
+
+    @abstractmethod
+    def sum(self, col):
+        ...
+
+    @abstractmethod
+    def nunique(self, col):
+        ...
+
+    @abstractmethod
+    def grouped_sum(self, by, metric_col):
+        """Soma de `metric_col` por valor de `by` (sem grupos vazios ou nulos), ordenada por `by`."""
+
+    @abstractmethod
+    def grouped_mean(self, by, metric_col):
+        """Média de `metric_col` por valor de `by` (sem grupos vazios ou nulos), ordenada por `by`."""
+
+    @abstractmethod
+    def quantiles(self, cols, qs):
+        """Quantis com interpolação linear, como `df[cols].quantile(qs)`."""
+
+    @abstractmethod
+    def iqr_outlier_counts(self, cols):
+        """Número de valores fora de 1,5 * IQR em cada coluna."""
+
+    @abstractmethod
+    def correlation(self, cols):
+        """Retorna (matriz de correlação, número de linhas usadas)."""
+
+    @abstractmethod
+    def crosstab(self, index_col, columns_col):
+        """Contagem de linhas por par de valores, como `pd.crosstab`."""
+
+    @abstractmethod
+    def time_rollup(self, time_col, granularity):
+        """
+        Soma, contagem, mínimo e máximo das colunas numéricas por período de `time_col`.
+
+        Returns:
+            pd.DataFrame: No formato de `rollups.daily_rollup`, na granularidade pedida
+            ('day', 'week', 'month' ou 'quarter').
+        """
+
+    def approximation_notes(self):
+        """Descreve a margem de erro das estatísticas aproximadas (vazia quando tudo é exato)."""
+        return []
+
+
+class DataFrameBackend(ComputeBackend):
+    """
+    Backend sobre um DataFrame em memória.
+
+    Args:
+        df (pd.DataFrame): O dataset (já filtrado ou não).
+        source (pd.DataFrame, optional): O dataset completo, usado para montar o índice de filtros.
+        selected_filters (dict, optional): Os filtros que levaram de `source` a `df`.
+    """
+
+    def __init__(self, df, source=None, selected_filters=None):
+        self.df = df
+        self.source = df if source is None else source
+        self.selected_filters = selected_filters
+        self.attrs = self.source.attrs
+        self.dataset_hash = self.attrs.get('dataset_hash')
+        self.columns = df.columns.tolist()
+        self._group_sums = {}
+        self._cube_cells = None
+
+    def _cube(self):
+        """
+        Retorna (cubo, células selecionadas pelos filtros), ou (None, None) se o cubo do dataset
+        não existir ou não puder atender a estes filtros (ver `utils.olap_cube`).
+        """
+        if self._cube_cells is None:
+            cube = olap_cube.get_cube(self.source)
+            cells = None
+            if cube is not None:
+                if self.df is self.source:
+                    cells = cube.cells
+                elif self.selected_filters is not None:
+                    cells = cube.select(get_filter_index(self.source), self.selected_filters)
+            self._cube_cells = (cube, cells) if cells is not None else (None, None)
+        return self._cube_cells
+
+    def filtered(self, selected_filters):
+        mask = get_filter_index(self.source).mask(selected_filters)
+        return self if mask is None else DataFrameBackend(self.source[mask], self.source, selected_filters)
+
+    def filter_options(self):
+        return filter_options(self.source)
+
+    def column_catalog(self):
+        return get_column_catalog(self.source)
+
+    def num_rows(self):
+        return len(self.df)
+
+    def column_types(self):
+        return self.column_catalog().column_types()
+
+    def head(self, n=5):
+        return self.df.head(n)
+
+    def sample(self, n, seed=0):
+        return self.df if len(self.df) <= n else self.df.sample(n, random_state=seed).sort_index()
+
+    def sum(self, col):
+        cube, cells = self._cube()
+        if cube is not None and col in cube.measures:
+            return cells[(col, 'sum')].sum()
+        return _float_sums(self.df[col]).sum()
+
+    def nunique(self, col):
+        if self.df is self.source:
+            return self.column_catalog().profiles[col]['nunique']
+        cube, cells = self._cube()
+        if cube is not None and col in cube.dimensions:
+            return cells.index.get_level_values(col).nunique()
+        return self.df[col].nunique()
+
+    def grouped_sum(self, by, metric_col):
+        # Os passos da análise reaproveitam o mesmo agrupamento
+        key = (by, metric_col)
+        if key not in self._group_sums:
+            cube, cells = self._cube()
+            if cube is not None and by in cube.dimensions and metric_col in cube.measures:
+                sums = cube.group_stats(cells, by, metric_col)['sum']
+            else:
+                sums = _float_sums(self.df[metric_col]).groupby(self.df[by], observed=True).sum()
+            self._group_sums[key] = sums.rename(metric_col)
+        return self._group_sums[key]
+
+    def grouped_mean(self, by, metric_col):
+        cube, cells = self._cube()
+        if cube is not None and by in cube.dimensions and metric_col in cube.measures:
+            return cube.group_stats(cells, by, metric_col)['mean'].rename(metric_col)
+        return self.df.groupby(by, observed=True)[metric_col].mean()
+
+    def quantiles(self, cols, qs):
+        return self.df[cols].quantile(qs)
+
+    def iqr_outlier_counts(self, cols):
+        # Os quartis de todas as colunas saem de uma única chamada a `quantile` e a contagem usa
+        # máscaras NumPy, sem construir DataFrames filtrados
+        quartiles = self.quantiles(cols, [0.25, 0.75])
+        counts = {}
+        for col in cols:
+            q1 = quartiles.at[0.25, col]
+            q3 = quartiles.at[0.75, col]
+            iqr = q3 - q1
+            lower_bound = q1 - 1.5 * iqr
+            upper_bound = q3 + 1.5 * iqr
+
+            series = self.df[col]
+            if pd.api.types.is_extension_array_dtype(series.dtype):
+                values = series.to_numpy(dtype='float64', na_value=np.nan)
+            else:
+                values = series.to_numpy()
+            counts[col] = int(np.count_nonzero((values < lower_bound) | (values > upper_bound)))
+        return counts
+
+    def correlation(self, cols):
+        return correlation_matrix(self.df, cols)
+
+    def crosstab(self, index_col, columns_col):
+        cube, cells = self._cube()
+        if cube is not None and index_col in cube.dimensions and columns_col in cube.dimensions:
+            counts = cells[olap_cube.ROWS].groupby(level=[index_col, columns_col], observed=True).sum()
+            return counts.unstack(fill_value=0).rename_axis(index=index_col, columns=columns_col)
+        return pd.crosstab(self.df[index_col], self.df[columns_col])
+
+    def time_rollup(self, time_col, granularity):
+        value_cols = DataFrameBackend(self.source).column_types()[0]
+        return rollups.time_rollup(self.df, self.source, self.selected_filters, time_col, value_cols, granularity)
+
+
+class ApproximateBackend(DataFrameBackend):
+    """
+    Backend em memória que estima quantis, limites de IQR, valores distintos e somas por grupo
+    com sketches (ver `utils.sketches`). As demais operações são exatas.
+
+    Os sketches do dataset completo são calculados por blocos, uma vez por dataset; sem filtros
+    ou com filtro só de datas eles são combinados, e com filtros categóricos as linhas filtradas
+    são resumidas bloco a bloco. Os sketches de cada backend só são montados no primeiro uso.
+
+    Args:
+        df (pd.DataFrame): O dataset (já filtrado ou não).
+        source (pd.DataFrame, optional): O dataset completo.
+        selected_filters (dict, optional): Os filtros que levaram de `source` a `df`.
+    """
+
+    @cached_property
+    def sketches(self):
+        # Calculados no primeiro uso: numa rerun servida pelo cache de agregados não há o que estimar
+        from utils import sketches
+
+        catalog = self.column_catalog()
+        numeric_cols, categorical_cols, _ = catalog.column_types()
+        # A métrica dos destaques e das vendas por vendedor e produto na análise
+        metric_cols = [catalog.role_column('metrica') or numeric_cols[0]] if numeric_cols else []
+
+        blocks = sketches.get_block_sketches(self.source, numeric_cols, categorical_cols, metric_cols)
+        index = blocks.index
+        selected_filters = self.selected_filters
+        if self.df is self.source:
+            return blocks.combined()
+        if (selected_filters and 'date_range' in selected_filters and index.sorted_dates is not None
+                and not index.restricts_categories(selected_filters)):
+            return blocks.combined(*index.date_positions(*selected_filters['date_range']))
+        return sketches.build_sketches(self.df, numeric_cols, categorical_cols, metric_cols)
+
+    def filtered(self, selected_filters):
+        mask = get_filter_index(self.source).mask(selected_filters)
+        return self if mask is None else ApproximateBackend(self.source[mask], self.source, selected_filters)
+
+    def nunique(self, col):
+        sketch = self.sketches.distinct.get(col)
+        return super().nunique(col) if sketch is None else sketch.count()
+
+    def grouped_sum(self, by, metric_col):
+        sketch = self.sketches.group_sums.get((by, metric_col))
+        if sketch is None:
+            return super().grouped_sum(by, metric_col)
+        return sketch.sums.sort_index().rename_axis(by).rename(metric_col)
+
+    def quantiles(self, cols, qs):
+        if any(col not in self.sketches.quantiles for col in cols):
+            return super().quantiles(cols, qs)
+        return pd.DataFrame({col: self.sketches.quantiles[col].quantiles(qs) for col in cols}, index=list(qs))
+
+    def iqr_outlier_counts(self, cols):
+        if any(col not in self.sketches.quantiles for col in cols):
+            return super().iqr_outlier_counts(cols)
+        # As contagens saem das posições estimadas dos limites no próprio sketch
+        quartiles = self.quantiles(cols, [0.25, 0.75])
+        counts = {}
+        for col in cols:
+            sketch = self.sketches.quantiles[col]
+            iqr = quartiles.at[0.75, col] - quartiles.at[0.25, col]
+            below = sketch.rank(quartiles.at[0.25, col] - 1.5 * iqr)
+            above = 1 - sketch.rank(quartiles.at[0.75, col] + 1.5 * iqr, inclusive=True)
+            counts[col] = int(round((below + above) * sketch.n))
+        return counts
+
+    def approximation_notes(self):
+        notes = []
+        kll = next(iter(self.sketches.quantiles.values()), None)
+        if kll is not None:
+            notes.append(
+                f"Quantis e outliers: sketch KLL (k={kll.k}), erro de posição de até "
+                f"±{kll.rank_error:.1%} das linhas (~99% de confiança); as contagens de outliers "
+                f"podem variar em até ±{2 * kll.rank_error * self.num_rows():,.0f} linhas."
+            )
+        hll = next(iter(self.sketches.distinct.values()), None)
+        if hll is not None:
+            notes.append(
+                f"Valores distintos: HyperLogLog com {len(hll.registers)} registradores, "
+                f"erro relativo típico de ±{hll.relative_error:.1%}."
+            )
+        for (by, metric), sketch in self.sketches.group_sums.items():
+            if sketch is not None and not sketch.exact:
+                notes.append(
+                    f"Somas de `{metric}` por `{by}`: cada soma pode estar subestimada em até "
+                    f"{sketch.max_error:,.2f} (resumo com {sketch.capacity} grupos); a lista dos "
+                    f"menores grupos não é confiável."
+                )
+        return notes
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+_NUMERIC_TYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT',
+                  'UINTEGER', 'UBIGINT', 'UHUGEINT', 'FLOAT', 'DOUBLE', 'DECIMAL')
+
+
+class DuckDBBackend(ComputeBackend):
+    """
+    Backend que consulta um arquivo Parquet com o DuckDB, sem carregá-lo na memória.
+
+    Args:
+        path (str): Caminho do arquivo Parquet.
+        dataset_hash (str, optional): Hash do conteúdo do dataset.
+        attrs (dict, optional): Metadados do dataset.
+    """
+
+    # Número máximo de expressões por consulta ao calcular correlações par a par
+    CORRELATION_BATCH = 2000
+
+    def __init__(self, path, dataset_hash=None, attrs=None):
+        import duckdb
+
+        self.path = path
+        self.dataset_hash = dataset_hash
+        self.attrs = dict(attrs or {}, dataset_hash=dataset_hash)
+        self._connection = duckdb.connect()
+        self._connection.execute(f"CREATE VIEW dataset AS SELECT * FROM read_parquet({self._literal(path)})")
+        # Uma conexão do DuckDB não deve ser usada por várias threads ao mesmo tempo
+        self._lock = threading.Lock()
+        self._schema = self._connection.execute("DESCRIBE dataset").fetchall()
+        self.columns = [row[0] for row in self._schema]
+        self.conditions = []
+        self.params = []
+        self._catalog = None
+        self._group_sums = {}
+
+    @staticmethod
+    def _literal(value):
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _query(self, sql, params=None):
+        with self._lock:
+            return self._connection.execute(sql, params or []).fetchall()
+
+    def _query_df(self, sql, params=None):
+        with self._lock:
+            return self._connection.execute(sql, params or []).df()
+
+    def _sum(self, col):
+        # Somas de ponto flutuante com compensação (Kahan), como o groupby do pandas: o resultado
+        # não depende da ordem em que as threads do DuckDB acumulam as parcelas
+        column_type = dict(row[:2] for row in self._schema)[col]
+        return f"fsum({_quote(col)})" if column_type in ('FLOAT', 'DOUBLE') else f"SUM({_quote(col)})"
+
+    def _where(self):
+        return f" WHERE {' AND '.join(self.conditions)}" if self.conditions else ""
+
+    def _restricted(self, conditions, params):
+        clone = object.__new__(DuckDBBackend)
+        clone.__dict__.update(self.__dict__)
+        clone.conditions = self.conditions + conditions
+        clone.params = self.params + params
+        clone._group_sums = {}
+        return clone
+
+    def filtered(self, selected_filters):
+        options = self.filter_options()
+        conditions, params = [], []
+        if selected_filters and 'date_range' in selected_filters and options['date_col'] is not None:
+            # Como no índice de filtros, linhas sem data ficam fora de qualquer intervalo
+            start, end = selected_filters['date_range']
+            conditions.append(f"{_quote(options['date_col'])} BETWEEN ? AND ?")
+            params += [pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()]
+        for col, values in (selected_filters or {}).items():
+            if col not in options['categories']:
+                continue
+            selected = [value for value in options['categories'][col] if value in set(values)]
+            if len(selected) == len(options['categories'][col]):
+                continue  # Todas as categorias selecionadas: não restringe nada
+            if not selected:
+                conditions.append("FALSE")
+            else:
+                conditions.append(f"{_quote(col)} IN ({', '.join('?' * len(selected))})")
+                params += selected
+        return self._restricted(conditions, params) if conditions else self
+
+    def filter_options(self):
+        return self.column_catalog().filter_options(MAX_FILTER_CARDINALITY)
+
+    def column_catalog(self):
+        if self._catalog is None:
+            # Sempre sobre o dataset completo: uma consulta com as contagens, mínimos e máximos de
+            # todas as colunas e outra com os valores das colunas de poucos valores distintos
+            kinds = dict.fromkeys(self.columns, OTHER)
+            for kind, cols in zip((NUMERIC, CATEGORICAL, DATETIME), self.column_types()):
+                kinds.update(dict.fromkeys(cols, kind))
+            expressions = []
+            for col in self.columns:
+                expressions += [f"COUNT(DISTINCT {_quote(col)})", f"COUNT(*) - COUNT({_quote(col)})"]
+                if kinds[col] in (NUMERIC, DATETIME):
+                    expressions += [f"MIN({_quote(col)})", f"MAX({_quote(col)})"]
+            row = iter(self._query(f"SELECT COUNT(*), {', '.join(expressions)} FROM dataset")[0])
+            n_rows = next(row)
+
+            profiles = {}
+            column_types = {name: column_type for name, column_type, *_ in self._schema}
+            for col in self.columns:
+                profile = {'dtype': column_types[col], 'kind': kinds[col], 'role': detect_role(col, kinds[col]),
+                           'nunique': next(row), 'nulls': next(row), 'min': None, 'max': None, 'values': None}
+                if kinds[col] in (NUMERIC, DATETIME):
+                    profile['min'], profile['max'] = next(row), next(row)
+                    if kinds[col] == DATETIME:
+                        profile['min'], profile['max'] = pd.Timestamp(profile['min']), pd.Timestamp(profile['max'])
+                profiles[col] = profile
+
+            listed = [col for col, profile in profiles.items() if profile['nunique'] <= MAX_PROFILE_VALUES]
+            if listed:
+                values = self._query("SELECT " + ", ".join(
+                    f"list(DISTINCT {_quote(col)} ORDER BY {_quote(col)}) FILTER (WHERE {_quote(col)} IS NOT NULL)"
+                    for col in listed) + " FROM dataset")[0]
+                for col, col_values in zip(listed, values):
+                    profiles[col]['values'] = col_values or []
+
+            datetime_cols = [col for col in self.columns if kinds[col] == DATETIME]
+            self._catalog = ColumnCatalog(profiles, n_rows, datetime_cols[0] if datetime_cols else None)
+        return self._catalog
+
+    def num_rows(self):
+        return self._query(f"SELECT COUNT(*) FROM dataset{self._where()}", self.params)[0][0]
+
+    def column_types(self):
+        numeric, categorical, datetime = [], [], []
+        for name, column_type, *_ in self._schema:
+            if column_type.startswith(_NUMERIC_TYPES):
+                numeric.append(name)
+            elif column_type in ('VARCHAR',) or column_type.startswith('ENUM'):
+                categorical.append(name)
+            elif column_type.startswith(('TIMESTAMP', 'DATE')):
+                datetime.append(name)
+        return numeric, categorical, datetime
+
+    def head(self, n=5):
+        return self._query_df(f"SELECT * FROM dataset{self._where()} LIMIT {int(n)}", self.params)
+
+    def sample(self, n, seed=0):
+        # O SAMPLE do DuckDB é aplicado antes do WHERE; a subconsulta filtra primeiro
+        return self._query_df(
+            f"SELECT * FROM (SELECT * FROM dataset{self._where()}) "
+            f"USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE ({int(seed)})",
+            self.params
+        )
+
+    def sum(self, col):
+        return self._query(f"SELECT COALESCE({self._sum(col)}, 0) FROM dataset{self._where()}", self.params)[0][0]
+
+    def nunique(self, col):
+        if not self.conditions:
+            return self.column_catalog().profiles[col]['nunique']
+        return self._query(f"SELECT COUNT(DISTINCT {_quote(col)}) FROM dataset{self._where()}", self.params)[0][0]
+
+    def grouped_sum(self, by, metric_col):
+        key = (by, metric_col)
+        if key not in self._group_sums:
+            conditions = self.conditions + [f"{_quote(by)} IS NOT NULL"]
+            rows = self._query(
+                f"SELECT {_quote(by)}, COALESCE({self._sum(metric_col)}, 0) FROM dataset "
+                f"WHERE {' AND '.join(conditions)} GROUP BY 1 ORDER BY 1",
+                self.params
+            )
+            index = pd.Index([row[0] for row in rows], name=by)
+            self._group_sums[key] = pd.Series([row[1] for row in rows], index=index, name=metric_col,
+                                              dtype=None if rows else 'float64')
+        return self._group_sums[key]
+
+    def grouped_mean(self, by, metric_col):
+        conditions = self.conditions + [f"{_quote(by)} IS NOT NULL"]
+        rows = self._query(
+            f"SELECT {_quote(by)}, AVG({_quote(metric_col)}) FROM dataset "
+            f"WHERE {' AND '.join(conditions)} GROUP BY 1 ORDER BY 1",
+            self.params
+        )
+        index = pd.Index([row[0] for row in rows], name=by)
+        return pd.Series([row[1] for row in rows], index=index, name=metric_col, dtype='float64')
+
+    def quantiles(self, cols, qs):
+        qs = list(qs)
+        row = self._query("SELECT " + ", ".join(
+            f"quantile_cont({_quote(col)}, {qs})" for col in cols) + f" FROM dataset{self._where()}", self.params)[0]
+        return pd.DataFrame({col: values if values is not None else [np.nan] * len(qs)
+                             for col, values in zip(cols, row)}, index=qs)
+
+    def iqr_outlier_counts(self, cols):
+        quartiles = self.quantiles(cols, [0.25, 0.75])
+        expressions = []
+        for col in cols:
+            q1 = quartiles.at[0.25, col]
+            q3 = quartiles.at[0.75, col]
+            iqr = q3 - q1
+            if np.isnan(iqr):
+                expressions.append("COUNT(*) FILTER (WHERE FALSE)")
+                continue
+            expressions.append(f"COUNT(*) FILTER (WHERE {_quote(col)} < {float(q1 - 1.5 * iqr)!r} "
+                               f"OR {_quote(col)} > {float(q3 + 1.5 * iqr)!r})")
+        row = self._query(f"SELECT {', '.join(expressions)} FROM dataset{self._where()}", self.params)[0]
+        return {col: int(count) for col, count in zip(cols, row)}
+
+    def correlation(self, cols):
+        matrix = np.full((len(cols), len(cols)), np.nan)
+        pairs = [(i, j) for i in range(len(cols)) for j in range(i, len(cols))]
+        for start in range(0, len(pairs), self.CORRELATION_BATCH):
+            batch = pairs[start:start + self.CORRELATION_BATCH]
+            row = self._query("SELECT " + ", ".join(
+                f"corr({_quote(cols[i])}, {_quote(cols[j])})" for i, j in batch) + f" FROM dataset{self._where()}",
+                self.params)[0]
+            for (i, j), value in zip(batch, row):
+                matrix[i, j] = matrix[j, i] = np.nan if value is None else value
+        # O pandas devolve 1 na diagonal das colunas não constantes
+        diagonal = np.diag(matrix).copy()
+        np.fill_diagonal(matrix, np.where(np.isnan(diagonal), np.nan, 1.0))
+        return pd.DataFrame(np.clip(matrix, -1.0, 1.0), index=cols, columns=cols), self.num_rows()
+
+    def crosstab(self, index_col, columns_col):
+        counts = self._query_df(
+            f"SELECT {_quote(index_col)} AS i, {_quote(columns_col)} AS c, COUNT(*) AS n FROM dataset "
+            f"WHERE {' AND '.join(self.conditions + [f'{_quote(index_col)} IS NOT NULL', f'{_quote(columns_col)} IS NOT NULL'])} "
+            f"GROUP BY 1, 2",
+            self.params
+        )
+        table = counts.pivot(index='i', columns='c', values='n').fillna(0).astype('int64')
+        return table.rename_axis(index=index_col, columns=columns_col).sort_index().sort_index(axis=1)
+
+    def time_rollup(self, time_col, granularity):
+        value_cols = self.column_types()[0]
+        aggregates = [
+            f"{function}({_quote(col)})" if function != 'SUM' else self._sum(col)
+            for col in value_cols for function in ('SUM', 'COUNT', 'MIN', 'MAX')
+        ]
+        conditions = self.conditions + [f"{_quote(time_col)} IS NOT NULL"]
+        rows = self._query(
+            f"SELECT CAST(date_trunc('{granularity}', {_quote(time_col)}) AS TIMESTAMP), {', '.join(aggregates)} "
+            f"FROM dataset WHERE {' AND '.join(conditions)} GROUP BY 1 ORDER BY 1",
+            self.params
+        )
+        columns = pd.MultiIndex.from_product([value_cols, ['sum', 'count', 'min', 'max']])
+        index = pd.DatetimeIndex([row[0] for row in rows], name=time_col)
+        return pd.DataFrame([row[1:] for row in rows], index=index, columns=columns, dtype='float64')
@@ -1,37 +1,445 @@
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-@st.cache_data # Usa o cache do Streamlit para otimizar o carregamento
-def load_data(uploaded_file):
+from utils import append_ingestion, compute_backend, streaming_reader
+from utils.dataset_registry import get_dataset_registry
+from utils.disk_cache import DiskCache, MappedCache, content_hash
+from utils.dtype_optimizer import optimize_dtypes
+from utils.file_formats import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Incrementar sempre que a leitura ou a conversão de tipos mudar, invalidando o cache em disco
+LOADER_VERSION = 4
+
+# Modo de leitura das planilhas: 'auto' usa streaming a partir de STREAMING_THRESHOLD_BYTES,
+# 'streaming' usa sempre e 'pandas' nunca (lê tudo de uma vez com pd.read_excel)
+INGESTION_MODE = os.environ.get('DASHBOARD_INGESTION_MODE', 'auto')
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('DASHBOARD_STREAMING_THRESHOLD_BYTES', 20 * 1024 ** 2))
+
+# Com DASHBOARD_MMAP_CACHE=1 (padrão), os datasets também são gravados em Arrow IPC e abertos por
+# mapeamento de memória, compartilhando as páginas entre os processos do servidor
+MAPPED_CACHE = os.environ.get('DASHBOARD_MMAP_CACHE', '1') != '0'
+
+# As abas de uma planilha são lidas em paralelo por até DASHBOARD_LOAD_WORKERS processos
+# (o openpyxl é limitado pela CPU e segura o GIL)
+LOAD_WORKERS = int(os.environ.get('DASHBOARD_LOAD_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Coluna com o nome da aba de origem de cada linha, em planilhas com mais de uma aba
+SOURCE_SHEET_COLUMN = 'Planilha_Origem'
+
+# Chaves do `st.session_state` com o dataset da sessão (id do upload, abas, handle do registro)
+# e as abas do arquivo carregado (id do upload, nomes)
+SESSION_DATASET_KEY = '_dataset_handle'
+SESSION_SHEETS_KEY = '_dataset_sheets'
+
+dataset_cache = DiskCache()
+mapped_cache = MappedCache()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _read_bytes(uploaded_file):
+    """Retorna o conteúdo bruto do arquivo carregado."""
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+def _coerce_date_columns(df):
+    """
+    Tenta converter colunas que PARECEM datas para o formato datetime de forma mais segura.
+    """
+    for col in df.columns:
+        # Converte apenas se 'data' ou 'date' estiver no nome da coluna (case-insensitive)
+        if 'data' in str(col).lower() or 'date' in str(col).lower():
+            if df[col].dtype == 'object':
+                try:
+                    df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+                except (ValueError, TypeError):
+                    # Se não for uma data, mantém como está
+                    pass
+    return df
+
+def _is_workbook(file_name):
+    return os.path.splitext(str(file_name).lower())[1] in ('.xlsx', '.xls')
+
+def _parse_file(data, file_name, sheet=0):
+    """
+    Lê o conteúdo do arquivo de acordo com a sua extensão.
+
+    CSVs são sempre lidos em streaming; planilhas usam o leitor em streaming quando o modo de
+    leitura pede (ou quando o arquivo é grande) e o `pd.read_excel` caso contrário. Das planilhas,
+    lê a aba `sheet` (nome ou posição).
+    """
+    extension = os.path.splitext(str(file_name).lower())[1]
+    if extension == '.csv':
+        return streaming_reader.read_csv_streaming(data)
+    if extension == '.parquet':
+        return _coerce_date_columns(pd.read_parquet(io.BytesIO(data)))
+
+    use_streaming = INGESTION_MODE == 'streaming' or (
+        INGESTION_MODE == 'auto' and len(data) >= STREAMING_THRESHOLD_BYTES
+    )
+    if use_streaming:
+        return streaming_reader.read_excel_streaming(data, file_name, sheet=sheet)
+
+    # Tenta ler o arquivo Excel.
+    df = pd.read_excel(io.BytesIO(data), sheet_name=sheet, engine='openpyxl')
+    return _coerce_date_columns(df)
+
+def _parse_sheet_from_path(path, file_name, sheet):
+    """Lê uma aba a partir do arquivo gravado em disco. Executado nos processos do pool."""
+    with open(path, 'rb') as f:
+        return _parse_file(f.read(), file_name, sheet)
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn' evita herdar as threads do servidor do Streamlit no fork
+            _executor = ProcessPoolExecutor(max_workers=LOAD_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _sheet_key(dataset_hash, sheet):
+    return content_hash(dataset_hash.encode('utf-8'), 'aba', sheet)
+
+def selection_hash(dataset_hash, sheets=None):
+    """Hash do dataset formado pelas abas `sheets` do arquivo com hash `dataset_hash` (None = todas)."""
+    if sheets is None:
+        return dataset_hash
+    return content_hash(dataset_hash.encode('utf-8'), 'abas', *sheets)
+
+def _parse_sheets(data, file_name, dataset_hash, sheets):
+    """
+    Lê as abas pedidas. Cada aba fica no cache em disco, então mudar a seleção só lê as abas que
+    ainda não foram lidas; essas são lidas em paralelo no pool de processos.
+
+    Returns:
+        dict: Mapeia o nome de cada aba para o seu DataFrame, na ordem de `sheets`.
+    """
+    frames = {sheet: dataset_cache.get(_sheet_key(dataset_hash, sheet)) for sheet in sheets}
+    pending = [sheet for sheet, df in frames.items() if df is None]
+
+    if len(pending) == 1 or LOAD_WORKERS <= 1:
+        # Uma aba só não compensa o custo de enviar ao pool
+        for sheet in pending:
+            frames[sheet] = _parse_file(data, file_name, sheet)
+    elif pending:
+        # Os processos leem o arquivo do disco, em vez de receber uma cópia do conteúdo por aba
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(str(file_name))[1])
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            executor = _get_executor()
+            futures = {sheet: executor.submit(_parse_sheet_from_path, path, file_name, sheet) for sheet in pending}
+            for sheet, future in futures.items():
+                frames[sheet] = future.result()
+        except BrokenProcessPool as e:
+            logger.warning("Pool de leitura indisponível (%s); lendo as abas sequencialmente.", e)
+            _reset_executor()
+            for sheet in pending:
+                if frames[sheet] is None:
+                    frames[sheet] = _parse_file(data, file_name, sheet)
+        finally:
+            os.remove(path)
+
+    for sheet in pending:
+        dataset_cache.put(_sheet_key(dataset_hash, sheet), frames[sheet])
+    return frames
+
+def _column_kind(series):
+    if series.isna().all():
+        return None  # Coluna vazia: compatível com qualquer tipo
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return 'numérica'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'data'
+    return 'texto'
+
+def concat_sheets(frames):
+    """
+    Junta as abas em um único DataFrame, com o nome da aba de cada linha em SOURCE_SHEET_COLUMN.
+
+    Abas sem colunas são ignoradas. As demais precisam ter as mesmas colunas (em qualquer ordem)
+    e tipos compatíveis; a ordem das colunas segue a primeira aba.
+
+    Args:
+        frames (dict): Mapeia o nome de cada aba para o seu DataFrame.
+
+    Raises:
+        ValueError: Se as abas não tiverem as mesmas colunas ou se os tipos forem incompatíveis.
+    """
+    frames = {sheet: df for sheet, df in frames.items() if len(df.columns)}
+    if not frames:
+        return pd.DataFrame()
+
+    first_sheet, first = next(iter(frames.items()))
+    columns = list(first.columns)
+    kinds = dict.fromkeys(columns)
+    for sheet, df in frames.items():
+        missing = [col for col in columns if col not in df.columns]
+        extra = [col for col in df.columns if col not in kinds]
+        if missing or extra:
+            raise ValueError(
+                f"A aba '{sheet}' não tem as mesmas colunas da aba '{first_sheet}' "
+                f"(faltando: {', '.join(map(str, missing)) or 'nenhuma'}; "
+                f"a mais: {', '.join(map(str, extra)) or 'nenhuma'})."
+            )
+        for col in columns:
+            kind = _column_kind(df[col])
+            if kind is None:
+                continue
+            if kinds[col] is None:
+                kinds[col] = kind
+            elif kind != kinds[col]:
+                raise ValueError(f"A coluna '{col}' é {kind} na aba '{sheet}', mas {kinds[col]} nas abas anteriores.")
+
+    combined = pd.concat([df[columns] for df in frames.values()], ignore_index=True)
+    sources = np.repeat(np.arange(len(frames)), [len(df) for df in frames.values()])
+    combined[SOURCE_SHEET_COLUMN] = pd.Categorical.from_codes(sources, categories=list(frames))
+    return combined
+
+def _parse_dataset(data, file_name, dataset_hash, sheets=None):
+    """Lê o arquivo; das planilhas com várias abas, junta as abas pedidas (None = todas)."""
+    if not _is_workbook(file_name):
+        return _parse_file(data, file_name)
+    names = streaming_reader.sheet_names(data, file_name)
+    if sheets is None:
+        if len(names) <= 1:
+            return _parse_file(data, file_name)
+        sheets = names
+    unknown = [sheet for sheet in sheets if sheet not in names]
+    if unknown:
+        raise ValueError(f"Aba(s) não encontrada(s) na planilha: {', '.join(unknown)}.")
+    return concat_sheets(_parse_sheets(data, file_name, dataset_hash, sheets))
+
+def _cached_dataset(dataset_hash):
+    """Retorna o dataset do cache em disco (mapeado ou Parquet), ou None."""
+    df = mapped_cache.get(dataset_hash) if MAPPED_CACHE else None
+    return dataset_cache.get(dataset_hash) if df is None else df
+
+def _csv_tail(data, previous):
+    """
+    Se os bytes da versão anterior de um CSV forem um prefixo de `data`, retorna o cabeçalho
+    seguido só das linhas novas; senão, None.
+    """
+    n_bytes = previous['bytes']
+    if len(data) <= n_bytes or data[n_bytes - 1:n_bytes] != b'\n':
+        return None
+    # O hash do prefixo é calculado sobre uma visão dos bytes, sem copiar o histórico
+    if content_hash(memoryview(data)[:n_bytes], LOADER_VERSION) != previous['dataset_hash']:
+        return None
+    return data[:data.index(b'\n') + 1] + data[n_bytes:]
+
+def _read_appended(data, file_name, file_hash):
+    """
+    Se o arquivo for a última versão carregada com o mesmo nome mais linhas novas, converte só as
+    linhas novas e as acrescenta ao dataset anterior (ver `utils.append_ingestion`).
+
+    Returns:
+        tuple: (dataset com as linhas novas ou None, DataFrame lido do arquivo inteiro ou None),
+        para que um arquivo que não é um acréscimo não precise ser lido de novo.
     """
-    Carrega dados de um arquivo Excel (xlsx, xls) carregado via Streamlit.
-    
+    previous = append_ingestion.previous_version(dataset_cache.directory, file_name)
+    if previous is None or previous['dataset_hash'] == file_hash:
+        return None, None
+    base = _cached_dataset(previous['dataset_hash'])
+    if base is None:
+        return None, None
+
+    tail = _csv_tail(data, previous) if os.path.splitext(str(file_name).lower())[1] == '.csv' else None
+    if tail is not None:
+        return append_ingestion.append_rows(base, streaming_reader.read_csv_streaming(tail), previous['dataset_hash']), None
+
+    parsed = _parse_dataset(data, file_name, file_hash)
+    delta = append_ingestion.find_delta(base, parsed, append_ingestion.APPEND_KEY)
+    if delta is None:
+        return None, parsed
+    return append_ingestion.append_rows(base, delta, previous['dataset_hash']), None
+
+def read_dataset(data, file_name, dataset_hash=None, sheets=None):
+    """
+    Lê, converte e otimiza um dataset a partir do conteúdo bruto do arquivo, sem depender do Streamlit.
+
+    Usa o cache em disco indexado pelo hash do conteúdo. Com o cache mapeado ativo, o dataset é
+    aberto direto do arquivo Arrow, sem leitura nem conversão, e as colunas apontam para páginas
+    compartilhadas com os outros processos (somente leitura). Erros de leitura são propagados.
+
+    Se o arquivo for uma versão anterior do mesmo arquivo com linhas a mais, só as linhas novas
+    são convertidas e o dataset guarda em `attrs['append']` a versão de que deriva.
+
+    Args:
+        data (bytes): O conteúdo do arquivo.
+        file_name (str): O nome do arquivo, usado para identificar o formato.
+        dataset_hash (str, optional): O hash do conteúdo, se já tiver sido calculado.
+        sheets (list, optional): As abas a incluir, na ordem da planilha. Por padrão, todas; com
+            mais de uma aba, elas são juntadas e a aba de origem fica em SOURCE_SHEET_COLUMN.
+
+    Returns:
+        pd.DataFrame: O dataset, com `attrs['dataset_hash']` (que identifica também as abas
+        escolhidas) e `attrs['dtype_report']`.
+    """
+    file_hash = dataset_hash or content_hash(data, LOADER_VERSION)
+    dataset_hash = selection_hash(file_hash, sheets)
+
+    df = mapped_cache.get(dataset_hash) if MAPPED_CACHE else None
+    if df is None:
+        df = dataset_cache.get(dataset_hash)
+        if df is None:
+            parsed = None
+            if append_ingestion.APPEND_INGESTION and sheets is None:
+                df, parsed = _read_appended(data, file_name, file_hash)
+            if df is None:
+                df = _parse_dataset(data, file_name, file_hash, sheets) if parsed is None else parsed
+                df, dtype_report = optimize_dtypes(df)
+                df.attrs['dtype_report'] = dtype_report
+            dataset_cache.put(dataset_hash, df)
+        if MAPPED_CACHE and mapped_cache.put(dataset_hash, df):
+            # Troca a cópia privada pela mapeada, que este processo também passa a compartilhar
+            mapped = mapped_cache.get(dataset_hash)
+            if mapped is not None:
+                df = mapped
+
+    df.attrs['dataset_hash'] = dataset_hash
+    if append_ingestion.APPEND_INGESTION and sheets is None:
+        append_ingestion.record_version(dataset_cache.directory, file_name, file_hash, len(df), len(data))
+    return df
+
+def list_sheets(uploaded_file):
+    """
+    Retorna os nomes das abas do arquivo carregado, na ordem da planilha (lista vazia para CSV e
+    Parquet). O resultado fica no `st.session_state` até o arquivo mudar.
+    """
+    file_name = getattr(uploaded_file, 'name', '')
+    if uploaded_file is None or not _is_workbook(file_name):
+        return []
+
+    file_id = getattr(uploaded_file, 'file_id', None)
+    current = st.session_state.get(SESSION_SHEETS_KEY)
+    if current is not None and file_id is not None and current[0] == file_id:
+        return current[1]
+    try:
+        names = streaming_reader.sheet_names(_read_bytes(uploaded_file), file_name)
+    except Exception:
+        names = []  # O erro de leitura é mostrado por `load_data`
+    st.session_state[SESSION_SHEETS_KEY] = (file_id, names)
+    return names
+
+def load_data(uploaded_file, sheets=None):
+    """
+    Carrega dados de um arquivo Excel (xlsx, xls), CSV ou Parquet carregado via Streamlit.
+
+    As colunas são convertidas para os tipos mais compactos (ver `optimize_dtypes`) e o resultado
+    é guardado em um cache em disco indexado pelo hash do conteúdo, então o mesmo arquivo não é
+    lido novamente pelo openpyxl, nem após reiniciar o servidor.
+
+    Na memória, o dataset fica no registro compartilhado do processo (ver `utils.dataset_registry`):
+    todas as sessões que abrem o mesmo arquivo usam as mesmas colunas, somente leitura. A sessão
+    guarda o seu handle no `st.session_state` e os reruns seguintes não releem nem recalculam o hash.
+
+    Das planilhas com várias abas, as abas escolhidas são lidas em paralelo e juntadas em um único
+    dataset, com a aba de origem de cada linha em SOURCE_SHEET_COLUMN (ver `read_dataset`).
+
     Args:
         uploaded_file: O objeto de arquivo do Streamlit.
+        sheets (list, optional): As abas a carregar, na ordem da planilha. Por padrão, todas.
 
     Returns:
         Um DataFrame do pandas se o carregamento for bem-sucedido, None caso contrário.
+        O hash do conteúdo fica disponível em `df.attrs['dataset_hash']` e a economia de memória
+        por coluna em `df.attrs['dtype_report']`.
     """
     if uploaded_file is None:
         return None
-        
+    if sheets is not None and not sheets:
+        st.warning("Selecione ao menos uma aba da planilha.")
+        return None
+
+    file_id = getattr(uploaded_file, 'file_id', None)
+    selection = None if sheets is None else tuple(sheets)
+    current = st.session_state.get(SESSION_DATASET_KEY)
+    if current is not None and file_id is not None and current[:2] == (file_id, selection):
+        return current[2].df
+
     try:
-        # Tenta ler o arquivo Excel.
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
-        
-        # Tenta converter colunas que PARECEM datas para o formato datetime de forma mais segura
-        for col in df.columns:
-            # Converte apenas se 'data' ou 'date' estiver no nome da coluna (case-insensitive)
-            if 'data' in str(col).lower() or 'date' in str(col).lower():
-                if df[col].dtype == 'object':
-                    try:
-                        df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
-                    except (ValueError, TypeError):
-                        # Se não for uma data, mantém como está
-                        pass
-        
-        return df
+        data = _read_bytes(uploaded_file)
+        file_hash = content_hash(data, LOADER_VERSION)
+        file_name = getattr(uploaded_file, 'name', '')
+        handle = get_dataset_registry().acquire(
+            selection_hash(file_hash, sheets),
+            lambda: read_dataset(data, file_name, file_hash, sheets),
+        )
     except Exception as e:
-        st.error(f"Erro ao ler o arquivo Excel: {e}")
-        st.warning("Por favor, verifique se o arquivo é um Excel (.xlsx ou .xls) válido.")
-        return None
\ No newline at end of file
+        st.error(f"Erro ao ler o arquivo: {e}")
+        st.warning("Por favor, verifique se o arquivo é um Excel (.xlsx ou .xls), CSV ou Parquet válido.")
+        return None
+
+    # Substituir o handle anterior libera a referência da sessão ao dataset antigo
+    st.session_state[SESSION_DATASET_KEY] = (file_id, selection, handle)
+    return handle.df
+
+def dataset_path(data, file_name, sheets=None):
+    """
+    Garante que o dataset esteja no cache em disco e retorna o caminho do seu arquivo Parquet.
+
+    Arquivos Parquet são copiados para o cache sem passar pelo pandas; os demais formatos são
+    lidos e convertidos uma vez por `read_dataset`.
+
+    Returns:
+        tuple: (caminho do arquivo Parquet, hash do conteúdo, metadados do dataset).
+    """
+    file_hash = content_hash(data, LOADER_VERSION)
+    dataset_hash = selection_hash(file_hash, sheets)
+    path = dataset_cache.path(dataset_hash)
+    attrs = {}
+    if path is None:
+        if os.path.splitext(str(file_name).lower())[1] == '.parquet':
+            dataset_cache.put_bytes(dataset_hash, data)
+        else:
+            attrs = read_dataset(data, file_name, file_hash, sheets).attrs
+        path = dataset_cache.path(dataset_hash)
+    if path is None:
+        raise RuntimeError("O modo fora da memória exige o cache em disco (instale o pyarrow).")
+    return path, dataset_hash, attrs
+
+@st.cache_resource(max_entries=8)
+def load_dataset_backend(uploaded_file, sheets=None):
+    """
+    Carrega o arquivo no modo fora da memória: os dados ficam em Parquet no cache em disco e são
+    consultados pelo DuckDB (ver `utils.compute_backend`).
+
+    Returns:
+        DuckDBBackend: O backend do dataset, ou None se o carregamento falhar.
+    """
+    if uploaded_file is None:
+        return None
+
+    try:
+        if sheets is not None and not sheets:
+            st.warning("Selecione ao menos uma aba da planilha.")
+            return None
+        path, dataset_hash, attrs = dataset_path(_read_bytes(uploaded_file), getattr(uploaded_file, 'name', ''), sheets)
+        return compute_backend.DuckDBBackend(path, dataset_hash, attrs)
+    except Exception as e:
+        st.error(f"Erro ao ler o arquivo: {e}")
+        st.warning("Por favor, verifique se o arquivo é um Excel (.xlsx ou .xls), CSV ou Parquet válido.")
+        return None
@@ -0,0 +1,154 @@
+"""
+Registro de datasets compartilhado entre as sessões do dashboard.
+
+Cada dataset carregado fica uma única vez na memória do processo, indexado pelo hash do conteúdo
+do arquivo: se dez analistas abrem a mesma planilha, as dez sessões leem as mesmas colunas. Os
+arrays das colunas são marcados como somente leitura e cada sessão recebe uma cópia rasa do
+DataFrame (sem copiar os dados); com o copy-on-write do pandas, qualquer alteração feita por uma
+sessão copia apenas o que foi alterado, sem tocar nos dados das outras.
+
+As sessões seguram o dataset por meio de um `DatasetHandle` guardado no seu `st.session_state`.
+Quando a sessão termina ou troca de arquivo, o handle é coletado e a referência é liberada.
+Datasets sem referências continuam disponíveis para novos uploads e são removidos do menos
+recentemente usado para o mais recente quando o total passa do limite de memória.
+
+Configuração por variável de ambiente:
+    DASHBOARD_REGISTRY_MAX_BYTES: memória máxima dos datasets sem sessões ativas (padrão: 2 GiB).
+        Datasets em uso nunca são removidos.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def freeze(df):
+    """
+    Retorna um DataFrame com os mesmos dados de `df` e as colunas NumPy somente leitura.
+
+    As colunas não são copiadas: o resultado aponta para os mesmos arrays, e escritas diretas
+    (`df.loc[...] = ...`) passam a falhar em vez de alterar os dados compartilhados.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, np.dtype):
+            values = series.to_numpy(copy=False).view()
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            columns[col] = series.array  # Categorias, textos e datas com fuso: protegidos pelo copy-on-write
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.attrs = df.attrs
+    return frozen
+
+
+class DatasetHandle:
+    """
+    Referência de uma sessão a um dataset do registro.
+
+    Attributes:
+        dataset_hash (str): O hash do conteúdo do dataset.
+        df (pd.DataFrame): Uma cópia rasa do dataset compartilhado, exclusiva da sessão.
+    """
+
+    def __init__(self, registry, dataset_hash, df):
+        self.dataset_hash = dataset_hash
+        self.df = df.copy(deep=False)
+        self.df.attrs = dict(df.attrs)
+        # A referência é liberada quando o handle é coletado (fim da sessão ou troca de arquivo)
+        weakref.finalize(self, registry.release, dataset_hash)
+
+
+class DatasetRegistry:
+    """
+    Datasets carregados no processo, com contagem de referências e remoção LRU.
+
+    Args:
+        max_bytes (int, optional): Memória máxima dos datasets sem referências.
+            Usa DASHBOARD_REGISTRY_MAX_BYTES se omitido.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(max_bytes or os.environ.get("DASHBOARD_REGISTRY_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self._entries = OrderedDict()  # hash -> {'df', 'bytes', 'refs'}
+        self._lock = threading.Lock()
+        self._loading = {}  # hash -> trava do carregamento em andamento
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, dataset_hash, load):
+        """
+        Retorna um handle para o dataset, carregando-o com `load()` se ainda não estiver no registro.
+
+        Sessões que pedem o mesmo dataset ao mesmo tempo esperam um único carregamento.
+        """
+        with self._lock:
+            loading = self._loading.setdefault(dataset_hash, threading.Lock())
+        with loading:
+            with self._lock:
+                entry = self._entries.get(dataset_hash)
+                if entry is not None:
+                    self.hits += 1
+            if entry is None:
+                df = freeze(load())
+                entry = {'df': df, 'bytes': int(df.memory_usage(deep=True).sum()), 'refs': 0}
+                with self._lock:
+                    self.misses += 1
+                    self._entries[dataset_hash] = entry
+            with self._lock:
+                self._entries.move_to_end(dataset_hash)
+                entry['refs'] += 1
+                self._loading.pop(dataset_hash, None)
+                self._evict()
+        return DatasetHandle(self, dataset_hash, entry['df'])
+
+    def release(self, dataset_hash):
+        """Libera uma referência ao dataset (chamado quando um `DatasetHandle` é coletado)."""
+        with self._lock:
+            entry = self._entries.get(dataset_hash)
+            if entry is not None:
+                entry['refs'] = max(0, entry['refs'] - 1)
+                self._evict()
+
+    def _evict(self):
+        # Chamado com a trava adquirida; só remove datasets que nenhuma sessão está usando
+        total = sum(entry['bytes'] for entry in self._entries.values())
+        for dataset_hash in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[dataset_hash]
+            if entry['refs'] == 0:
+                total -= entry['bytes']
+                del self._entries[dataset_hash]
+
+    def stats(self):
+        """Retorna os datasets em memória, as referências ativas e os contadores de acertos."""
+        with self._lock:
+            return {
+                'datasets': len(self._entries),
+                'refs': sum(entry['refs'] for entry in self._entries.values()),
+                'bytes': sum(entry['bytes'] for entry in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        """Remove todos os datasets e zera os contadores (os handles existentes continuam válidos)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+@st.cache_resource
+def get_dataset_registry():
+    """Retorna o registro de datasets compartilhado por todas as sessões do processo."""
+    return DatasetRegistry()
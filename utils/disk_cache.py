@@ -0,0 +1,327 @@
+"""
+Cache em disco, em formato Parquet, dos DataFrames já lidos e convertidos pelo carregador.
+
+As entradas são indexadas pelo hash do conteúdo do arquivo enviado, então um novo upload do
+mesmo arquivo (ou uma requisição atendida por outro processo do servidor) é carregado direto
+do Parquet, sem passar novamente pelo parser do Excel. O tamanho total do cache é limitado e as
+entradas menos usadas recentemente são removidas primeiro.
+
+Além do Parquet, os datasets podem ser gravados em Arrow IPC sem compressão (`MappedCache`).
+Esses arquivos são abertos por mapeamento de memória: as colunas numéricas, as datas e os códigos
+das categorias apontam direto para as páginas do arquivo, que o sistema operacional compartilha
+entre todos os processos do servidor. Um processo novo chega ao dataset sem ler nem converter
+nada, e cada processo extra quase não aumenta a memória residente.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_CACHE_DIR: diretório do cache (padrão: ~/.cache/proj_dashboard).
+    DASHBOARD_CACHE_MAX_BYTES: tamanho máximo do cache em bytes (padrão: 2 GiB).
+    DASHBOARD_MMAP_DIR: diretório dos arquivos Arrow (padrão: o subdiretório 'mmap' do cache).
+    DASHBOARD_MMAP_MAX_BYTES: tamanho máximo dos arquivos Arrow em bytes (padrão: 8 GiB).
+
+Uso pela linha de comando:
+    python -m utils.disk_cache [--mapeado] list
+    python -m utils.disk_cache [--mapeado] purge [--key CHAVE]
+"""
+import argparse
+import hashlib
+import importlib.util
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "proj_dashboard")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAPPED_MAX_BYTES = 8 * 1024 ** 3
+CACHE_SUFFIX = ".parquet"
+MAPPED_SUFFIX = ".arrow"
+
+
+def content_hash(data, *salt):
+    """
+    Calcula o hash SHA-256 do conteúdo de um arquivo.
+
+    Args:
+        data (bytes): O conteúdo do arquivo.
+        *salt: Valores extras incluídos no hash (ex.: a versão do formato do carregador).
+
+    Returns:
+        str: O hash em hexadecimal.
+    """
+    digest = hashlib.sha256(data)
+    for value in salt:
+        digest.update(str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Cache LRU de DataFrames em disco, limitado pelo tamanho total dos arquivos.
+
+    O instante do último acesso de cada entrada é registrado no mtime do arquivo, o que permite
+    que vários processos compartilhem o mesmo diretório sem um índice central.
+
+    Args:
+        directory (str, optional): Diretório do cache. Usa DASHBOARD_CACHE_DIR se omitido.
+        max_bytes (int, optional): Tamanho máximo do cache. Usa DASHBOARD_CACHE_MAX_BYTES se omitido.
+    """
+
+    suffix = CACHE_SUFFIX
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.environ.get("DASHBOARD_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.environ.get("DASHBOARD_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        # Sem pyarrow não é possível ler nem gravar Parquet; o cache fica desativado.
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Retorna o DataFrame armazenado para `key`, ou None se não estiver no cache."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path, engine="pyarrow")
+            os.utime(path)  # Marca a entrada como usada recentemente
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Entrada de cache ilegível em %s: %s", path, e)
+            self.purge(key)
+            return None
+        return df
+
+    def put(self, key, df):
+        """
+        Grava o DataFrame no cache e remove as entradas mais antigas se o limite for excedido.
+
+        Returns:
+            bool: True se a entrada foi gravada. Frames que o Parquet não suporta (ex.: colunas
+            com tipos mistos) não são armazenados.
+        """
+        if not self.enabled:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path, engine="pyarrow", index=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            logger.warning("Não foi possível armazenar o dataset %s no cache: %s", key, e)
+            os.remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def path(self, key):
+        """Retorna o caminho do arquivo Parquet de `key`, ou None se não estiver no cache."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            os.utime(path)  # Marca a entrada como usada recentemente
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put_bytes(self, key, data):
+        """
+        Grava no cache o conteúdo de um arquivo que já está em formato Parquet, sem lê-lo.
+
+        Returns:
+            bool: True se a entrada foi gravada.
+        """
+        if not self.enabled:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+        return True
+
+    def entries(self):
+        """
+        Lista as entradas do cache, da usada mais recentemente para a mais antiga.
+
+        Returns:
+            list[dict]: Cada item tem 'key', 'size_bytes' e 'last_access' (timestamp).
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue  # Removida por outro processo
+            entries.append({
+                "key": name[:-len(self.suffix)],
+                "size_bytes": stat.st_size,
+                "last_access": stat.st_mtime,
+            })
+        return sorted(entries, key=lambda entry: entry["last_access"], reverse=True)
+
+    def total_bytes(self):
+        """Retorna o tamanho total ocupado pelas entradas do cache."""
+        return sum(entry["size_bytes"] for entry in self.entries())
+
+    def evict(self):
+        """Remove as entradas menos usadas recentemente até o cache caber em `max_bytes`."""
+        entries = self.entries()
+        total = sum(entry["size_bytes"] for entry in entries)
+        removed = []
+        while entries and total > self.max_bytes:
+            oldest = entries.pop()
+            self.purge(oldest["key"])
+            total -= oldest["size_bytes"]
+            removed.append(oldest["key"])
+        return removed
+
+    def purge(self, key=None):
+        """
+        Remove uma entrada do cache, ou todas se `key` for None.
+
+        Returns:
+            int: Número de entradas removidas.
+        """
+        keys = [key] if key is not None else [entry["key"] for entry in self.entries()]
+        removed = 0
+        for k in keys:
+            try:
+                os.remove(self._path(k))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except PermissionError as e:
+                # No Windows, um arquivo mapeado por outro processo não pode ser removido
+                logger.warning("Entrada de cache em uso, não removida: %s", e)
+        return removed
+
+
+class MappedCache(DiskCache):
+    """
+    Cache LRU de DataFrames em arquivos Arrow IPC, lidos por mapeamento de memória.
+
+    Os arquivos não são comprimidos e as colunas de ponto flutuante guardam NaN como valor (sem
+    máscara de nulos), para que o pandas possa usar os buffers do arquivo sem copiá-los. Os
+    arrays resultantes são somente leitura.
+
+    Args:
+        directory (str, optional): Diretório dos arquivos. Usa DASHBOARD_MMAP_DIR se omitido.
+        max_bytes (int, optional): Tamanho máximo. Usa DASHBOARD_MMAP_MAX_BYTES se omitido.
+    """
+
+    suffix = MAPPED_SUFFIX
+
+    def __init__(self, directory=None, max_bytes=None):
+        super().__init__(
+            directory or os.environ.get(
+                "DASHBOARD_MMAP_DIR",
+                os.path.join(os.environ.get("DASHBOARD_CACHE_DIR", DEFAULT_CACHE_DIR), "mmap"),
+            ),
+            max_bytes or os.environ.get("DASHBOARD_MMAP_MAX_BYTES", DEFAULT_MAPPED_MAX_BYTES),
+        )
+
+    def get(self, key):
+        """Abre o DataFrame de `key` por mapeamento de memória, ou retorna None se não estiver no cache."""
+        if not self.enabled:
+            return None
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        path = self._path(key)
+        try:
+            table = pyarrow.ipc.open_file(pa.memory_map(path)).read_all()
+            # Um bloco por coluna: sem consolidar, as colunas continuam apontando para o arquivo
+            df = table.to_pandas(split_blocks=True)
+            os.utime(path)  # Marca a entrada como usada recentemente
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Entrada de cache ilegível em %s: %s", path, e)
+            self.purge(key)
+            return None
+        return df
+
+    def put(self, key, df):
+        """
+        Grava o DataFrame em Arrow IPC e remove as entradas mais antigas se o limite for excedido.
+
+        O arquivo é escrito em um temporário e renomeado, então os outros processos nunca
+        enxergam uma entrada pela metade.
+
+        Returns:
+            bool: True se a entrada foi gravada.
+        """
+        if not self.enabled:
+            return False
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            for i, field in enumerate(table.schema):
+                values = df[field.name]
+                if values.dtype.kind == 'f' and isinstance(values.dtype, np.dtype):
+                    # NaN como valor, não como nulo: a leitura não precisa preencher uma cópia
+                    table = table.set_column(i, field.name, pa.array(values.to_numpy()))
+            with pa.OSFile(tmp_path, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            logger.warning("Não foi possível armazenar o dataset %s no cache mapeado: %s", key, e)
+            os.remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+
+def _format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspeciona e limpa o cache de datasets do dashboard.")
+    parser.add_argument("--dir", help="Diretório do cache (padrão: DASHBOARD_CACHE_DIR).")
+    parser.add_argument("--mapeado", action="store_true",
+                        help="Usa o cache de arquivos Arrow mapeados em memória em vez do Parquet.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Lista as entradas do cache.")
+    purge_parser = subparsers.add_parser("purge", help="Remove entradas do cache.")
+    purge_parser.add_argument("--key", help="Remove apenas a entrada com esta chave.")
+    args = parser.parse_args(argv)
+
+    cache = (MappedCache if args.mapeado else DiskCache)(directory=args.dir)
+    if args.command == "list":
+        entries = cache.entries()
+        for entry in entries:
+            last_access = time.strftime("%d/%m/%Y %H:%M:%S", time.localtime(entry["last_access"]))
+            print(f"{entry['key']}  {_format_bytes(entry['size_bytes']):>10}  {last_access}")
+        total = sum(entry["size_bytes"] for entry in entries)
+        print(f"{len(entries)} entrada(s), {_format_bytes(total)} de {_format_bytes(cache.max_bytes)} em {cache.directory}")
+    elif args.command == "purge":
+        removed = cache.purge(args.key)
+        print(f"{removed} entrada(s) removida(s) de {cache.directory}")
+
+
+if __name__ == "__main__":
+    main()
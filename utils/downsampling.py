@@ -0,0 +1,139 @@
+"""
+Redução de pontos no servidor para gráficos de dispersão e séries temporais.
+
+Acima de um limite de linhas, enviar todos os pontos ao navegador gera um JSON enorme e trava a
+página. As funções deste módulo escolhem um subconjunto representativo dos pontos (ou agregam em
+uma grade 2D) antes de montar a figura Plotly.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_DOWNSAMPLE_THRESHOLD: número de pontos a partir do qual a redução é aplicada (padrão: 5000).
+    DASHBOARD_HEATMAP_THRESHOLD: número de pontos a partir do qual a dispersão vira mapa de calor
+        (padrão: 1.000.000).
+"""
+import os
+
+import numpy as np
+
+DOWNSAMPLE_THRESHOLD = int(os.environ.get("DASHBOARD_DOWNSAMPLE_THRESHOLD", 5000))
+HEATMAP_THRESHOLD = int(os.environ.get("DASHBOARD_HEATMAP_THRESHOLD", 1_000_000))
+
+
+def _as_float(values):
+    """Converte valores numéricos ou datetime64 para float64, preservando a ordem."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: escolhe `n_out` pontos que preservam o formato visual da série.
+
+    Args:
+        x (array): Eixo x em ordem crescente (numérico ou datetime64), sem valores ausentes.
+        y (array): Valores da série, sem valores ausentes.
+        n_out (int): Número de pontos desejado (mínimo 3).
+
+    Returns:
+        np.ndarray: Índices dos pontos escolhidos, em ordem crescente.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    xf = _as_float(x)
+    yf = _as_float(y)
+    # O primeiro e o último pontos são sempre mantidos; o restante é dividido em n_out - 2 baldes
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Média do próximo balde (ou o último ponto, no último balde)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xf[next_start:next_end].mean()
+        avg_y = yf[next_start:next_end].mean()
+
+        bucket_x = xf[start:end]
+        bucket_y = yf[start:end]
+        areas = np.abs(
+            (xf[previous] - avg_x) * (bucket_y - yf[previous])
+            - (xf[previous] - bucket_x) * (avg_y - yf[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def density_sample(x, y, n_out, bins=64, seed=0):
+    """
+    Amostra estratificada por uma grade 2D que preserva a densidade dos pontos.
+
+    Cada célula ocupada da grade recebe uma cota proporcional ao seu número de pontos, com pelo
+    menos um ponto, de modo que regiões esparsas (e outliers) continuam visíveis.
+
+    Returns:
+        np.ndarray: Índices dos pontos escolhidos, em ordem crescente.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+
+    xf = _as_float(x)
+    yf = _as_float(y)
+    x_bin = np.clip(((xf - xf.min()) / (np.ptp(xf) or 1) * bins).astype(np.int64), 0, bins - 1)
+    y_bin = np.clip(((yf - yf.min()) / (np.ptp(yf) or 1) * bins).astype(np.int64), 0, bins - 1)
+    cell = x_bin * bins + y_bin
+
+    counts = np.bincount(cell, minlength=bins * bins)
+    quotas = np.where(counts > 0, np.maximum(1, np.round(counts * (n_out / n))), 0).astype(np.int64)
+
+    # Embaralha, agrupa por célula e mantém os primeiros `quota` pontos de cada célula
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(n)
+    order = permutation[np.argsort(cell[permutation], kind='stable')]
+    sorted_cells = cell[order]
+    group_start = np.searchsorted(sorted_cells, sorted_cells, side='left')
+    rank = np.arange(n) - group_start
+    return np.sort(order[rank < quotas[sorted_cells]])
+
+
+def binned_counts(x, y, bins=100):
+    """
+    Agrega os pontos em uma grade 2D, para desenhar a dispersão como mapa de calor.
+
+    Returns:
+        tuple: (contagens com forma (bins_y, bins_x), centros dos bins em x, centros dos bins em y).
+    """
+    counts, x_edges, y_edges = np.histogram2d(_as_float(x), _as_float(y), bins=bins)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return counts.T, x_centers, y_centers
+
+
+def ols_fit(x, y):
+    """
+    Ajusta y = a * x + b por mínimos quadrados, em forma fechada, sobre todos os pontos.
+
+    Returns:
+        tuple: (a, b), ou None se houver menos de dois pontos válidos ou x for constante.
+    """
+    xf = _as_float(x)
+    yf = _as_float(y)
+    valid = np.isfinite(xf) & np.isfinite(yf)
+    if valid.sum() < 2:
+        return None
+    xf = xf[valid]
+    yf = yf[valid]
+    x_mean = xf.mean()
+    y_mean = yf.mean()
+    x_centered = xf - x_mean
+    denominator = np.dot(x_centered, x_centered)
+    if denominator == 0:
+        return None
+    slope = np.dot(x_centered, yf - y_mean) / denominator
+    return slope, y_mean - slope * x_mean
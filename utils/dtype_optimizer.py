@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Colunas de texto com até esta fração de valores distintos viram categóricas
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _to_compact_integer(series):
+    return pd.to_numeric(series, downcast='integer')
+
+
+def _optimize_column(series, category_max_unique_ratio):
+    """
+    Retorna a coluna convertida para o tipo mais compacto que preserva todos os valores,
+    ou None se nenhuma conversão for vantajosa.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype) or isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        # Colunas 0/1 (flags como 'Cliente_VIP') ficam em int8, que ocupa o mesmo que bool e
+        # continua numérico na análise
+        return _to_compact_integer(series)
+
+    if pd.api.types.is_float_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        values = series.to_numpy()
+        if len(values) and not np.isnan(values).any() and np.all(np.mod(values, 1) == 0):
+            # Números inteiros guardados como float (comum no Excel)
+            return _optimize_column(series.astype(np.int64), category_max_unique_ratio)
+        compact = values.astype(np.float32)
+        # Só reduz a precisão quando nenhum valor muda (ex.: valores monetários não cabem em float32)
+        if np.array_equal(compact.astype(np.float64), values, equal_nan=True):
+            return pd.Series(compact, index=series.index, name=series.name)
+        return None
+
+    if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        n_unique = series.nunique(dropna=True)
+        if len(series) and n_unique / len(series) <= category_max_unique_ratio:
+            return series.astype('category')
+    return None
+
+
+def optimize_dtypes(df, category_max_unique_ratio=CATEGORY_MAX_UNIQUE_RATIO):
+    """
+    Converte as colunas do DataFrame para os tipos mais compactos que preservam os valores.
+
+    - Inteiros são reduzidos (int64 -> int8/int16/int32).
+    - Floats com valores inteiros viram inteiros; os demais viram float32 apenas se nenhum valor mudar.
+    - Colunas de texto com poucos valores distintos viram categóricas.
+
+    Args:
+        df (pd.DataFrame): O DataFrame a ser otimizado. É alterado no próprio objeto.
+        category_max_unique_ratio (float): Fração máxima de valores distintos para virar categórica.
+
+    Returns:
+        tuple: (DataFrame otimizado, dicionário com o tipo original, o novo tipo e os bytes
+        economizados de cada coluna convertida).
+    """
+    report = {}
+    for col in df.columns:
+        series = df[col]
+        optimized = _optimize_column(series, category_max_unique_ratio)
+        if optimized is None or optimized.dtype == series.dtype:
+            continue
+
+        bytes_before = int(series.memory_usage(index=False, deep=True))
+        bytes_after = int(optimized.memory_usage(index=False, deep=True))
+        if bytes_after >= bytes_before:
+            continue
+
+        df[col] = optimized
+        report[str(col)] = {
+            'dtype_before': str(series.dtype),
+            'dtype_after': str(optimized.dtype),
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_saved': bytes_before - bytes_after,
+        }
+    return df, report
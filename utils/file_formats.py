@@ -0,0 +1,7 @@
+"""
+Formatos de arquivo aceitos pelo dashboard.
+
+Fica separado do `utils.data_loader` para que o uploader da sidebar seja renderizado sem importar
+o pandas e o restante do pipeline de dados, que só são carregados depois do primeiro upload.
+"""
+SUPPORTED_EXTENSIONS = ['xlsx', 'xls', 'csv', 'parquet']
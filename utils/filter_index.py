@@ -0,0 +1,276 @@
+"""
+Índice de filtros construído uma única vez por dataset.
+
+Para cada coluna categórica exibida nos filtros da sidebar, guarda um bitmap (máscara booleana
+compactada com `np.packbits`) por categoria; para a coluna de data, guarda as datas ordenadas.
+Qualquer combinação de filtros vira uma única máscara de linhas: ORs entre os bitmaps das
+categorias escolhidas, ANDs entre colunas e uma busca binária para o intervalo de datas, sem
+cópias intermediárias do DataFrame.
+
+Para um dataset formado por acréscimo de linhas (ver `utils.append_ingestion`), o índice do
+dataset anterior é estendido com as linhas novas em vez de reconstruído.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.append_ingestion import split_appended
+from utils.column_profile import CATEGORICAL, date_column, get_column_catalog
+
+# Colunas categóricas com menos valores distintos que isto aparecem como filtros na sidebar
+MAX_FILTER_CARDINALITY = 20
+
+
+def filter_columns(df):
+    """
+    Retorna as colunas usadas como filtros globais, lidas do catálogo de colunas do dataset.
+
+    Returns:
+        tuple: (coluna de data ou None, lista de colunas categóricas filtráveis).
+    """
+    return get_column_catalog(df).filter_columns(MAX_FILTER_CARDINALITY)
+
+
+def filter_options(df):
+    """
+    Retorna as opções exibidas nos filtros da sidebar, lidas do catálogo de colunas do dataset.
+
+    Returns:
+        dict: Com 'date_col', 'date_min' e 'date_max' (ou None, sem coluna de data) e
+        'categories', que mapeia cada coluna categórica filtrável para os seus valores ordenados.
+    """
+    return get_column_catalog(df).filter_options(MAX_FILTER_CARDINALITY)
+
+
+def _naive_datetimes(series):
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_localize(None)
+    return series.to_numpy()
+
+def _extend_bitmap(bitmap, n_rows, bits):
+    """Acrescenta a máscara `bits` ao fim de um bitmap compactado de `n_rows` linhas."""
+    used = n_rows % 8
+    if used == 0:
+        return np.concatenate([bitmap, np.packbits(bits)])
+    # O último byte está pela metade: os seus bits válidos são recompactados junto com os novos
+    head = np.unpackbits(bitmap[-1:])[:used].view(bool)
+    return np.concatenate([bitmap[:-1], np.packbits(np.concatenate([head, bits]))])
+
+
+class FilterIndex:
+    """
+    Bitmaps por categoria e índice ordenado de datas de um DataFrame.
+
+    Args:
+        df (pd.DataFrame): O dataset completo.
+        category_cols (list): Colunas categóricas a indexar.
+        date_col (str, optional): Coluna de data usada no filtro de intervalo.
+    """
+
+    def __init__(self, df, category_cols, date_col=None):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for col in category_cols:
+            codes, uniques = pd.factorize(df[col], sort=False)
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(uniques.tolist())
+            }
+
+        self.date_col = date_col
+        self.date_order = None
+        self.sorted_dates = None
+        if date_col is not None:
+            dates = _naive_datetimes(df[date_col])
+            order = np.argsort(dates, kind='stable')
+            if np.array_equal(order, np.arange(self.n_rows)):
+                order = None  # Dados já ordenados por data: o intervalo vira uma fatia
+            else:
+                order = order.astype(np.int32 if self.n_rows < 2 ** 31 else np.int64)
+            self.date_order = order
+            self.sorted_dates = dates if order is None else dates[order]
+            # NaT fica no fim da ordenação e não entra em nenhum intervalo
+            self.n_valid_dates = self.n_rows - int(np.isnat(dates).sum())
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Constrói o índice para as mesmas colunas exibidas em `sidebar.show_filters`."""
+        catalog = get_column_catalog(df)
+        date_col, category_cols = catalog.filter_columns(MAX_FILTER_CARDINALITY)
+        index = cls(df, category_cols, date_col)
+        # Colunas com valores demais para virar filtro continuam de fora quando o dataset cresce
+        index.wide_columns = {
+            col for col in catalog.columns_of_kind(CATEGORICAL)
+            if col not in index.bitmaps and catalog.profiles[col]['nulls'] < catalog.n_rows
+        }
+        return index
+
+    def appended(self, delta):
+        """
+        Retorna o índice do dataset com as linhas de `delta` acrescentadas ao fim.
+
+        Os bitmaps ganham os bits das linhas novas e as datas novas são intercaladas na ordem
+        existente por busca binária, sem reordenar o dataset inteiro. Retorna None se o delta
+        mudar as colunas dos filtros (ex.: uma coluna passa a ter valores demais); nesse caso o
+        índice precisa ser reconstruído.
+        """
+        wide_columns = getattr(self, 'wide_columns', None)
+        if wide_columns is None or date_column(delta) != self.date_col:
+            return None
+        candidates = set(delta.select_dtypes(include=['object', 'category']).columns)
+        if candidates != set(self.bitmaps) | wide_columns:
+            return None
+
+        index = copy.copy(self)
+        index.n_rows = self.n_rows + len(delta)
+        index.bitmaps = {}
+        empty = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for col, bitmaps in self.bitmaps.items():
+            codes, uniques = pd.factorize(delta[col], sort=False)
+            values = list(bitmaps) + [value for value in uniques.tolist() if value not in bitmaps]
+            if len(values) >= MAX_FILTER_CARDINALITY:
+                return None
+            delta_codes = {value: code for code, value in enumerate(uniques.tolist())}
+            index.bitmaps[col] = {
+                value: _extend_bitmap(bitmaps.get(value, empty), self.n_rows, codes == delta_codes.get(value, -2))
+                for value in values
+            }
+
+        if self.date_col is not None:
+            index._append_dates(self, _naive_datetimes(delta[self.date_col]).astype(self.sorted_dates.dtype))
+        return index
+
+    def _append_dates(self, previous, dates):
+        # Equivale à ordenação estável do dataset inteiro: em datas iguais, as linhas anteriores
+        # vêm primeiro, e as linhas sem data ficam no fim, na ordem das linhas
+        order = np.argsort(dates, kind='stable')
+        sorted_new = dates[order]
+        n_valid_new = len(dates) - int(np.isnat(dates).sum())
+        valid = previous.n_valid_dates
+        previous_order = np.arange(previous.n_rows) if previous.date_order is None else previous.date_order
+        positions = np.searchsorted(previous.sorted_dates[:valid], sorted_new[:n_valid_new], side='right')
+        new_rows = order + previous.n_rows
+
+        date_order = np.concatenate([
+            np.insert(previous_order[:valid], positions, new_rows[:n_valid_new]),
+            previous_order[valid:],
+            new_rows[n_valid_new:],
+        ])
+        self.sorted_dates = np.concatenate([
+            np.insert(previous.sorted_dates[:valid], positions, sorted_new[:n_valid_new]),
+            previous.sorted_dates[valid:],
+            sorted_new[n_valid_new:],
+        ])
+        if np.array_equal(date_order, np.arange(self.n_rows)):
+            self.date_order = None  # Linhas novas com datas posteriores: continua ordenado
+        else:
+            self.date_order = date_order.astype(np.int32 if self.n_rows < 2 ** 31 else np.int64)
+        self.n_valid_dates = valid + n_valid_new
+
+    def _category_bitmap(self, col, selected):
+        bitmaps = self.bitmaps[col]
+        selected = set(selected)
+        if all(value in selected for value in bitmaps):
+            return None  # Todas as categorias selecionadas: não restringe nada
+
+        chosen = [bitmap for value, bitmap in bitmaps.items() if value in selected]
+        result = np.zeros_like(next(iter(bitmaps.values())))
+        for bitmap in chosen:
+            np.bitwise_or(result, bitmap, out=result)
+        return result
+
+    def date_positions(self, start, end):
+        """Retorna o intervalo [lo, hi) de posições, na ordem das datas, entre `start` e `end`."""
+        dtype = self.sorted_dates.dtype
+        start = pd.Timestamp(start).to_datetime64().astype(dtype)
+        end = pd.Timestamp(end).to_datetime64().astype(dtype)
+        lo = np.searchsorted(self.sorted_dates, start, side='left')
+        hi = np.searchsorted(self.sorted_dates, end, side='right')
+        return int(lo), int(min(hi, self.n_valid_dates))
+
+    def row_positions(self, lo, hi):
+        """Retorna os índices das linhas nas posições [lo, hi) da ordem das datas."""
+        return np.arange(lo, hi) if self.date_order is None else self.date_order[lo:hi]
+
+    def restricted_columns(self, selected_filters):
+        """Retorna as colunas categóricas cujo filtro exclui alguma categoria do dataset."""
+        return [
+            col for col, values in (selected_filters or {}).items()
+            if col in self.bitmaps and self._category_bitmap(col, values) is not None
+        ]
+
+    def restricts_categories(self, selected_filters):
+        """Indica se algum filtro categórico exclui categorias do dataset."""
+        return bool(self.restricted_columns(selected_filters))
+
+    def restricts_dates(self, selected_filters):
+        """Indica se o filtro de datas exclui alguma linha do dataset."""
+        if not selected_filters or 'date_range' not in selected_filters or self.sorted_dates is None:
+            return False
+        return self.date_positions(*selected_filters['date_range']) != (0, self.n_rows)
+
+    def _date_bitmap(self, start, end):
+        lo, hi = self.date_positions(start, end)
+        if lo == 0 and hi == self.n_rows:
+            return None
+
+        mask = np.zeros(self.n_rows, dtype=bool)
+        if self.date_order is None:
+            mask[lo:hi] = True
+        else:
+            mask[self.row_positions(lo, hi)] = True
+        return np.packbits(mask)
+
+    def mask(self, selected_filters):
+        """
+        Combina os filtros selecionados em uma única máscara de linhas.
+
+        Args:
+            selected_filters (dict): O dicionário retornado por `sidebar.show_filters`.
+
+        Returns:
+            np.ndarray | None: Máscara booleana das linhas que passam nos filtros, ou None se
+            nenhum filtro restringir o dataset.
+        """
+        combined = None
+
+        def intersect(bitmap):
+            nonlocal combined
+            if bitmap is None:
+                return
+            if combined is None:
+                combined = bitmap.copy()
+            else:
+                np.bitwise_and(combined, bitmap, out=combined)
+
+        if selected_filters and 'date_range' in selected_filters and self.sorted_dates is not None:
+            intersect(self._date_bitmap(*selected_filters['date_range']))
+
+        for col, values in (selected_filters or {}).items():
+            if col in self.bitmaps:
+                intersect(self._category_bitmap(col, values))
+
+        if combined is None:
+            return None
+        return np.unpackbits(combined, count=self.n_rows).view(bool)
+
+
+@st.cache_resource(max_entries=8)
+def _cached_filter_index(dataset_hash, _df):
+    parts = split_appended(_df)
+    if parts is not None:
+        previous, delta = parts
+        index = get_filter_index(previous).appended(delta)
+        if index is not None:
+            return index
+    return FilterIndex.from_dataframe(_df)
+
+
+def get_filter_index(df):
+    """Retorna o índice de filtros do dataset, construído uma única vez por hash de conteúdo."""
+    dataset_hash = df.attrs.get('dataset_hash')
+    if dataset_hash is None:
+        return FilterIndex.from_dataframe(df)
+    return _cached_filter_index(dataset_hash, df)
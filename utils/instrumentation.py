@@ -0,0 +1,93 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class PipelineInstrumentation:
+    """
+    Coleta métricas por etapa de um pipeline: tempo de parede, linhas processadas e pico de memória.
+
+    As métricas ficam disponíveis como lista de dicionários (`to_dict`), prontas para serem
+    exibidas no dashboard ou registradas em log estruturado.
+
+    Args:
+        track_memory (bool): Se True, mede o pico de memória alocada em cada etapa com `tracemalloc`
+            (padrão: False). O `tracemalloc` é global no processo e deixa a análise mais lenta:
+            use só em processos com um único pipeline (ex.: scripts de benchmark), nunca no
+            servidor do dashboard, onde as sessões rodam em paralelo.
+        on_stage_end (function, optional): Chamada com o dicionário de métricas ao fim de cada etapa.
+    """
+
+    def __init__(self, track_memory=False, on_stage_end=None):
+        self.track_memory = track_memory
+        self.on_stage_end = on_stage_end
+        self.stages = []
+        self._current = None
+        self._started_tracemalloc = False
+
+    def begin(self, name, rows=None):
+        """Inicia uma nova etapa, encerrando a anterior se ainda estiver aberta."""
+        if self._current is not None:
+            self.end()
+
+        memory_start = 0
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        self._current = {
+            'name': name,
+            'rows': rows,
+            'memory_start': memory_start,
+            'start': time.perf_counter(),
+        }
+
+    def end(self):
+        """Encerra a etapa atual e registra suas métricas."""
+        if self._current is None:
+            return None
+
+        elapsed = time.perf_counter() - self._current['start']
+        peak_memory = None
+        if self.track_memory and tracemalloc.is_tracing():
+            peak_memory = max(tracemalloc.get_traced_memory()[1] - self._current['memory_start'], 0)
+
+        stage = {
+            'name': self._current['name'],
+            'elapsed_s': elapsed,
+            'rows': self._current['rows'],
+            'peak_memory_bytes': peak_memory,
+        }
+        self.stages.append(stage)
+        self._current = None
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self.on_stage_end:
+            self.on_stage_end(stage)
+        return stage
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Context manager que mede o bloco de código como uma etapa."""
+        self.begin(name, rows)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def to_dict(self):
+        """
+        Retorna as métricas coletadas em formato estruturado.
+
+        Returns:
+            dict: Com as chaves 'stages' (lista de etapas) e 'total_elapsed_s'.
+        """
+        return {
+            'stages': [dict(stage) for stage in self.stages],
+            'total_elapsed_s': sum(stage['elapsed_s'] for stage in self.stages),
+        }
@@ -0,0 +1,194 @@
+"""
+Cubo OLAP pré-agregado sobre as dimensões dos filtros da sidebar.
+
+As colunas categóricas exibidas como filtros têm poucos valores, então o dataset cabe em um cubo
+com uma célula por combinação observada dessas colunas e do dia, guardando, para cada medida
+numérica, a soma, a contagem de valores e a soma dos quadrados. Qualquer combinação de filtros
+vira uma seleção de células, e KPIs, somas e médias por grupo e tabelas cruzadas sobre as
+dimensões saem da soma das células selecionadas, sem percorrer as linhas.
+
+Estatísticas não aditivas (quantis, valores distintos de colunas que não são dimensões, etc.)
+continuam sendo calculadas sobre as linhas.
+
+Como as células são aditivas, o cubo de um dataset formado por acréscimo de linhas (ver
+`utils.append_ingestion`) sai do cubo do dataset anterior somado às células das linhas novas.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_CUBE_MIN_ROWS: tamanho mínimo do dataset para montar o cubo (padrão: 100.000).
+    DASHBOARD_CUBE_MAX_CELL_RATIO: limite de células do cubo, como fração do número de linhas
+        (padrão: 0,25). Acima dele o dia sai do cubo e, se ainda assim passar, o cubo é descartado.
+"""
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.append_ingestion import split_appended
+from utils.filter_index import get_filter_index
+
+CUBE_MIN_ROWS = int(os.environ.get("DASHBOARD_CUBE_MIN_ROWS", 100_000))
+CUBE_MAX_CELL_RATIO = float(os.environ.get("DASHBOARD_CUBE_MAX_CELL_RATIO", 0.25))
+
+# Coluna com o número de linhas de cada célula
+ROWS = ('__linhas__', 'count')
+DAY = '__dia__'
+
+
+class OlapCube:
+    """
+    Células (dimensões dos filtros x dia) com soma, contagem e soma dos quadrados das medidas.
+
+    Args:
+        df (pd.DataFrame): O dataset completo.
+        dimensions (list): Colunas categóricas usadas como dimensões.
+        date_col (str, optional): Coluna de data; entra no cubo por dia se não tiver horário.
+        measures (list): Colunas numéricas resumidas.
+    """
+
+    def __init__(self, df, dimensions, date_col, measures):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.cells, self.date_col = _cells(df, self.dimensions, date_col, self.measures)
+
+    def without_day(self):
+        """Retorna o cubo com as células de cada combinação de dimensões somadas em todos os dias."""
+        cube = copy.copy(self)
+        cube.date_col = None
+        cube.cells = _combine([self.cells], self.dimensions)
+        return cube
+
+    def appended(self, delta):
+        """Retorna o cubo com as linhas de `delta` somadas às células, sem percorrer as linhas anteriores."""
+        delta_cells, date_col = _cells(delta, self.dimensions, self.date_col, self.measures)
+        # Linhas novas com horário tiram o dia do cubo, como aconteceria na construção
+        cube = self if date_col == self.date_col else self.without_day()
+        levels = self.dimensions + ([DAY] if date_col is not None else [])
+        previous_cells = cube.cells
+        if levels:
+            # Os níveis categóricos passam a ter as categorias novas do delta antes de somar
+            previous_cells = previous_cells.set_axis(_recast_levels(previous_cells.index, delta_cells.index))
+        cube = copy.copy(cube)
+        cube.cells = _combine([previous_cells, delta_cells], levels)
+        return cube
+
+    def select(self, index, selected_filters):
+        """
+        Retorna as células que correspondem aos filtros, ou None se o cubo não puder atendê-los.
+
+        Args:
+            index (FilterIndex): O índice de filtros do mesmo dataset.
+            selected_filters (dict): O dicionário retornado por `sidebar.show_filters`.
+        """
+        cells = self.cells
+        if index.restricts_dates(selected_filters):
+            if self.date_col is None or selected_filters.get('date_col', index.date_col) != self.date_col:
+                return None
+            start, end = selected_filters['date_range']
+            days = cells.index.get_level_values(DAY)
+            cells = cells[(days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))]
+        for col in index.restricted_columns(selected_filters):
+            if col not in self.dimensions:
+                return None
+            cells = cells[cells.index.get_level_values(col).isin(selected_filters[col])]
+        return cells
+
+    @staticmethod
+    def group_stats(cells, by, measure):
+        """
+        Agrega as células por uma dimensão.
+
+        Returns:
+            pd.DataFrame: Indexado pelos valores de `by`, com 'sum', 'count', 'mean' e 'std'
+            (desvio padrão amostral, a partir da soma dos quadrados).
+        """
+        grouped = cells.groupby(level=by, observed=True)[[(measure, 'sum'), (measure, 'count'), (measure, 'sumsq')]].sum()
+        grouped.columns = ['sum', 'count', 'sumsq']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            count = grouped['count'].replace(0, np.nan)
+            grouped['mean'] = grouped['sum'] / count
+            variance = (grouped['sumsq'] - grouped['sum'] ** 2 / count) / (count - 1)
+            grouped['std'] = np.sqrt(variance.clip(lower=0))
+        return grouped.drop(columns='sumsq')
+
+
+def _cells(df, dimensions, date_col, measures):
+    """Resume as linhas em células; retorna (células, coluna de data usada como dia ou None)."""
+    keys = [df[col] for col in dimensions]
+    if date_col is not None:
+        dates = df[date_col]
+        days = dates.dt.normalize()
+        # Com horário, o filtro de datas não coincide com dias inteiros e não usa o cubo
+        if days.equals(dates):
+            keys.append(days.rename(DAY))
+        else:
+            date_col = None
+
+    data = {ROWS: np.ones(len(df), dtype=np.int64)}
+    for col in measures:
+        values = df[col].astype('float64') if df[col].dtype == 'float32' else df[col]
+        data[(col, 'sum')] = values
+        data[(col, 'count')] = values.notna().astype(np.int64)
+        data[(col, 'sumsq')] = values.astype('float64') ** 2
+    frame = pd.DataFrame(data, index=df.index)
+
+    if keys:
+        # As células ficam indexadas pelas dimensões (e pelo dia)
+        return frame.groupby(keys, observed=True, dropna=False, sort=False).sum(), date_col
+    return frame.sum().to_frame().T, date_col
+
+
+def _combine(cells, levels):
+    """Soma as células de mesma chave, mantendo a ordem em que as chaves aparecem."""
+    if not levels:
+        return pd.concat(cells).sum().to_frame().T
+    return pd.concat(cells).groupby(level=levels, observed=True, dropna=False, sort=False).sum()
+
+
+def _recast_levels(index, like):
+    """Converte os níveis de `index` para os tipos dos níveis de mesmo nome em `like`."""
+    if index.nlevels == 1:
+        return index.astype(like.dtype)
+    arrays = [index.get_level_values(i).astype(like.levels[i].dtype) for i in range(index.nlevels)]
+    return pd.MultiIndex.from_arrays(arrays, names=index.names)
+
+
+def _fit(cube, n_rows):
+    max_cells = CUBE_MAX_CELL_RATIO * n_rows
+    if len(cube.cells) > max_cells and cube.date_col is not None:
+        # Sem o dia o cubo encolhe; só os filtros de data deixam de ser atendidos por ele
+        cube = cube.without_day()
+    if len(cube.cells) > max_cells:
+        return None  # Combinações demais: somar as células não seria mais barato que as linhas
+    return cube
+
+
+def _build_cube(df):
+    if len(df) < CUBE_MIN_ROWS:
+        return None
+    index = get_filter_index(df)
+    measures = df.select_dtypes(include=np.number).columns.tolist()
+    return _fit(OlapCube(df, list(index.bitmaps), index.date_col, measures), len(df))
+
+
+@st.cache_resource(max_entries=8)
+def _cached_cube(dataset_hash, _df):
+    parts = split_appended(_df)
+    if parts is not None:
+        previous, delta = parts
+        cube = get_cube(previous)
+        # O cubo anterior só serve se as dimensões e as medidas continuarem as mesmas
+        if (cube is not None
+                and cube.dimensions == list(get_filter_index(_df).bitmaps)
+                and cube.measures == _df.select_dtypes(include=np.number).columns.tolist()):
+            return _fit(cube.appended(delta), len(_df))
+    return _build_cube(_df)
+
+
+def get_cube(df):
+    """Retorna o cubo do dataset (ou None, se não compensar), montado uma vez por hash de conteúdo."""
+    dataset_hash = df.attrs.get('dataset_hash')
+    if dataset_hash is None:
+        return _build_cube(df)
+    return _cached_cube(dataset_hash, df)
@@ -1,10 +1,11 @@
+import io
 import pandas as pd
 from fpdf import FPDF
 import plotly.graph_objects as go
-import tempfile
-import os
 from datetime import datetime
 
+from utils.chart_renderer import render_figures
+
 class PDF(FPDF):
     def header(self):
         # Define o cabeçalho com um fundo azul e texto branco
@@ -64,23 +65,16 @@ def create_pdf_report(report_text, generated_charts):
         pdf.add_page()
         pdf.chapter_title('2. Visualizações dos Dados')
 
-        # Diretório temporário para salvar as imagens dos gráficos
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for title, fig in generated_charts.items():
-                if isinstance(fig, go.Figure): # Verifica se é uma figura Plotly válida
-                    
-                    # APLICA UM TEMA CLARO PARA GARANTIR AS CORES NO PDF
-                    fig.update_layout(template='plotly_white')
-                    
-                    # Salva a figura como imagem
-                    path = os.path.join(temp_dir, f'{title}.png')
-                    fig.write_image(path, width=800, height=500, scale=2)
+        # Rasteriza todas as figuras Plotly válidas de uma vez (em paralelo e com cache)
+        figures = {title: fig for title, fig in generated_charts.items() if isinstance(fig, go.Figure)}
+        images = render_figures(figures, width=800, height=500, scale=2)
 
-                    # Adiciona o título do gráfico e a imagem ao PDF
-                    pdf.set_font('Arial', 'B', 12)
-                    pdf.cell(0, 10, fig.layout.title.text, 0, 1, 'L') # Usa o título do próprio gráfico
-                    pdf.image(path, w=170) # Largura da imagem no PDF
-                    pdf.ln(10)
+        for title, fig in figures.items():
+            # Adiciona o título do gráfico e a imagem ao PDF, direto da memória
+            pdf.set_font('Arial', 'B', 12)
+            pdf.cell(0, 10, fig.layout.title.text, 0, 1, 'L') # Usa o título do próprio gráfico
+            pdf.image(io.BytesIO(images[title]), w=170) # Largura da imagem no PDF
+            pdf.ln(10)
 
     # Retorna o PDF como bytes (corrigido)
     return bytes(pdf.output(dest='S'))
\ No newline at end of file
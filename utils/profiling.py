@@ -0,0 +1,424 @@
+"""
+Perfil de cada execução (rerun) do dashboard e exportação das métricas.
+
+Cada rerun do `dashboard.py` cria um `RerunProfiler`, que mede etapas nomeadas (spans) como
+carregamento, filtros, KPIs, análise, cada gráfico Plotly e, em segundo plano, o PDF. Spans
+aninhados formam caminhos ('visualizacoes/serie_temporal'). Ao fim da rerun, as durações vão para
+histogramas de latência por etapa e por faixa de tamanho do dataset ('10k-100k' linhas), junto com
+as estatísticas dos caches, em um registro de métricas compartilhado pelo processo. As métricas
+podem ser gravadas em um arquivo (texto do Prometheus, reescrito a cada rerun, ou JSON lines, uma
+linha por rerun) e servidas em um endpoint HTTP /metrics. Reruns interrompidas pelo Streamlit
+(o usuário mudou um widget no meio da execução) não são registradas.
+
+Uma fração das reruns pode ser perfilada com o cProfile ou o pyinstrument (se instalado); o perfil
+é salvo em disco (.prof, para o `pstats`/snakeviz, ou .html) e o caminho vai para a linha JSON
+da rerun. Só uma rerun por processo é perfilada de cada vez.
+
+Para achar a etapa mais lenta por tamanho de dataset a partir do arquivo JSON lines:
+    python -m utils.profiling metricas.jsonl
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_PROFILER: 'cprofile' ou 'pyinstrument' liga a amostragem de perfis (padrão: desligada).
+    DASHBOARD_PROFILE_SAMPLE_RATE: fração das reruns perfiladas (padrão: 0,05).
+    DASHBOARD_PROFILE_DIR: diretório dos perfis (padrão: perfis/ no diretório temporário).
+    DASHBOARD_METRICS_FILE: arquivo das métricas (padrão: nenhum).
+    DASHBOARD_METRICS_FORMAT: 'prometheus' ou 'jsonl' (padrão: 'jsonl' se o arquivo termina em
+        .jsonl, senão 'prometheus').
+    DASHBOARD_METRICS_PORT: porta do endpoint HTTP /metrics no formato do Prometheus (padrão: nenhum).
+"""
+import argparse
+import bisect
+import cProfile
+import importlib.util
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PROFILER = os.environ.get("DASHBOARD_PROFILER", "").strip().lower()
+PROFILE_SAMPLE_RATE = float(os.environ.get("DASHBOARD_PROFILE_SAMPLE_RATE", 0.05))
+PROFILE_DIR = os.environ.get("DASHBOARD_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "proj_dashboard", "perfis")
+METRICS_FILE = os.environ.get("DASHBOARD_METRICS_FILE") or None
+METRICS_FORMAT = (os.environ.get("DASHBOARD_METRICS_FORMAT")
+                  or ("jsonl" if METRICS_FILE and METRICS_FILE.endswith(".jsonl") else "prometheus"))
+METRICS_PORT = int(os.environ.get("DASHBOARD_METRICS_PORT") or 0)
+
+# Limites (em segundos) dos histogramas de latência, como no cliente oficial do Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Faixas de tamanho do dataset que rotulam as métricas
+SIZE_BUCKETS = ((1_000, "<1k"), (10_000, "1k-10k"), (100_000, "10k-100k"),
+                (1_000_000, "100k-1M"), (10_000_000, "1M-10M"))
+NO_DATA_LABEL = "sem_dados"
+
+_registry = None
+_registry_lock = threading.Lock()
+# Rerun perfilada no momento: (thread, perfilador); o cProfile é um só por processo
+_sampling = None
+_sampling_lock = threading.Lock()
+
+
+def size_bucket(rows):
+    """Faixa de tamanho do dataset usada como rótulo 'linhas' das métricas."""
+    if rows is None:
+        return NO_DATA_LABEL
+    for limit, label in SIZE_BUCKETS:
+        if rows < limit:
+            return label
+    return ">=10M"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Histogramas de latência e medidores (gauges) das métricas do dashboard, seguros entre threads.
+
+    Args:
+        buckets (tuple): Limites superiores dos histogramas, em segundos.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._help = {}
+        self._histograms = defaultdict(dict)
+        self._gauges = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, help_text="", **labels):
+        """Registra uma duração no histograma `name` com os rótulos dados."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram["counts"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def set_gauge(self, name, value, help_text="", **labels):
+        """Define o valor atual do medidor `name` com os rótulos dados."""
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            self._gauges[name][tuple(sorted(labels.items()))] = float(value)
+
+    def to_prometheus(self):
+        """Retorna todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for limit, count in zip(self.buckets + (float("inf"),), histogram["counts"] + [None]):
+                        cumulative = histogram["count"] if count is None else cumulative + count
+                        lines.append(f"{name}_bucket{{{_labels(key + (('le', _number(limit)),))}}} {cumulative}")
+                    lines.append(f"{name}_sum{{{_labels(key)}}} {_number(histogram['sum'])}")
+                    lines.append(f"{name}_count{{{_labels(key)}}} {histogram['count']}")
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{{{_labels(key)}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def record_rerun(self, rows, total_s, spans, cache_stats):
+        """Registra uma rerun concluída: a duração total, a de cada etapa e os caches."""
+        bucket = size_bucket(rows)
+        self.observe("dashboard_rerun_seconds", total_s, "Duração de cada rerun do dashboard.", linhas=bucket)
+        for path, seconds in spans.items():
+            self.record_stage(path, seconds, rows)
+        for cache, stats in cache_stats.items():
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)):
+                    self.set_gauge(f"dashboard_cache_{stat}", value, f"Estatística '{stat}' dos caches.", cache=cache)
+
+    def record_stage(self, path, seconds, rows):
+        """Registra a duração de uma etapa, inclusive as que rodam fora da rerun (ex.: o PDF)."""
+        self.observe("dashboard_stage_seconds", seconds, "Duração de cada etapa do dashboard.",
+                     etapa=path, linhas=size_bucket(rows))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics_registry().to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+def _start_endpoint(port):
+    try:
+        server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    except OSError as e:
+        # Outro processo do servidor já atende na porta
+        logger.warning("Endpoint de métricas não iniciado na porta %s: %s", port, e)
+        return
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    logger.info("Métricas do dashboard em http://localhost:%s/metrics", port)
+
+
+def get_metrics_registry():
+    """Retorna o registro de métricas do processo, iniciando o endpoint HTTP na primeira chamada."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            if METRICS_PORT:
+                _start_endpoint(METRICS_PORT)
+        return _registry
+
+
+_file_lock = threading.Lock()
+
+
+def export(record=None):
+    """
+    Grava as métricas em METRICS_FILE: o registro inteiro no formato do Prometheus, ou `record`
+    como uma linha a mais no arquivo JSON lines.
+    """
+    if not METRICS_FILE:
+        return
+    try:
+        directory = os.path.dirname(os.path.abspath(METRICS_FILE))
+        os.makedirs(directory, exist_ok=True)
+        with _file_lock:
+            if METRICS_FORMAT == "jsonl":
+                if record is not None:
+                    with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                # Troca atômica: o coletor nunca lê um arquivo pela metade
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(get_metrics_registry().to_prometheus())
+                os.replace(tmp_path, METRICS_FILE)
+    except OSError as e:
+        logger.warning("Não foi possível gravar as métricas em %s: %s", METRICS_FILE, e)
+
+
+def record_stage(path, seconds, rows=None):
+    """Registra e exporta uma etapa medida fora de uma rerun, como a geração do PDF."""
+    get_metrics_registry().record_stage(path, seconds, rows)
+    export({"tipo": "etapa", "inicio": datetime.now().isoformat(timespec="seconds"), "linhas": rows,
+            "faixa": size_bucket(rows), "etapas": {path: seconds}})
+
+
+class _Sampler:
+    """Perfil de uma rerun com o cProfile ou o pyinstrument."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == "pyinstrument":
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self, name):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if self.kind == "pyinstrument":
+            path = os.path.join(PROFILE_DIR, f"{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            path = os.path.join(PROFILE_DIR, f"{name}.prof")
+            self._profiler.dump_stats(path)
+        return path
+
+
+def _start_sampler():
+    global _sampling
+    if PROFILER not in ("cprofile", "pyinstrument") or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    kind = PROFILER
+    if kind == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+        kind = "cprofile"
+    current = threading.current_thread()
+    with _sampling_lock:
+        if _sampling is not None:
+            thread, sampler = _sampling
+            if thread is current:
+                sampler.stop()  # Rerun anterior desta thread, interrompida antes do fim
+            elif thread.is_alive():
+                return None
+        try:
+            sampler = _Sampler(kind)
+        except ValueError as e:
+            # Outra ferramenta de perfil já está ativa no processo
+            logger.debug("Perfil da rerun não iniciado: %s", e)
+            _sampling = None
+            return None
+        _sampling = (current, sampler)
+        return sampler
+
+
+def _release_sampler(sampler):
+    global _sampling
+    with _sampling_lock:
+        if _sampling is not None and _sampling[1] is sampler:
+            _sampling = None
+
+
+class RerunProfiler:
+    """
+    Mede as etapas de uma rerun do dashboard e, ao final, registra e exporta as métricas.
+
+    Args:
+        sample (bool): Se False, nunca perfila esta rerun, independentemente de DASHBOARD_PROFILER.
+    """
+
+    def __init__(self, sample=True):
+        self.started_at = datetime.now()
+        self.rows = None
+        self.spans = {}
+        self._stack = []
+        self._start = time.perf_counter()
+        self._sampler = _start_sampler() if sample else None
+
+    def _path(self, name):
+        return "/".join(self._stack + [name])
+
+    def add_span(self, name, seconds):
+        """Registra uma etapa já medida (ex.: pela `PipelineInstrumentation`) dentro do span atual."""
+        path = self._path(name)
+        self.spans[path] = self.spans.get(path, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name):
+        """Context manager que mede o bloco como a etapa `name`, aninhada no span atual."""
+        path = self._path(name)
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self.spans[path] = self.spans.get(path, 0.0) + time.perf_counter() - start
+
+    def finish(self, cache_stats=None):
+        """
+        Encerra a rerun: salva o perfil amostrado, registra as métricas e as exporta.
+
+        Args:
+            cache_stats (dict, optional): Estatísticas de cada cache, por nome (ex.: 'agregados').
+
+        Returns:
+            dict: A rerun em formato estruturado (a mesma linha gravada no arquivo JSON lines).
+        """
+        total = time.perf_counter() - self._start
+        cache_stats = cache_stats or {}
+        profile_path = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            _release_sampler(self._sampler)
+            name = f"rerun_{self.started_at:%Y%m%d_%H%M%S_%f}_{size_bucket(self.rows)}"
+            try:
+                profile_path = self._sampler.save(name)
+                logger.info("Perfil da rerun (%.1f ms) salvo em %s", total * 1000, profile_path)
+            except OSError as e:
+                logger.warning("Não foi possível salvar o perfil da rerun: %s", e)
+            self._sampler = None
+
+        get_metrics_registry().record_rerun(self.rows, total, self.spans, cache_stats)
+        record = {
+            "tipo": "rerun",
+            "inicio": self.started_at.isoformat(timespec="seconds"),
+            "linhas": self.rows,
+            "faixa": size_bucket(self.rows),
+            "total_s": total,
+            "etapas": dict(self.spans),
+            "caches": cache_stats,
+            "perfil": profile_path,
+        }
+        export(record)
+        return record
+
+
+def slowest_stages(records):
+    """
+    Resume as etapas por faixa de tamanho do dataset.
+
+    Args:
+        records (iterable): Linhas do arquivo JSON lines, já decodificadas.
+
+    Returns:
+        dict: {faixa: [(etapa, execuções, média_s, p95_s), ...]}, da etapa mais lenta para a mais
+        rápida (pela média), com os caminhos dos spans; '(rerun)' é a rerun inteira.
+    """
+    durations = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        for path, seconds in record.get("etapas", {}).items():
+            durations[record.get("faixa", NO_DATA_LABEL)][path].append(seconds)
+        if record.get("tipo") == "rerun":
+            durations[record.get("faixa", NO_DATA_LABEL)]["(rerun)"].append(record["total_s"])
+
+    summary = {}
+    for bucket, stages in durations.items():
+        rows = []
+        for path, values in stages.items():
+            values = sorted(values)
+            p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+            rows.append((path, len(values), statistics.fmean(values), p95))
+        summary[bucket] = sorted(rows, key=lambda row: row[2], reverse=True)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Etapas mais lentas do dashboard por tamanho de dataset.")
+    parser.add_argument("arquivo", help="Arquivo JSON lines gravado com DASHBOARD_METRICS_FORMAT=jsonl.")
+    parser.add_argument("--top", type=int, default=10, help="Etapas exibidas por faixa (padrão: 10).")
+    args = parser.parse_args(argv)
+
+    with open(args.arquivo, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    order = [label for _, label in SIZE_BUCKETS] + [">=10M", NO_DATA_LABEL]
+    summary = slowest_stages(records)
+    for bucket in sorted(summary, key=lambda label: order.index(label) if label in order else len(order)):
+        print(f"\n{bucket} linhas:")
+        for path, count, mean, p95 in summary[bucket][:args.top]:
+            print(f"  {path:<40} {count:>5}x   média {mean * 1000:9.1f} ms   p95 {p95 * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Geração do relatório em PDF sob demanda, em segundo plano.
+
+O PDF só é montado quando o usuário pede o download. O trabalho roda em um pool de threads
+compartilhado pelo processo, que limita quantos relatórios são gerados ao mesmo tempo, e o
+resultado fica memorizado por (texto do relatório, especificação dos gráficos): pedir o mesmo
+relatório de novo devolve os bytes já prontos.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_REPORT_MAX_JOBS: número máximo de relatórios gerados ao mesmo tempo (padrão: 2).
+    DASHBOARD_REPORT_CACHE_ENTRIES: número de relatórios prontos mantidos em memória (padrão: 16).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils import profiling
+
+MAX_CONCURRENT_JOBS = int(os.environ.get("DASHBOARD_REPORT_MAX_JOBS", 2))
+MAX_CACHED_REPORTS = int(os.environ.get("DASHBOARD_REPORT_CACHE_ENTRIES", 16))
+
+
+def report_key(report_text, generated_charts, chart_specs=None):
+    """
+    Hash do texto do relatório e dos gráficos.
+
+    Com `chart_specs` (ver `visualizations.render_visualizations`), os gráficos entram pelo que os
+    identifica, sem serializar as figuras; sem ela, pela especificação JSON de cada figura.
+    """
+    digest = hashlib.sha256(report_text.encode('utf-8'))
+    if chart_specs is not None:
+        digest.update(repr(sorted(chart_specs.items())).encode('utf-8'))
+        return digest.hexdigest()
+    for title, fig in generated_charts.items():
+        digest.update(str(title).encode('utf-8'))
+        digest.update(fig.to_json().encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _build_report(report_text, generated_charts, rows):
+    # O FPDF (e, nos processos de rasterização, o Kaleido) só é carregado no primeiro relatório pedido
+    from utils import pdf_generator
+
+    # Mede a geração fora da rerun que a pediu: o tempo vai para a etapa 'pdf' das métricas
+    start = time.perf_counter()
+    pdf_bytes = pdf_generator.create_pdf_report(report_text, generated_charts)
+    profiling.record_stage('pdf', time.perf_counter() - start, rows)
+    return pdf_bytes
+
+
+class ReportJobManager:
+    """
+    Executa e memoriza a geração dos relatórios em PDF.
+
+    Args:
+        max_workers (int): Número máximo de relatórios gerados ao mesmo tempo.
+        max_cached (int): Número de trabalhos (concluídos ou em andamento) mantidos.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, max_cached=MAX_CACHED_REPORTS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self.max_cached = max_cached
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o trabalho (Future) do relatório `key`, ou None se ele nunca foi pedido."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.done() and job.exception() is not None:
+                # Falhas não são memorizadas; um novo pedido tenta de novo
+                del self._jobs[key]
+                return job
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def submit(self, key, report_text, generated_charts, rows=None):
+        """
+        Agenda a geração do relatório, ou devolve o trabalho já existente para `key`.
+
+        `rows` é o número de linhas do dataset, que rotula o tempo de geração nas métricas.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self.executor.submit(_build_report, report_text, generated_charts, rows)
+                self._jobs[key] = job
+                self._evict()
+            return job
+
+    def _evict(self):
+        # Remove os relatórios concluídos mais antigos; trabalhos em andamento nunca são descartados
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_cached:
+                break
+            if self._jobs[key].done():
+                del self._jobs[key]
+
+
+@st.cache_resource
+def get_report_job_manager():
+    """Retorna o gerenciador de relatórios compartilhado por todas as sessões do processo."""
+    return ReportJobManager()
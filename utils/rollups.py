@@ -0,0 +1,186 @@
+"""
+Agregados temporais materializados (rollups) para a aba de análise temporal.
+
+Ao carregar o dataset, cada coluna numérica é resumida por dia, semana, mês e trimestre (soma,
+contagem, mínimo e máximo; a média sai de soma / contagem). O gráfico lê direto dessas tabelas,
+cujo tamanho depende do número de períodos, não de linhas. Com um filtro só de datas, o rollup
+diário do intervalo é reagregado na granularidade escolhida, sem voltar às linhas; com filtros
+categóricos, o rollup diário é recalculado a partir das linhas filtradas.
+
+O intervalo de datas segue a regra do filtro de linhas (`FilterIndex`): de `start` a `end`,
+inclusive, comparando o horário. Quando a coluna de tempo tem horário, o dia de `end` só entra até
+`end` (meia-noite, no filtro da sidebar) e o rollup diário não separa as linhas desse dia; nesse
+caso, as linhas filtradas são resumidas, e a aba temporal bate com os KPIs e as tabelas.
+
+Soma, contagem, mínimo e máximo se combinam entre períodos; para um dataset formado por acréscimo
+de linhas (ver `utils.append_ingestion`), os rollups do dataset anterior são combinados com os
+das linhas novas, sem voltar às linhas anteriores.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.append_ingestion import split_appended
+from utils.filter_index import get_filter_index
+
+# Rótulo exibido -> granularidade
+GRANULARITIES = {'Dia': 'day', 'Semana': 'week', 'Mês': 'month', 'Trimestre': 'quarter'}
+DEFAULT_GRANULARITY = 'Dia'
+
+# Rótulo exibido -> estatística do rollup
+STATISTICS = {'Soma': 'sum', 'Média': 'mean', 'Contagem': 'count', 'Mínimo': 'min', 'Máximo': 'max'}
+DEFAULT_STATISTIC = 'Soma'
+
+_STORED_STATISTICS = ['sum', 'count', 'min', 'max']
+_COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _bucket_starts(days, granularity):
+    """Início do período (segunda-feira, dia 1 do mês ou do trimestre) de cada dia."""
+    days = pd.DatetimeIndex(days)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return days - pd.to_timedelta(days.dayofweek, unit='D')
+    if granularity == 'month':
+        return days.to_period('M').to_timestamp()
+    if granularity == 'quarter':
+        return days.to_period('Q').to_timestamp()
+    raise ValueError(f"Granularidade desconhecida: {granularity}")
+
+
+def daily_rollup(df, time_col, value_cols):
+    """
+    Resume as colunas numéricas por dia.
+
+    Returns:
+        pd.DataFrame: Indexado pelo dia, com colunas (coluna, estatística) para 'sum', 'count',
+        'min' e 'max'.
+    """
+    dates = df[time_col]
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.dt.normalize().rename(time_col)
+    values = df[value_cols].astype({col: 'float64' for col in value_cols if df[col].dtype == 'float32'})
+    rollup = values.groupby(days, observed=True).agg(_STORED_STATISTICS)
+    return rollup[rollup.index.notna()]
+
+
+def has_time_of_day(df, time_col):
+    """Indica se alguma data de `time_col` tem horário diferente de meia-noite."""
+    dates = df[time_col]
+    return bool((dates.notna() & (dates != dates.dt.normalize())).any())
+
+
+def reaggregate(rollup, granularity):
+    """Reagrega um rollup (diário ou mais fino) na granularidade pedida."""
+    if granularity == 'day' or rollup.empty:
+        return rollup
+    buckets = _bucket_starts(rollup.index, granularity).rename(rollup.index.name)
+    combine = {column: _COMBINE[column[1]] for column in rollup.columns}
+    return rollup.groupby(buckets).agg(combine)
+
+
+def combine_rollups(rollups):
+    """Combina rollups da mesma granularidade, somando contagens e somas dos mesmos períodos."""
+    non_empty = [rollup for rollup in rollups if not rollup.empty]
+    if len(non_empty) <= 1:
+        return non_empty[0] if non_empty else rollups[0]
+    combined = pd.concat(non_empty)
+    combine = {column: _COMBINE[column[1]] for column in combined.columns}
+    return combined.groupby(level=0).agg(combine)
+
+
+def rollup_series(rollup, value_col, statistic):
+    """Extrai de um rollup a série de uma coluna e estatística ('mean' = soma / contagem)."""
+    if statistic == 'mean':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            series = rollup[(value_col, 'sum')] / rollup[(value_col, 'count')].replace(0, np.nan)
+    else:
+        series = rollup[(value_col, statistic)]
+    return series.rename(value_col)
+
+
+class RollupStore:
+    """
+    Rollups de todas as granularidades de uma coluna de tempo do dataset completo.
+
+    Args:
+        df (pd.DataFrame): O dataset completo.
+        time_col (str): A coluna de data.
+        value_cols (list): As colunas numéricas resumidas.
+    """
+
+    def __init__(self, df, time_col, value_cols):
+        self.time_col = time_col
+        self.value_cols = list(value_cols)
+        daily = daily_rollup(df, time_col, self.value_cols)
+        self.levels = {granularity: reaggregate(daily, granularity) for granularity in GRANULARITIES.values()}
+        self.time_of_day = has_time_of_day(df, time_col)
+
+    def appended(self, delta):
+        """Retorna os rollups com as linhas de `delta` combinadas aos períodos existentes."""
+        store = copy.copy(self)
+        daily = daily_rollup(delta, self.time_col, self.value_cols)
+        store.time_of_day = self.time_of_day or has_time_of_day(delta, self.time_col)
+        store.levels = {
+            granularity: combine_rollups([level, reaggregate(daily, granularity)])
+            for granularity, level in self.levels.items()
+        }
+        return store
+
+    def for_range(self, start, end, granularity):
+        """
+        Reagrega o rollup diário entre `start` e `end` (inclusive) na granularidade pedida.
+
+        Returns:
+            pd.DataFrame | None: None se as datas tiverem horário: o dia de `end` entraria inteiro,
+            e o filtro de linhas para em `end`.
+        """
+        if self.time_of_day:
+            return None
+        daily = self.levels['day']
+        return reaggregate(daily.loc[pd.Timestamp(start):pd.Timestamp(end)], granularity)
+
+
+@st.cache_resource(max_entries=8)
+def _cached_rollup_store(dataset_hash, time_col, value_cols, _df):
+    parts = split_appended(_df)
+    if parts is not None:
+        previous, delta = parts
+        return get_rollup_store(previous, time_col, value_cols).appended(delta)
+    return RollupStore(_df, time_col, value_cols)
+
+
+def get_rollup_store(df, time_col, value_cols):
+    """Retorna os rollups do dataset, calculados uma única vez por hash de conteúdo e coluna de tempo."""
+    dataset_hash = df.attrs.get('dataset_hash')
+    if dataset_hash is None:
+        return RollupStore(df, time_col, value_cols)
+    return _cached_rollup_store(dataset_hash, time_col, tuple(value_cols), df)
+
+
+def time_rollup(df, source, selected_filters, time_col, value_cols, granularity):
+    """
+    Rollup de `df` (o dataset `source` com os filtros `selected_filters`) na granularidade pedida.
+
+    Sem filtros, lê o rollup materializado; com filtro só de datas na própria coluna de tempo
+    (sem horário), reagrega o rollup diário do intervalo; nos demais casos, resume as linhas
+    filtradas.
+    """
+    store = get_rollup_store(source, time_col, value_cols)
+    if df is source:
+        return store.levels[granularity]
+
+    selected_filters = selected_filters or {}
+    date_only = (
+        selected_filters.get('date_col') == time_col
+        and not get_filter_index(source).restricts_categories(selected_filters)
+    )
+    if date_only:
+        rollup = store.for_range(*selected_filters['date_range'], granularity)
+        if rollup is not None:
+            return rollup
+    return reaggregate(daily_rollup(df, time_col, value_cols), granularity)
@@ -0,0 +1,348 @@
+"""
+Sketches de streaming para o modo de estatísticas aproximadas.
+
+Cada sketch é atualizado bloco a bloco e pode ser combinado (`merge`) com outro do mesmo tipo, de
+modo que o resumo de um conjunto de blocos sai da combinação dos resumos de cada bloco:
+
+- `KLLSketch`: quantis (e, portanto, os limites de IQR) com erro de posto limitado.
+- `HyperLogLog`: contagem aproximada de valores distintos.
+- `HeavyHitters`: somas por grupo dos maiores grupos (resumo de Misra-Gries ponderado).
+
+`DatasetSketches` reúne os sketches usados pela análise. Os blocos seguem a ordem das datas do
+índice de filtros, então um filtro só de datas é atendido combinando os blocos inteiros do
+intervalo e resumindo apenas as linhas das pontas.
+
+Configuração por variáveis de ambiente:
+    DASHBOARD_SKETCH_BLOCK_ROWS: linhas por bloco (padrão: 250.000).
+    DASHBOARD_SKETCH_KLL_K: parâmetro k dos sketches KLL (padrão: 200).
+    DASHBOARD_SKETCH_HLL_PRECISION: bits de índice do HyperLogLog (padrão: 14).
+    DASHBOARD_SKETCH_TOPK_CAPACITY: contadores de cada resumo de somas por grupo (padrão: 256).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.filter_index import get_filter_index
+
+SKETCH_BLOCK_ROWS = int(os.environ.get("DASHBOARD_SKETCH_BLOCK_ROWS", 250_000))
+KLL_K = int(os.environ.get("DASHBOARD_SKETCH_KLL_K", 200))
+HLL_PRECISION = int(os.environ.get("DASHBOARD_SKETCH_HLL_PRECISION", 14))
+TOPK_CAPACITY = int(os.environ.get("DASHBOARD_SKETCH_TOPK_CAPACITY", 256))
+
+
+def _finite_values(series):
+    if pd.api.types.is_extension_array_dtype(series.dtype):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        values = series.to_numpy(dtype='float64')
+    return values[np.isfinite(values)]
+
+
+class KLLSketch:
+    """
+    Sketch KLL de quantis.
+
+    Guarda níveis de itens amostrados; um item do nível h representa 2^h valores. Quando um nível
+    passa da capacidade, ele é ordenado e metade dos itens (os de posição par ou ímpar, ao acaso)
+    sobe para o nível seguinte.
+
+    Args:
+        k (int): Controla o tamanho e a precisão do sketch.
+        seed (int): Semente das compactações.
+    """
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.zeros(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        """Erro de posto normalizado com ~99% de confiança (aproximação empírica do KLL)."""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        height = len(self.levels)
+        return max(8, int(np.ceil(self.k * (2 / 3) ** (height - level - 1))))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(items)
+                # Com um número ímpar de itens, o menor fica no nível atual
+                odd = len(items) % 2
+                promoted = items[odd:][int(self._rng.integers(2))::2]
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Acrescenta valores (os não finitos são ignorados)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values):
+            self.n += len(values)
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Combina outro sketch neste, como se todos os valores tivessem sido vistos aqui."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Estima os quantis `qs` (entre 0 e 1); devolve NaN se o sketch estiver vazio."""
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        items, cumulative = self._weighted_items()
+        targets = np.asarray(qs, dtype=np.float64) * cumulative[-1]
+        positions = np.searchsorted(cumulative, targets, side='left')
+        return items[np.clip(positions, 0, len(items) - 1)]
+
+    def rank(self, value, inclusive=False):
+        """Estima a fração dos valores menores que `value` (ou menores ou iguais, se `inclusive`)."""
+        if not self.n:
+            return 0.0
+        items, cumulative = self._weighted_items()
+        position = np.searchsorted(items, value, side='right' if inclusive else 'left')
+        return float(cumulative[position - 1] / cumulative[-1]) if position else 0.0
+
+
+class HyperLogLog:
+    """
+    Contador aproximado de valores distintos.
+
+    Args:
+        precision (int): Bits do hash usados como índice; o sketch tem 2^precision registradores.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """Erro padrão relativo da estimativa."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update_hashes(self, hashes):
+        """Acrescenta valores já convertidos em hashes de 64 bits."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return self
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Posição do primeiro bit 1 nos `width` bits restantes (rest < 2^53, então o log2 é exato)
+        rank = np.full(len(rest), width + 1, dtype=np.uint8)
+        nonzero = rest > 0
+        rank[nonzero] = width - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def update(self, series):
+        """Acrescenta os valores não nulos de uma Series."""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Hash de cada categoria uma única vez, indexado pelos códigos das linhas
+            codes = series.cat.codes.to_numpy()
+            category_hashes = pd.util.hash_array(series.cat.categories.to_numpy())
+            return self.update_hashes(category_hashes[codes[codes >= 0]])
+        return self.update_hashes(pd.util.hash_array(series.dropna().to_numpy()))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # Contagem linear para cardinalidades pequenas
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """
+    Somas por grupo dos maiores grupos (Misra-Gries ponderado), para pesos não negativos.
+
+    Guarda no máximo `capacity` grupos. Ao passar do limite, o (capacity+1)-ésimo maior peso é
+    descontado de todos os grupos e os que ficam sem peso são descartados; a soma desses descontos
+    limita o quanto cada soma guardada pode estar subestimada.
+
+    Args:
+        capacity (int): Número máximo de grupos guardados.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.sums = pd.Series(dtype='float64')
+        self.max_error = 0.0
+        self.total = 0.0
+
+    def _add(self, sums, error, total):
+        combined = self.sums.add(sums, fill_value=0) if len(self.sums) else sums.astype('float64')
+        self.max_error += error
+        self.total += total
+        if len(combined) > self.capacity:
+            threshold = combined.nlargest(self.capacity + 1).iloc[-1]
+            combined = combined[combined > threshold] - threshold
+            self.max_error += threshold
+        self.sums = combined
+        return self
+
+    def update(self, keys, weights):
+        """Acrescenta as linhas de um bloco: `keys` define o grupo e `weights` o valor somado."""
+        sums = weights.astype('float64').groupby(keys, observed=True).sum()
+        return self._add(sums, 0.0, float(sums.sum()))
+
+    def merge(self, other):
+        return self._add(other.sums, other.max_error, other.total)
+
+    @property
+    def exact(self):
+        return self.max_error == 0
+
+
+class DatasetSketches:
+    """
+    Sketches de um conjunto de linhas: KLL por coluna numérica, HyperLogLog por coluna categórica
+    e somas por grupo de cada coluna categórica para as métricas indicadas.
+
+    Args:
+        numeric_cols (list), categorical_cols (list), metric_cols (list): As colunas resumidas.
+    """
+
+    def __init__(self, numeric_cols, categorical_cols, metric_cols):
+        self.n_rows = 0
+        self.quantiles = {col: KLLSketch() for col in numeric_cols}
+        self.distinct = {col: HyperLogLog() for col in categorical_cols}
+        self.group_sums = {(by, metric): HeavyHitters() for by in categorical_cols for metric in metric_cols}
+
+    def update(self, df):
+        """Acrescenta as linhas de um bloco do DataFrame."""
+        self.n_rows += len(df)
+        for col, sketch in self.quantiles.items():
+            sketch.update(_finite_values(df[col]))
+        for col, sketch in self.distinct.items():
+            sketch.update(df[col])
+        for (by, metric), sketch in self.group_sums.items():
+            if sketch is not None:
+                weights = df[metric]
+                if (weights < 0).any():
+                    # Somas com valores negativos não têm limite de erro: ficam de fora do modo aproximado
+                    self.group_sums[(by, metric)] = None
+                else:
+                    sketch.update(df[by], weights)
+        return self
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        for col, sketch in self.quantiles.items():
+            sketch.merge(other.quantiles[col])
+        for col, sketch in self.distinct.items():
+            sketch.merge(other.distinct[col])
+        for key, sketch in self.group_sums.items():
+            if sketch is not None and other.group_sums[key] is not None:
+                sketch.merge(other.group_sums[key])
+            else:
+                self.group_sums[key] = None
+        return self
+
+    def copy_empty(self):
+        """Retorna sketches vazios para as mesmas colunas."""
+        metrics = sorted({metric for _, metric in self.group_sums})
+        return DatasetSketches(list(self.quantiles), list(self.distinct), metrics)
+
+
+def build_sketches(df, numeric_cols, categorical_cols, metric_cols, rows=None, block_rows=SKETCH_BLOCK_ROWS):
+    """Resume as linhas `rows` de `df` (ou todas), bloco a bloco."""
+    sketches = DatasetSketches(numeric_cols, categorical_cols, metric_cols)
+    n = len(df) if rows is None else len(rows)
+    for start in range(0, n, block_rows):
+        block = df.iloc[start:start + block_rows] if rows is None else df.iloc[rows[start:start + block_rows]]
+        sketches.update(block)
+    return sketches
+
+
+class BlockSketches:
+    """
+    Sketches de cada bloco do dataset, na ordem das datas do índice de filtros.
+
+    Args:
+        df (pd.DataFrame): O dataset completo.
+        numeric_cols (list), categorical_cols (list), metric_cols (list): As colunas resumidas.
+        block_rows (int): Linhas por bloco.
+    """
+
+    def __init__(self, df, numeric_cols, categorical_cols, metric_cols, block_rows=SKETCH_BLOCK_ROWS):
+        self.df = df
+        self.columns = (numeric_cols, categorical_cols, metric_cols)
+        self.block_rows = block_rows
+        self.index = get_filter_index(df)
+        n_positions = self.index.n_rows
+        self.blocks = [
+            build_sketches(df, *self.columns, rows=self._rows(start, min(start + block_rows, n_positions)),
+                           block_rows=block_rows)
+            for start in range(0, n_positions, block_rows)
+        ]
+        self._all = None
+
+    def _rows(self, lo, hi):
+        if self.index.sorted_dates is None:
+            return np.arange(lo, hi)
+        return self.index.row_positions(lo, hi)
+
+    def combined(self, lo=0, hi=None):
+        """
+        Retorna os sketches das posições [lo, hi) da ordem das datas: os blocos inteiros do
+        intervalo são combinados e só as linhas das pontas são resumidas de novo.
+        """
+        hi = self.index.n_rows if hi is None else hi
+        if lo == 0 and hi == self.index.n_rows and self._all is not None:
+            return self._all
+        first = -(-lo // self.block_rows)
+        last = hi // self.block_rows
+        if first >= last:
+            return build_sketches(self.df, *self.columns, rows=self._rows(lo, hi))
+        result = build_sketches(self.df, *self.columns, rows=self._rows(lo, first * self.block_rows))
+        for block in self.blocks[first:last]:
+            result.merge(block)
+        result.merge(build_sketches(self.df, *self.columns, rows=self._rows(last * self.block_rows, hi)))
+        if lo == 0 and hi == self.index.n_rows:
+            self._all = result
+        return result
+
+
+@st.cache_resource(max_entries=8)
+def _cached_block_sketches(dataset_hash, columns, _df):
+    return BlockSketches(_df, *columns)
+
+
+def get_block_sketches(df, numeric_cols, categorical_cols, metric_cols):
+    """Retorna os sketches por bloco do dataset, construídos uma única vez por hash de conteúdo."""
+    columns = (tuple(numeric_cols), tuple(categorical_cols), tuple(metric_cols))
+    dataset_hash = df.attrs.get('dataset_hash')
+    if dataset_hash is None:
+        return BlockSketches(df, *columns)
+    return _cached_block_sketches(dataset_hash, columns, df)
@@ -0,0 +1,331 @@
+"""
+Leitura em streaming de planilhas e arquivos CSV, em blocos de linhas.
+
+Em vez de montar o DataFrame inteiro de uma vez (como `pd.read_excel`), as linhas são lidas em
+blocos, o tipo de cada coluna é inferido e convertido bloco a bloco e os valores são copiados
+para buffers colunares pré-alocados. Assim o pico de memória fica próximo do tamanho do frame
+final, sem cópias extras por coluna.
+
+Para planilhas, usa o `python-calamine` quando estiver instalado e, caso contrário, o openpyxl em
+modo `read_only`.
+"""
+import csv
+import datetime
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # Dependência opcional
+    CalamineWorkbook = None
+
+DEFAULT_CHUNK_ROWS = 10_000
+
+# Ordem de promoção dos tipos quando blocos diferentes de uma coluna discordam
+_KIND_RANK = {'empty': 0, 'bool': 1, 'int': 2, 'float': 3}
+
+
+def _is_date_column(name):
+    name = str(name).lower()
+    return 'data' in name or 'date' in name
+
+
+def _parse_date_strings(values):
+    """Converte um bloco de textos para datetime, com dia primeiro exceto em datas ISO (AAAA-MM-DD)."""
+    sample = next((value for value in values if isinstance(value, str) and value.strip()), '')
+    dayfirst = re.match(r'\s*\d{4}-', sample) is None
+    converted = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', dayfirst=dayfirst)
+    return converted.to_numpy(dtype='datetime64[ns]')
+
+
+def _infer_kind(values):
+    """Infere o tipo de um bloco de valores Python vindos do leitor de planilhas."""
+    kinds = set()
+    for value in values:
+        if value is None or value == '':
+            continue
+        if isinstance(value, bool):
+            kinds.add('bool')
+        elif isinstance(value, (int, np.integer)):
+            kinds.add('int')
+        elif isinstance(value, (float, np.floating)):
+            kinds.add('float')
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            kinds.add('datetime')
+        else:
+            return 'object'
+        if len(kinds) > 1 and not kinds <= {'int', 'float'}:
+            return 'object'
+    if not kinds:
+        return 'empty'
+    if kinds == {'int', 'float'}:
+        return 'float'
+    return kinds.pop()
+
+
+class ColumnBuffer:
+    """
+    Buffer colunar pré-alocado que recebe os valores de uma coluna bloco a bloco.
+
+    O tipo do buffer começa indefinido e é promovido (bool -> int -> float -> object) quando um
+    novo bloco não cabe no tipo atual.
+
+    Args:
+        name: Nome da coluna.
+        capacity (int): Número de linhas a pré-alocar.
+        parse_dates (bool): Se True, blocos de texto são convertidos para datetime (dia primeiro).
+    """
+
+    _DTYPES = {'bool': np.bool_, 'int': np.int64, 'float': np.float64,
+               'datetime': 'datetime64[ns]', 'object': object}
+
+    def __init__(self, name, capacity, parse_dates=False):
+        self.name = name
+        self.capacity = max(int(capacity), 1)
+        self.parse_dates = parse_dates
+        self.kind = 'empty'
+        self.size = 0
+        self.data = None
+
+    def _allocate(self, kind):
+        data = np.empty(self.capacity, dtype=self._DTYPES[kind])
+        if self.data is None:
+            # Linhas anteriores só tinham células vazias
+            if kind == 'float':
+                data[:self.size] = np.nan
+            elif kind == 'datetime':
+                data[:self.size] = np.datetime64('NaT')
+            elif kind == 'object':
+                data[:self.size] = None
+        elif self.kind == 'datetime':
+            # datetime64 -> object precisa passar por Timestamp para não virar inteiro
+            data[:self.size] = pd.DatetimeIndex(self.data[:self.size]).astype(object)
+        else:
+            data[:self.size] = self.data[:self.size].astype(data.dtype)
+        self.data = data
+        self.kind = kind
+
+    def _promote(self, kind):
+        if kind == self.kind or kind == 'empty':
+            return
+        if self.kind == 'empty':
+            # Linhas vazias anteriores não podem ser representadas em colunas bool/int
+            self._allocate('float' if self.size and kind in ('bool', 'int') else kind)
+        elif self.kind in _KIND_RANK and kind in _KIND_RANK:
+            if _KIND_RANK[kind] > _KIND_RANK[self.kind]:
+                self._allocate(kind)
+        else:
+            self._allocate('object')
+
+    def _ensure_capacity(self, extra):
+        needed = self.size + extra
+        if needed <= self.capacity:
+            return
+        self.capacity = max(needed, int(self.capacity * 1.5))
+        if self.data is not None:
+            data = np.empty(self.capacity, dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append_values(self, values):
+        """Adiciona um bloco de valores Python (lista) ao buffer."""
+        kind = _infer_kind(values)
+        if kind == 'object' and self.parse_dates and self.kind in ('empty', 'datetime'):
+            return self.append_array(_parse_date_strings(values), 'datetime')
+
+        if kind == 'empty':
+            array = None
+        elif kind in ('int', 'bool') and any(value is None or value == '' for value in values):
+            # Células vazias exigem NaN
+            kind = 'float'
+            array = np.array([np.nan if value is None or value == '' else value for value in values], dtype=np.float64)
+        elif kind == 'float':
+            array = np.array([np.nan if value is None or value == '' else value for value in values], dtype=np.float64)
+        elif kind == 'datetime':
+            array = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='datetime64[ns]')
+        elif kind == 'object':
+            array = np.empty(len(values), dtype=object)
+            array[:] = [None if value == '' else value for value in values]
+        else:
+            array = np.array(values, dtype=self._DTYPES[kind])
+        return self.append_array(array, kind, length=len(values))
+
+    def append_array(self, array, kind, length=None):
+        """Adiciona um bloco já convertido para NumPy ao buffer."""
+        length = len(array) if array is not None else length
+        self._ensure_capacity(length)
+        self._promote(kind)
+        if self.data is None:
+            # Coluna ainda sem nenhum valor; só avança o tamanho
+            self.size += length
+            return
+        if array is None:
+            if self.kind in ('bool', 'int'):
+                self._promote('float')
+            fill = {'float': np.nan, 'datetime': np.datetime64('NaT'), 'object': None}[self.kind]
+            self.data[self.size:self.size + length] = fill
+            self.size += length
+            return
+        if self.kind == 'object' and array.dtype != object:
+            if array.dtype.kind == 'M':
+                array = pd.DatetimeIndex(array).astype(object)
+            else:
+                array = array.astype(object)
+        self.data[self.size:self.size + length] = array
+        self.size += length
+
+    def finalize(self):
+        """Retorna os valores lidos como um array NumPy do tamanho exato."""
+        if self.data is None:
+            return np.full(self.size, np.nan)
+        if self.size < 0.75 * self.capacity:
+            # A estimativa de linhas foi muito maior que o real; libera o excesso
+            return self.data[:self.size].copy()
+        return self.data[:self.size]
+
+
+def _unique_column_names(header):
+    names = []
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None or name == '' else name
+        while name in names:
+            name = f"{name}.1"
+        names.append(name)
+    return names
+
+
+def sheet_names(data, file_name=''):
+    """Retorna os nomes das abas da planilha, na ordem do arquivo."""
+    if CalamineWorkbook is not None:
+        return list(CalamineWorkbook.from_filelike(io.BytesIO(data)).sheet_names)
+    if str(file_name).lower().endswith('.xls'):
+        return pd.ExcelFile(io.BytesIO(data)).sheet_names
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _iter_sheet_rows(data, file_name, sheet=0):
+    """
+    Itera sobre as linhas de uma aba da planilha (pelo nome ou pela posição).
+
+    Returns:
+        tuple: (iterador de linhas, número estimado de linhas ou None).
+    """
+    is_xls = str(file_name).lower().endswith('.xls')
+    if CalamineWorkbook is not None:
+        workbook = CalamineWorkbook.from_filelike(io.BytesIO(data))
+        if isinstance(sheet, str):
+            worksheet = workbook.get_sheet_by_name(sheet)
+        else:
+            worksheet = workbook.get_sheet_by_index(sheet)
+        rows = worksheet.iter_rows() if hasattr(worksheet, 'iter_rows') else iter(worksheet.to_python())
+        return rows, getattr(worksheet, 'total_height', None)
+    if is_xls:
+        raise ValueError("A leitura em streaming de arquivos .xls requer o pacote 'python-calamine'.")
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    worksheet = workbook[sheet] if isinstance(sheet, str) else workbook.worksheets[sheet]
+    return worksheet.iter_rows(values_only=True), worksheet.max_row
+
+
+def _build_frame(buffers, restore_integers=False):
+    columns = {}
+    for buffer in buffers:
+        values = buffer.finalize()
+        # O Excel guarda todo número como float; o calamine não devolve inteiros como o openpyxl
+        if restore_integers and buffer.kind == 'float' and len(values) and np.all(np.mod(values, 1) == 0):
+            values = values.astype(np.int64)
+        columns[buffer.name] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def _flush_rows(chunk, buffers):
+    """Transpõe um bloco de linhas e envia cada coluna para o seu buffer."""
+    n_cols = len(buffers)
+    columns = list(zip(*(tuple(row[:n_cols]) + (None,) * (n_cols - len(row)) for row in chunk)))
+    for buffer, values in zip(buffers, columns):
+        buffer.append_values(list(values))
+
+
+def read_excel_streaming(data, file_name='', chunk_rows=DEFAULT_CHUNK_ROWS, sheet=0):
+    """
+    Lê uma aba de uma planilha em blocos de linhas.
+
+    Args:
+        data (bytes): O conteúdo do arquivo.
+        file_name (str): Nome do arquivo, usado para detectar planilhas .xls.
+        chunk_rows (int): Número de linhas por bloco.
+        sheet (str | int): Nome ou posição da aba (padrão: a primeira).
+
+    Returns:
+        pd.DataFrame: O DataFrame lido, com as colunas de data já convertidas.
+    """
+    rows, estimated_rows = _iter_sheet_rows(data, file_name, sheet)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+
+    names = _unique_column_names(list(header))
+    capacity = (estimated_rows - 1) if estimated_rows else chunk_rows
+    buffers = [ColumnBuffer(name, capacity, parse_dates=_is_date_column(name)) for name in names]
+
+    chunk = []
+    for row in rows:
+        if not any(value is not None and value != '' for value in row):
+            continue  # Linhas totalmente vazias são ignoradas, como no pd.read_excel
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            _flush_rows(chunk, buffers)
+            chunk = []
+    if chunk:
+        _flush_rows(chunk, buffers)
+
+    return _build_frame(buffers, restore_integers=True)
+
+
+def read_csv_streaming(data, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Lê um arquivo CSV em blocos de linhas, convertendo cada bloco para buffers colunares.
+
+    Args:
+        data (bytes): O conteúdo do arquivo.
+        chunk_rows (int): Número de linhas por bloco.
+
+    Returns:
+        pd.DataFrame: O DataFrame lido, com as colunas de data já convertidas.
+    """
+    # Detecta o separador (',' ou ';', comum em planilhas exportadas no Brasil) pela amostra inicial
+    sample = data[:64 * 1024].decode('utf-8', errors='ignore')
+    try:
+        separator = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        separator = ','
+
+    buffers = None
+    for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunk_rows, sep=separator):
+        if buffers is None:
+            buffers = [ColumnBuffer(name, chunk_rows, parse_dates=_is_date_column(name)) for name in chunk.columns]
+        for buffer, name in zip(buffers, chunk.columns):
+            column = chunk[name]
+            if pd.api.types.is_bool_dtype(column):
+                buffer.append_array(column.to_numpy(), 'bool')
+            elif pd.api.types.is_integer_dtype(column):
+                buffer.append_array(column.to_numpy(dtype=np.int64), 'int')
+            elif pd.api.types.is_float_dtype(column):
+                buffer.append_array(column.to_numpy(dtype=np.float64), 'float')
+            else:
+                buffer.append_values(column.astype(object).where(column.notna(), None).tolist())
+    if buffers is None:
+        return pd.DataFrame()
+    return _build_frame(buffers)